@@ -1,5 +1,15 @@
-from datetime import date, datetime, timedelta
-from infrastructure.persistence.models import Schedule, Semester
+from datetime import date, timedelta
+
+from domain.academic_performance import attendance as attendance_vector
+from domain.academic_structure.calendar import class_dates
+from infrastructure.persistence.models import (
+    AttendanceRecord,
+    CalendarException,
+    LaboratoryGroup,
+    Schedule,
+    SessionIndex,
+    StudentEnrollment,
+)
 
 # Constante auxiliar para mapear los strings de la BD a los enteros de Python (0=Lunes, 6=Domingo)
 DAY_MAPPING = {
@@ -11,115 +21,274 @@ DAY_MAPPING = {
     "SABADO": 5,
     "DOMINGO": 6,
 }
+# Al revés, para el nombre bonito del día: 0 -> "Lunes"
+DAY_NAMES = {weekday: day.capitalize() for day, weekday in DAY_MAPPING.items()}
+
+# Las fechas de cada grupo/lab quedan en SessionIndex. Las señales borran las
+# filas cuando cambian horarios, labs, cursos, semestres o excepciones, y la
+# próxima lectura las vuelve a armar (con aritmética, sin recorrer el semestre)
+
+
+class Sessions(list):
+    """Lista de sesiones que además se puede buscar por fecha sin recorrerla"""
+
+    def __init__(self, sessions):
+        super().__init__(sessions)
+        self._by_date = {session["date"]: session for session in self}
+
+    def on(self, day):
+        return self._by_date.get(day)
 
 
 def get_group_sessions(group):
     """
     Genera las sesiones de un grupo de curso basado en su horario semanal.
     """
-    # Obtener todos los horarios del grupo
-    schedules = Schedule.objects.filter(course_group=group).order_by(
-        "day_of_week", "start_time"
+    dates = _indexed_dates(course_group_id=group.group_id)
+    if dates is None:
+        dates = _rebuild(
+            lambda: _group_spec(group.group_id), course_group_id=group.group_id
+        )
+
+    # Un día de recuperación puede caer en sábado: el nombre sale de la fecha
+    return _mark(dates, lambda day: DAY_NAMES[day.weekday()])
+
+
+def get_lab_sessions(lab_group):
+    """
+    Genera las sesiones de un laboratorio.
+    Regla de negocio: Los labs empiezan 1 semana después del inicio del semestre.
+    """
+    dates = _indexed_dates(lab_group_id=lab_group.lab_id)
+    if dates is None:
+        dates = _rebuild(
+            lambda: _lab_spec(lab_group.lab_id), lab_group_id=lab_group.lab_id
+        )
+
+    # Django display method; en una recuperación, el día de la fecha
+    weekday = DAY_MAPPING.get(lab_group.day_of_week)
+    day_name = lab_group.get_day_of_week_display()
+    return _mark(
+        dates,
+        lambda day: day_name if day.weekday() == weekday else DAY_NAMES[day.weekday()],
     )
 
-    if not schedules.exists():
-        return []
 
-    # Obtener semestre
-    semester = group.course.semester
-    if not semester:
-        return []
+def invalidate(group_ids=(), lab_ids=()):
+    SessionIndex.objects.filter(course_group_id__in=list(group_ids)).delete()
+    SessionIndex.objects.filter(lab_group_id__in=list(lab_ids)).delete()
 
-    start_date = semester.start_date
-    end_date = semester.end_date
 
-    # Recolectar todos los días de clase únicos (ej: [0, 2] para Lunes y Miércoles)
-    class_days = set()
-    for schedule in schedules:
-        weekday = DAY_MAPPING.get(schedule.day_of_week)
-        if weekday is not None:
-            class_days.add(weekday)
+def numbering_before(exception):
+    """
+    Antes de guardar o borrar una excepción: la numeración actual de los grupos
+    y labs que ya tienen asistencia desde esa fecha ({(campo, id): [fechas]}).
+    Una excepción corre los números de las sesiones siguientes; con esto
+    renumber_attendance sabe qué registro era qué sesión.
+    """
+    day = exception.date
+    previous = (
+        CalendarException.objects.filter(pk=exception.pk)
+        .values_list("date", flat=True)
+        .first()
+    )
+    if previous:
+        day = min(day, previous)
 
-    if not class_days:
-        return []
+    records = AttendanceRecord.objects.filter(
+        enrollment__course__semester_id=exception.semester_id,
+        session_date__gte=day,
+    )
+    numbering = {}
+    for owner, (load_spec, lookup) in _NUMBERED.items():
+        owner_ids = (
+            records.filter(**{f"{lookup}__isnull": False})
+            .values_list(lookup, flat=True)
+            .distinct()
+        )
+        for owner_id in owner_ids:
+            dates = _indexed_dates(**{owner: owner_id})
+            if dates is None:
+                dates = _rebuild(lambda: load_spec(owner_id), **{owner: owner_id})
+            numbering[(owner, owner_id)] = dates
+    return numbering
 
-    # Generar sesiones
-    sessions = []
-    current_date = start_date
-    session_number = 1
-    today = date.today()
 
-    while current_date <= end_date:
-        if current_date.weekday() in class_days:
-            # Obtener nombre bonito del día
-            # Buscamos la key (LUNES) basada en el value (0)
-            day_name = next(
-                (
-                    k.capitalize()
-                    for k, v in DAY_MAPPING.items()
-                    if v == current_date.weekday()
-                ),
-                current_date.strftime("%A"),
-            )
+def renumber_attendance(numbering):
+    """
+    Después del cambio: cada registro de asistencia que era la sesión N en su
+    fecha pasa al número que esa fecha tiene ahora, y se rearman los vectores.
+    Los contadores no cambian: los estados son los mismos.
+    Teoría y lab se miran por separado, cada uno con su calendario; un registro
+    que no calza con ninguno de los dos no se toca.
+    """
+    if not numbering:
+        return
 
-            sessions.append(
-                {
-                    "number": session_number,
-                    "date": current_date,
-                    "day_name": day_name,
-                    "is_today": current_date == today,
-                    "is_past": current_date < today,
-                    "is_future": current_date > today,
-                }
-            )
+    moves = {}
+    touched = set()
+    for (owner, owner_id), dates in numbering.items():
+        load_spec, lookup = _NUMBERED[owner]
+        before = set(enumerate(dates, start=1))
+        new_dates = _dates(load_spec(owner_id))
+        after = {day: number for number, day in enumerate(new_dates, start=1)}
+        for record_id, enrollment_id, number, day in AttendanceRecord.objects.filter(
+            **{lookup: owner_id}
+        ).values_list("record_id", "enrollment_id", "session_number", "session_date"):
+            # Si calza con teoría y con lab a la vez, manda la teoría
+            if record_id in moves:
+                continue
+            if (number, day) in before and after.get(day, number) != number:
+                moves[record_id] = after[day]
+                touched.add(enrollment_id)
+
+    if not moves:
+        return
+
+    # (matrícula, sesión) es único y la fila se chequea al momento: primero
+    # todos a negativo y recién después al número nuevo, para no chocar
+    for sign in (-1, 1):
+        AttendanceRecord.objects.bulk_update(
+            [
+                AttendanceRecord(record_id=record_id, session_number=sign * number)
+                for record_id, number in moves.items()
+            ],
+            ["session_number"],
+            batch_size=1000,
+        )
 
-            session_number += 1
+    statuses = {}
+    for enrollment_id, number, status in AttendanceRecord.objects.filter(
+        enrollment_id__in=touched
+    ).values_list("enrollment_id", "session_number", "status"):
+        statuses.setdefault(enrollment_id, {})[number] = status
+    StudentEnrollment.objects.bulk_update(
+        [
+            StudentEnrollment(
+                enrollment_id=enrollment_id,
+                attendance_vector=attendance_vector.build(by_session),
+            )
+            for enrollment_id, by_session in statuses.items()
+        ],
+        ["attendance_vector"],
+        batch_size=1000,
+    )
 
-        current_date += timedelta(days=1)
 
-    return sessions
+def _indexed_dates(**owner):
+    dates = list(
+        SessionIndex.objects.filter(**owner)
+        .order_by("session_number")
+        .values_list("session_date", flat=True)
+    )
+    return dates or None
 
 
-def get_lab_sessions(lab_group):
+def _rebuild(load_spec, **owner):
     """
-    Genera las sesiones de un laboratorio.
-    Regla de negocio: Los labs empiezan 1 semana después del inicio del semestre.
+    Arma las fechas y las guarda en el índice. Si mientras tanto alguien
+    confirmó un cambio de horario o excepciones, su borrado (al confirmar) pudo
+    pasar antes de mi INSERT y lo guardado sería viejo hasta el próximo cambio:
+    por eso vuelvo a leer el spec después de guardar y, si cambió, borro.
+    Son dos consultas más, pero solo al reconstruir.
     """
-    semester = lab_group.course.semester
-    if not semester:
-        return []
+    dates = _dates(load_spec())
+    # ignore_conflicts: si dos pedidos lo arman a la vez, gana el primero
+    SessionIndex.objects.bulk_create(
+        [
+            SessionIndex(session_number=number, session_date=day, **owner)
+            for number, day in enumerate(dates, start=1)
+        ],
+        ignore_conflicts=True,
+    )
+
+    fresh = _dates(load_spec())
+    if fresh != dates:
+        SessionIndex.objects.filter(**owner).delete()
+    return fresh
 
-    # Lab empieza 1 semana después
-    lab_start_date = semester.start_date + timedelta(days=7)
-    lab_end_date = semester.end_date
 
-    target_weekday = DAY_MAPPING.get(lab_group.day_of_week)
-    if target_weekday is None:
+def _dates(spec):
+    """Fechas de clase del spec con las excepciones del semestre aplicadas"""
+    if not spec:
         return []
 
-    sessions = []
-    current_date = lab_start_date
-    session_number = 1
+    semester_id, start_date, end_date, class_days = spec
+    closed, makeups = set(), []
+    for day, kind, makeup_for_day in CalendarException.objects.filter(
+        semester_id=semester_id
+    ).values_list("date", "kind", "makeup_for_day"):
+        if kind == "RECUPERACION":
+            if makeup_for_day in DAY_MAPPING:
+                makeups.append((day, DAY_MAPPING[makeup_for_day]))
+        else:
+            closed.add(day)
+
+    return class_dates(start_date, end_date, class_days, closed, makeups)
+
+
+def _mark(dates, day_name):
+    """Lo único que depende de hoy se calcula al leer, no se guarda"""
     today = date.today()
+    return Sessions(
+        {
+            "number": number,
+            "date": current_date,
+            "day_name": day_name(current_date),
+            "is_today": current_date == today,
+            "is_past": current_date < today,
+            "is_future": current_date > today,
+        }
+        for number, current_date in enumerate(dates, start=1)
+    )
+
+
+def _group_spec(group_id):
+    """Días de clase del grupo (ej: (0, 2) para Lunes y Miércoles) y su semestre"""
+    rows = Schedule.objects.filter(course_group_id=group_id).values_list(
+        "day_of_week",
+        "course_group__course__semester_id",
+        "course_group__course__semester__start_date",
+        "course_group__course__semester__end_date",
+    )
+    class_days = set()
+    for day, *semester in rows:
+        weekday = DAY_MAPPING.get(day)
+        if weekday is not None:
+            class_days.add(weekday)
 
-    # 1. Avanzar el calendario hasta encontrar el primer día que coincida (ej. el primer Jueves)
-    while current_date.weekday() != target_weekday:
-        current_date += timedelta(days=1)
-
-    # 2. Generar sesiones saltando de 7 en 7 días
-    while current_date <= lab_end_date:
-        sessions.append(
-            {
-                "number": session_number,
-                "date": current_date,
-                "day_name": lab_group.get_day_of_week_display(),  # Django display method
-                "is_today": current_date == today,
-                "is_past": current_date < today,
-                "is_future": current_date > today,
-            }
+    if not class_days:
+        return ()
+    return (*semester, tuple(sorted(class_days)))
+
+
+def _lab_spec(lab_id):
+    row = (
+        LaboratoryGroup.objects.filter(lab_id=lab_id)
+        .values_list(
+            "day_of_week",
+            "course__semester_id",
+            "course__semester__start_date",
+            "course__semester__end_date",
         )
+        .first()
+    )
+    if not row or DAY_MAPPING.get(row[0]) is None:
+        return ()
 
-        session_number += 1
-        current_date += timedelta(days=7)
+    day, semester_id, start_date, end_date = row
+    # Lab empieza 1 semana después
+    return (
+        semester_id,
+        start_date + timedelta(days=7),
+        end_date,
+        (DAY_MAPPING[day],),
+    )
 
-    return sessions
+
+# Dueños de un calendario con asistencia: campo en SessionIndex -> (spec, cómo
+# llegar desde el registro de asistencia al grupo)
+_NUMBERED = {
+    "course_group_id": (_group_spec, "enrollment__group_id"),
+    "lab_group_id": (_lab_spec, "enrollment__lab_assignment__lab_group_id"),
+}
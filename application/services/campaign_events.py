@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+# Cada cambio de cupos de una campaña queda como evento numerado en Redis.
+# Los eventos traen el valor absoluto de inscritos por lab (no +1/-1), así que
+# si alguno expira el siguiente del mismo lab lo corrige.
+SEQ_KEY = "campaign_events:{campaign_id}"
+EVENT_KEY = "campaign_events:{campaign_id}:{seq}"
+EVENT_TTL = 120
+
+# Cada cuánto el stream mira si hay eventos nuevos (solo Redis, nunca la BD)
+POLL_SECONDS = 1
+# Comentario SSE para que proxies no corten la conexión
+KEEPALIVE_SECONDS = 15
+# El navegador (EventSource) reconecta solo al cerrarse
+STREAM_SECONDS = 300
+
+
+def publish(campaign_id, seats):
+    """seats: {lab_id: inscritos}. Lo llaman los contadores de cupos"""
+    seq_key = SEQ_KEY.format(campaign_id=campaign_id)
+    cache.add(seq_key, 0, None)
+    seq = cache.incr(seq_key)
+    cache.set(
+        EVENT_KEY.format(campaign_id=campaign_id, seq=seq),
+        {str(lab_id): enrolled for lab_id, enrolled in seats.items()},
+        EVENT_TTL,
+    )
+    return seq
+
+
+def cursor(campaign_ids):
+    """Último evento de cada campaña: desde ahí empieza a escuchar un cliente"""
+    keys = {SEQ_KEY.format(campaign_id=c): c for c in campaign_ids}
+    current = cache.get_many(keys.keys())
+    return {campaign_id: current.get(key, 0) for key, campaign_id in keys.items()}
+
+
+def read_since(position):
+    """
+    Eventos nuevos desde position ({campaign_id: seq}).
+    Devuelve (nueva posición, {lab_id: inscritos}) ya fusionados: solo el último
+    valor de cada lab, que es lo único que le importa a la pantalla.
+    """
+    latest = cursor(position.keys())
+    keys = [
+        EVENT_KEY.format(campaign_id=campaign_id, seq=seq)
+        for campaign_id, last in latest.items()
+        for seq in range(position[campaign_id] + 1, last + 1)
+    ]
+    if not keys:
+        return latest, {}
+
+    events = cache.get_many(keys)
+    changes = {}
+    for key in keys:
+        changes.update(events.get(key, {}))
+    return latest, changes
+
+
+def format_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream(campaign_ids, initial, duration=STREAM_SECONDS):
+    """
+    Stream SSE: primero el estado actual (initial) y luego solo los labs que
+    cambian. Un cliente cuesta una lectura de Redis por segundo, no un Count.
+    """
+    # thread_sensitive=False: solo tocan la caché, no la BD. Con el valor por
+    # defecto cada sondeo haría cola detrás de la vista sync que esté atendiendo
+    # el worker (ej. una exportación a Excel) en su único hilo
+    position = await sync_to_async(cursor, thread_sensitive=False)(campaign_ids)
+    yield format_event("seats", initial)
+
+    deadline = time.monotonic() + duration
+    idle = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_SECONDS)
+        position, changes = await sync_to_async(read_since, thread_sensitive=False)(
+            position
+        )
+        if changes:
+            idle = 0
+            yield format_event("seats", changes)
+        else:
+            idle += POLL_SECONDS
+            if idle >= KEEPALIVE_SECONDS:
+                idle = 0
+                yield ": ping\n\n"
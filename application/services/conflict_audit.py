@@ -0,0 +1,227 @@
+from collections import namedtuple
+
+from domain.academic_structure.conflicts import overlaps_by_key, sweep_overlaps
+from infrastructure.persistence.models import (
+    ClassroomReservation,
+    LaboratoryGroup,
+    Schedule,
+    Semester,
+    StudentEnrollment,
+)
+from application.services.academic_calendar import DAY_MAPPING
+from application.services.room_occupancy import RESERVATION_BLOCKING_STATUSES
+
+# Una actividad que ocupa salón/profesor/alumnos en un bloque de tiempo.
+# activity identifica la lista de alumnos: ("GRUPO", group_id) o ("LAB", lab_id)
+Block = namedtuple(
+    "Block", "kind ref_id activity label room_id room professor_key professor"
+)
+
+WEEKDAY_NAMES = {number: name for name, number in DAY_MAPPING.items()}
+# Para no devolver miles de CUIs por cruce
+STUDENT_SAMPLE_SIZE = 5
+
+
+def audit_semester(semester_id):
+    """
+    Auditoría de cruces de todo un semestre en una pasada:
+    - Salón: dos actividades en el mismo salón a la vez
+    - Profesor: un profesor (interno o externo) en dos actividades a la vez
+    - Alumno: un alumno matriculado en dos actividades que se cruzan
+    Son 4 consultas (horarios, labs, reservas, matrículas); el resto es barrido
+    por día en memoria. Las reservas son por fecha: se cruzan con los bloques
+    semanales de su día y con otras reservas de la misma fecha.
+    """
+    semester = Semester.objects.get(semester_id=semester_id)
+    weekly = _load_weekly_blocks(semester_id)
+    reservations = _load_reservations(semester)
+
+    report = {"semester": semester, "room": [], "professor": [], "student": []}
+
+    # 1. Bloques semanales (teoría + labs)
+    for day, blocks in weekly.items():
+        for _, a, b in overlaps_by_key(blocks, lambda x: x.room_id):
+            report["room"].append(_conflict(day, a, b, a[2].room))
+        for _, a, b in overlaps_by_key(blocks, lambda x: x.professor_key):
+            report["professor"].append(_conflict(day, a, b, a[2].professor))
+
+    # 2. Reservas contra clases/labs de ese día y contra otras reservas de la fecha
+    for reservation_date, blocks in reservations.items():
+        day = WEEKDAY_NAMES.get(reservation_date.weekday())
+        label = f"{day} {reservation_date.strftime('%d/%m/%Y')}"
+        combined = weekly.get(day, []) + blocks
+        for kind, key in (("room", "room_id"), ("professor", "professor_key")):
+            wanted = {getattr(block[2], key) for block in blocks}
+            relevant = [b for b in combined if getattr(b[2], key) in wanted]
+            for _, a, b in overlaps_by_key(relevant, lambda x: getattr(x, key)):
+                if "RESERVA" in (a[2].kind, b[2].kind):
+                    resource_label = a[2].room if kind == "room" else a[2].professor
+                    report[kind].append(_conflict(label, a, b, resource_label))
+
+    # 3. Alumnos: cruces entre actividades y luego intersección de listas
+    rosters = _load_rosters(semester_id)
+    for day, blocks in weekly.items():
+        for a, b in sweep_overlaps(blocks):
+            if a[2].activity == b[2].activity:
+                continue
+            shared = (
+                rosters.get(a[2].activity, {}).keys()
+                & rosters.get(b[2].activity, {}).keys()
+            )
+            if shared:
+                conflict = _conflict(day, a, b, "")
+                conflict["students"] = len(shared)
+                conflict["sample"] = sorted(
+                    rosters[a[2].activity][student_id] for student_id in shared
+                )[:STUDENT_SAMPLE_SIZE]
+                report["student"].append(conflict)
+
+    report["stats"] = {
+        "room": len(report["room"]),
+        "professor": len(report["professor"]),
+        "student": sum(c["students"] for c in report["student"]),
+    }
+    return report
+
+
+def _conflict(day, a, b, resource):
+    (start_a, end_a, first), (start_b, end_b, second) = a, b
+    return {
+        "day": day,
+        "resource": resource,
+        "first": first.label,
+        "second": second.label,
+        "start": max(start_a, start_b),
+        "end": min(end_a, end_b),
+    }
+
+
+def _professor(user_id, external_id, first_name, last_name, external_name):
+    if user_id:
+        return ("USUARIO", user_id), f"{first_name} {last_name}".strip()
+    if external_id:
+        return ("EXTERNO", external_id), external_name
+    return None, ""
+
+
+def _load_weekly_blocks(semester_id):
+    """{dia: [(inicio, fin, Block)]} con teoría y labs del semestre"""
+    weekly = {}
+
+    for row in Schedule.objects.filter(
+        course_group__course__semester_id=semester_id
+    ).values_list(
+        "schedule_id",
+        "course_group_id",
+        "day_of_week",
+        "start_time",
+        "end_time",
+        "room_id",
+        "room__name",
+        "course_group__professor_id",
+        "course_group__professor__first_name",
+        "course_group__professor__last_name",
+        "course_group__course__course_code",
+        "course_group__group_code",
+    ):
+        (schedule_id, group_id, day, start, end, room_id, room) = row[:7]
+        professor_key, professor = _professor(row[7], None, row[8], row[9], "")
+        block = Block(
+            "CLASE",
+            schedule_id,
+            ("GRUPO", group_id),
+            f"{row[10]} - Grupo {row[11]}",
+            room_id,
+            room,
+            professor_key,
+            professor,
+        )
+        weekly.setdefault(day, []).append((start, end, block))
+
+    for row in LaboratoryGroup.objects.filter(
+        course__semester_id=semester_id
+    ).values_list(
+        "lab_id",
+        "day_of_week",
+        "start_time",
+        "end_time",
+        "room_id",
+        "room__name",
+        "professor_id",
+        "external_professor_id",
+        "professor__first_name",
+        "professor__last_name",
+        "external_professor__full_name",
+        "course__course_code",
+        "lab_nomenclature",
+    ):
+        (lab_id, day, start, end, room_id, room) = row[:6]
+        professor_key, professor = _professor(*row[6:11])
+        block = Block(
+            "LAB",
+            lab_id,
+            ("LAB", lab_id),
+            f"{row[11]} - Lab {row[12]}",
+            room_id,
+            room,
+            professor_key,
+            professor,
+        )
+        weekly.setdefault(day, []).append((start, end, block))
+
+    return weekly
+
+
+def _load_reservations(semester):
+    """{fecha: [(inicio, fin, Block)]} con reservas vigentes dentro del semestre"""
+    reservations = {}
+    for row in ClassroomReservation.objects.filter(
+        reservation_date__range=(semester.start_date, semester.end_date),
+        status__in=RESERVATION_BLOCKING_STATUSES,
+    ).values_list(
+        "reservation_id",
+        "reservation_date",
+        "start_time",
+        "end_time",
+        "classroom_id",
+        "classroom__name",
+        "professor_id",
+        "professor__first_name",
+        "professor__last_name",
+    ):
+        reservation_id, reservation_date, start, end, room_id, room = row[:6]
+        professor_key, professor = _professor(row[6], None, row[7], row[8], "")
+        block = Block(
+            "RESERVA",
+            reservation_id,
+            ("RESERVA", reservation_id),
+            f"Reserva de {professor}",
+            room_id,
+            room,
+            professor_key,
+            professor,
+        )
+        reservations.setdefault(reservation_date, []).append((start, end, block))
+    return reservations
+
+
+def _load_rosters(semester_id):
+    """{actividad: {student_id: cui}} para teoría (grupo) y lab asignado"""
+    rosters = {}
+    for student_id, cui, group_id, lab_id in (
+        StudentEnrollment.objects.filter(
+            course__semester_id=semester_id, status="ACTIVO"
+        )
+        .values_list(
+            "student_id",
+            "student__username",
+            "group_id",
+            "lab_assignment__lab_group_id",
+        )
+        .iterator(chunk_size=2000)
+    ):
+        if group_id:
+            rosters.setdefault(("GRUPO", group_id), {})[student_id] = cui
+        if lab_id:
+            rosters.setdefault(("LAB", lab_id), {})[student_id] = cui
+    return rosters
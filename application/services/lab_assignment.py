@@ -0,0 +1,445 @@
+import secrets
+import time
+from collections import namedtuple
+
+from django.db import transaction
+
+from domain.lab_enrollment.assignment import (
+    LabAssignmentEngine,
+    LabOption,
+    LabRequest,
+    NO_OPTIONS,
+    TimeBlock,
+    suggest_extra_seats,
+)
+from infrastructure.persistence.models import (
+    Course,
+    CustomUser,
+    LabAssignment,
+    LabEnrollmentCampaign,
+    LabPreference,
+    LaboratoryGroup,
+    StudentEnrollment,
+    StudentPostulation,
+)
+from application.services import seat_counters, student_timetable
+
+# Cómo queda registrada la asignación del motor (las postulaciones directas usan "DIRECTO")
+ENGINE_METHOD = "AUTOMATIC"
+LOTTERY_METHOD = "LOTTERY"
+
+# Filas por INSERT/UPDATE masivo
+WRITE_CHUNK_SIZE = 1000
+
+# Todo lo que necesita el motor, cargado de una vez
+# campaigns: {course_id: campaign_id}
+# labs: {lab_id: LabOption} con los cupos que quedan
+# requests: [LabRequest] alumnos sin lab ni postulación en la campaña
+# pinned: [(postulation_id, student_id, course_id, lab_id)] postulaciones PENDIENTE, solo falta asignar
+# enrollments: {(student_id, course_id): enrollment_id}
+# busy: {student_id: [TimeBlock]}
+AssignmentProblem = namedtuple(
+    "AssignmentProblem",
+    "campaigns labs requests pinned enrollments busy skipped_no_campaign",
+)
+
+
+def load_problem(course_ids=None, allocation_mode="DIRECTO"):
+    """
+    Carga en memoria campañas abiertas, labs, cupos ocupados y el horario de los
+    alumnos que faltan asignar. Son 6 consultas sin importar cuántos alumnos haya.
+    Las campañas por sorteo solo se cargan al cerrarlas (allocation_mode="SORTEO").
+    """
+    campaigns = {}
+    campaign_qs = LabEnrollmentCampaign.objects.filter(
+        is_closed=False, allocation_mode=allocation_mode
+    )
+    if course_ids:
+        campaign_qs = campaign_qs.filter(course_id__in=course_ids)
+    for course_id, campaign_id in campaign_qs.order_by("created_at").values_list(
+        "course_id", "campaign_id"
+    ):
+        campaigns.setdefault(course_id, campaign_id)
+
+    pending = StudentEnrollment.objects.filter(
+        status="ACTIVO", lab_assignment__isnull=True
+    )
+    if course_ids:
+        pending = pending.filter(course_id__in=course_ids)
+
+    enrollments = {}
+    skipped_no_campaign = 0
+    for enrollment_id, student_id, course_id in pending.values_list(
+        "enrollment_id", "student_id", "course_id"
+    ):
+        if course_id in campaigns:
+            enrollments[(student_id, course_id)] = enrollment_id
+        else:
+            skipped_no_campaign += 1
+
+    # Cupos: a propósito cuentan todas las postulaciones de la campaña, sea cual
+    # sea su estado. Es lo mismo que cuentan seat_counters y postulate_to_lab; si
+    # el motor contara menos, llenaría cupos que el contador en vivo da por tomados.
+    # En cambio solo se fijan (y se convierten en asignación) las PENDIENTE: una
+    # postulación rechazada o cancelada no es un lab para el alumno.
+    used = {}
+    pinned = []
+    closed = set()
+    course_by_campaign = {v: k for k, v in campaigns.items()}
+    postulations = StudentPostulation.objects.filter(
+        campaign_id__in=campaigns.values()
+    ).values_list(
+        "postulation_id", "campaign_id", "student_id", "lab_group_id", "status"
+    )
+    for postulation_id, campaign_id, student_id, lab_id, status in postulations:
+        used[lab_id] = used.get(lab_id, 0) + 1
+        course_id = course_by_campaign[campaign_id]
+        if (student_id, course_id) not in enrollments:
+            continue
+        if status == "PENDIENTE":
+            pinned.append((postulation_id, student_id, course_id, lab_id))
+        else:
+            # Ya tuvo su postulación en esta campaña (una por alumno): no se crea otra
+            closed.add((student_id, course_id))
+
+    labs = {}
+    for lab_id, course_id, capacity, day, start, end, code, nomenclature in (
+        LaboratoryGroup.objects.filter(course_id__in=campaigns.keys())
+        .order_by("lab_nomenclature")
+        .values_list(
+            "lab_id",
+            "course_id",
+            "capacity",
+            "day_of_week",
+            "start_time",
+            "end_time",
+            "course__course_code",
+            "lab_nomenclature",
+        )
+    ):
+        labs[lab_id] = LabOption(
+            lab_id,
+            course_id,
+            max(capacity - used.get(lab_id, 0), 0),
+            TimeBlock(day, start, end, f"{code} - Lab {nomenclature}"),
+        )
+
+    excluded = {(student_id, course_id) for _, student_id, course_id, _ in pinned}
+    excluded |= closed
+    requests = [
+        LabRequest(student_id, course_id, None)
+        for student_id, course_id in enrollments
+        if (student_id, course_id) not in excluded
+    ]
+
+    busy = _load_timetables(pending.values("student_id"))
+    for _, student_id, _, lab_id in pinned:
+        if lab_id in labs:
+            busy.setdefault(student_id, []).append(labs[lab_id].block)
+
+    return AssignmentProblem(
+        campaigns, labs, requests, pinned, enrollments, busy, skipped_no_campaign
+    )
+
+
+def _load_timetables(students):
+    """
+    {student_id: [TimeBlock]} con teoría, labs asignados y postulaciones pendientes
+    (lo mismo que revisa StudentService._check_student_lab_conflict), en 3 consultas.
+    """
+    busy = {}
+
+    active = StudentEnrollment.objects.filter(student_id__in=students, status="ACTIVO")
+    sources = (
+        (
+            "{} - Grupo {}",
+            active.filter(group__schedules__isnull=False).values_list(
+                "student_id",
+                "group__schedules__day_of_week",
+                "group__schedules__start_time",
+                "group__schedules__end_time",
+                "course__course_code",
+                "group__group_code",
+            ),
+        ),
+        (
+            "{} - Lab {}",
+            active.filter(lab_assignment__isnull=False).values_list(
+                "student_id",
+                "lab_assignment__lab_group__day_of_week",
+                "lab_assignment__lab_group__start_time",
+                "lab_assignment__lab_group__end_time",
+                "course__course_code",
+                "lab_assignment__lab_group__lab_nomenclature",
+            ),
+        ),
+        (
+            "{} - Lab {} (postulación)",
+            StudentPostulation.objects.filter(
+                student_id__in=students, status="PENDIENTE"
+            ).values_list(
+                "student_id",
+                "lab_group__day_of_week",
+                "lab_group__start_time",
+                "lab_group__end_time",
+                "lab_group__course__course_code",
+                "lab_group__lab_nomenclature",
+            ),
+        ),
+    )
+    for label, rows in sources:
+        for student_id, day, start, end, *names in rows:
+            busy.setdefault(student_id, []).append(
+                TimeBlock(day, start, end, label.format(*names))
+            )
+
+    return busy
+
+
+def solve(problem, strategy="optimo"):
+    """
+    strategy: "optimo" hace matching por curso; "precarga" da el primer lab
+    libre, como el comando de siempre
+    """
+    engine = LabAssignmentEngine(problem.labs.values(), problem.busy)
+    if strategy == "precarga":
+        return engine.solve_first_fit(problem.requests)
+    return engine.solve(problem.requests)
+
+
+@transaction.atomic
+def persist(
+    problem,
+    result,
+    chunk_size=WRITE_CHUNK_SIZE,
+    progress_callback=None,
+    method=ENGINE_METHOD,
+):
+    """
+    Guarda el resultado con inserciones masivas por lotes: postulaciones nuevas,
+    asignaciones y el lab en cada matrícula. Las postulaciones que ya existían
+    solo pasan a ACEPTADO.
+    progress_callback recibe {"phase", "done", "total"} por lote.
+    """
+
+    def write(phase, items, action):
+        for start in range(0, len(items), chunk_size):
+            action(items[start : start + chunk_size])
+            if progress_callback:
+                progress_callback(
+                    {
+                        "phase": phase,
+                        "done": min(start + chunk_size, len(items)),
+                        "total": len(items),
+                    }
+                )
+
+    postulations = [
+        StudentPostulation(
+            campaign_id=problem.campaigns[course_id],
+            student_id=student_id,
+            lab_group_id=lab_id,
+            status="ACEPTADO",
+        )
+        for (student_id, course_id), lab_id in result.assigned.items()
+    ]
+    write("postulaciones", postulations, StudentPostulation.objects.bulk_create)
+
+    write(
+        "postulaciones previas",
+        [postulation_id for postulation_id, *_ in problem.pinned],
+        lambda ids: StudentPostulation.objects.filter(postulation_id__in=ids).update(
+            status="ACEPTADO"
+        ),
+    )
+
+    assignments = [
+        LabAssignment(
+            postulation_id=postulation.postulation_id,
+            student_id=postulation.student_id,
+            lab_group_id=postulation.lab_group_id,
+            assignment_method=method,
+        )
+        for postulation in postulations
+    ] + [
+        LabAssignment(
+            postulation_id=postulation_id,
+            student_id=student_id,
+            lab_group_id=lab_id,
+            assignment_method="DIRECTO",
+        )
+        for postulation_id, student_id, _, lab_id in problem.pinned
+    ]
+    write("asignaciones", assignments, LabAssignment.objects.bulk_create)
+
+    course_by_lab = {lab_id: lab.course_id for lab_id, lab in problem.labs.items()}
+    enrollments = [
+        StudentEnrollment(
+            enrollment_id=problem.enrollments[
+                (assignment.student_id, course_by_lab[assignment.lab_group_id])
+            ],
+            lab_assignment_id=assignment.assignment_id,
+        )
+        for assignment in assignments
+    ]
+    write(
+        "matrículas",
+        enrollments,
+        lambda chunk: StudentEnrollment.objects.bulk_update(chunk, ["lab_assignment"]),
+    )
+
+    # bulk_create no pasa por los contadores de cupos ni por las señales:
+    # igualo los contadores a la BD y borro el horario en bits de los asignados
+    campaign_ids = list(problem.campaigns.values())
+    student_ids = {assignment.student_id for assignment in assignments}
+    transaction.on_commit(lambda: seat_counters.reconcile(campaign_ids))
+    transaction.on_commit(lambda: student_timetable.invalidate(student_ids))
+
+    return assignments
+
+
+def summarize(problem, result):
+    unassigned = list(result.unassigned.values())
+    return {
+        "assigned": len(result.assigned) + len(problem.pinned),
+        "skipped_no_campaign": problem.skipped_no_campaign,
+        "skipped_conflict": unassigned.count(NO_OPTIONS),
+        "skipped_full": len(unassigned) - unassigned.count(NO_OPTIONS),
+    }
+
+
+def assign_all(
+    course_ids=None,
+    strategy="optimo",
+    chunk_size=WRITE_CHUNK_SIZE,
+    progress_callback=None,
+):
+    """
+    Carga, resuelve y guarda. Devuelve el mismo resumen que imprime asignar_labs
+    más "timings": segundos de cada fase (carga, asignación, escritura).
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    problem = load_problem(course_ids)
+    timings["carga"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = solve(problem, strategy)
+    timings["asignacion"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    persist(problem, result, chunk_size, progress_callback)
+    timings["escritura"] = time.perf_counter() - started
+
+    summary = summarize(problem, result)
+    summary["timings"] = timings
+    return summary
+
+
+def run_lottery(campaign, seed=None):
+    """
+    Cierre de una campaña por sorteo: reparte todos los cupos de una vez con
+    las preferencias que registraron los alumnos y lo guarda en bloque.
+    Devuelve el resumen de siempre más la semilla usada, que se guarda en la
+    campaña para poder repetir (auditar) el sorteo.
+    """
+    seed = seed or secrets.token_hex(8)
+    problem = load_problem([campaign.course_id], allocation_mode="SORTEO")
+
+    preferences = {}
+    for student_id, lab_id in (
+        LabPreference.objects.filter(campaign=campaign)
+        .order_by("student_id", "rank")
+        .values_list("student_id", "lab_group_id")
+    ):
+        preferences.setdefault((student_id, campaign.course_id), []).append(lab_id)
+
+    engine = LabAssignmentEngine(problem.labs.values(), problem.busy)
+    result = engine.solve_lottery(problem.requests, preferences, seed)
+    persist(problem, result, method=LOTTERY_METHOD)
+
+    summary = summarize(problem, result)
+    summary["seed"] = seed
+    summary["first_choice"] = sum(
+        1
+        for key, lab_id in result.assigned.items()
+        if preferences.get(key, [None])[0] == lab_id
+    )
+    return summary
+
+
+def simulate(course_ids=None, strategy="optimo"):
+    """
+    Simulación (dry-run): corre la asignación completa en memoria y no escribe
+    nada. Sirve para ver, antes de cerrar la campaña, quién se quedaría sin lab,
+    por qué (cruce o falta de cupo) y cuántos cupos habría que agregar.
+    Se puede correr las veces que haga falta mientras se ajustan capacidades.
+    """
+    started = time.perf_counter()
+    problem = load_problem(course_ids)
+    result = solve(problem, strategy)
+    extra = suggest_extra_seats(result)
+
+    courses = {
+        course_id: {
+            "course_id": str(course_id),
+            "course_code": code,
+            "course_name": name,
+            "demand": 0,
+            "free_seats": 0,
+            "assigned": 0,
+            "unassigned": [],
+            "extra_seats": [],
+        }
+        for course_id, code, name in Course.objects.filter(
+            course_id__in=problem.campaigns.keys()
+        ).values_list("course_id", "course_code", "course_name")
+    }
+
+    for lab_id, lab in problem.labs.items():
+        course = courses[lab.course_id]
+        course["free_seats"] += lab.seats
+        if lab_id in extra:
+            course["extra_seats"].append(
+                {
+                    "lab_id": str(lab_id),
+                    "label": lab.block.label,
+                    "seats": extra[lab_id],
+                }
+            )
+
+    for request in problem.requests:
+        courses[request.course_id]["demand"] += 1
+    for _, course_id in result.assigned:
+        courses[course_id]["assigned"] += 1
+
+    students = {
+        pk: (cui, f"{first_name} {last_name}".strip())
+        for pk, cui, first_name, last_name in CustomUser.objects.filter(
+            pk__in={student_id for student_id, _ in result.unassigned}
+        ).values_list("pk", "username", "first_name", "last_name")
+    }
+    for (student_id, course_id), reason in result.unassigned.items():
+        cui, full_name = students.get(student_id, ("", ""))
+        courses[course_id]["unassigned"].append(
+            {
+                "cui": cui,
+                "full_name": full_name,
+                "reason": reason,
+                "causes": result.causes.get((student_id, course_id), []),
+            }
+        )
+
+    for course in courses.values():
+        course["unassigned"].sort(key=lambda row: (row["reason"], row["full_name"]))
+        course["extra_seats"].sort(key=lambda row: row["label"])
+
+    summary = summarize(problem, result)
+    summary["extra_seats"] = sum(extra.values())
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+
+    return {
+        "summary": summary,
+        "courses": sorted(courses.values(), key=lambda c: c["course_code"]),
+    }
@@ -0,0 +1,159 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from infrastructure.persistence.models import (
+    Course,
+    CourseGroup,
+    LabEnrollmentCampaign,
+    LaboratoryGroup,
+    StudentEnrollment,
+    StudentPostulation,
+)
+
+# Tablero de Gestión de Laboratorios ya armado para todos los cursos.
+# Las señales lo borran cuando cambian labs, campañas o docentes de teoría;
+# el TTL corto cubre matrículas y postulaciones (los cupos en vivo llegan por SSE).
+KEY = "lab_overview"
+TIMEOUT = 60
+
+
+def invalidate():
+    cache.delete(KEY)
+
+
+def get():
+    courses_data = cache.get(KEY)
+    if courses_data is None:
+        courses_data = _build()
+        cache.set(KEY, courses_data, TIMEOUT)
+    return courses_data
+
+
+def labs_needed(count):
+    if count <= 30:
+        return 1
+    elif count <= 60:
+        return 2
+    return 3
+
+
+def lab_status(enrolled, capacity):
+    """Vacío, normal, casi lleno o reventando de gente"""
+    if enrolled == 0:
+        return "empty"
+    elif enrolled < capacity * 0.8:
+        return "normal"
+    elif enrolled <= capacity:
+        return "almost-full"
+    return "exceeded"
+
+
+def campaign_status(campaign, labs, enrolled):
+    """
+    Estado de la campaña con sus labs. enrolled: {lab_id: postulaciones}.
+    Mismo formato que SecretariaService.get_campaign_status.
+    """
+    if not campaign:
+        return {"exists": False}
+
+    labs_data = []
+    for lab in labs:
+        count = enrolled.get(lab.lab_id, 0)
+        labs_data.append(
+            {
+                "lab_id": str(lab.lab_id),
+                "nomenclature": lab.lab_nomenclature,
+                "capacity": lab.capacity,
+                "enrolled": count,
+                "available": max(0, lab.capacity - count),
+                "status": lab_status(count, lab.capacity),
+            }
+        )
+
+    return {
+        "exists": True,
+        "campaign_id": str(campaign.campaign_id),
+        "is_active": not campaign.is_closed,
+        "is_closed": campaign.is_closed,
+        "start_date": campaign.start_date.isoformat(),
+        "end_date": campaign.end_date.isoformat(),
+        "labs": labs_data,
+    }
+
+
+def _build():
+    """
+    Todo el tablero en 6 consultas agrupadas, sin importar cuántos cursos
+    (antes eran ~8 por curso).
+    """
+    courses = list(
+        Course.objects.filter(syllabus__isnull=False, syllabus__lab_hours__gt=0)
+        .select_related("syllabus")
+        .distinct()
+    )
+    course_ids = [course.course_id for course in courses]
+
+    enrollment_counts = dict(
+        StudentEnrollment.objects.filter(course_id__in=course_ids, status="ACTIVO")
+        .values_list("course_id")
+        .annotate(total=Count("enrollment_id"))
+        .order_by()
+    )
+
+    labs = {course_id: [] for course_id in course_ids}
+    for lab in LaboratoryGroup.objects.filter(course_id__in=course_ids).select_related(
+        "room", "professor", "external_professor"
+    ):
+        labs[lab.course_id].append(lab)
+
+    theory_ids = {course_id: [] for course_id in course_ids}
+    for course_id, professor_id in CourseGroup.objects.filter(
+        course_id__in=course_ids, professor__isnull=False
+    ).values_list("course_id", "professor_id"):
+        theory_ids[course_id].append(professor_id)
+
+    # La campaña más reciente de cada curso
+    campaigns = {}
+    for campaign in LabEnrollmentCampaign.objects.filter(
+        course_id__in=course_ids
+    ).order_by("course_id", "-created_at"):
+        campaigns.setdefault(campaign.course_id, campaign)
+
+    enrolled = {}
+    for campaign_id, lab_id, total in (
+        StudentPostulation.objects.filter(
+            campaign_id__in=[c.campaign_id for c in campaigns.values()]
+        )
+        .values_list("campaign_id", "lab_group_id")
+        .annotate(total=Count("postulation_id"))
+        .order_by()
+    ):
+        enrolled.setdefault(campaign_id, {})[lab_id] = total
+
+    courses_data = []
+    for course in courses:
+        count = enrollment_counts.get(course.course_id, 0)
+        needed = labs_needed(count)
+        existing = labs[course.course_id]
+        total_capacity = sum(lab.capacity for lab in existing)
+        campaign = campaigns.get(course.course_id)
+
+        courses_data.append(
+            {
+                "course": course,
+                "enrollment_count": count,
+                "labs_needed": needed,
+                "existing_labs": existing,
+                "labs_missing": max(0, needed - len(existing)),
+                "has_all_labs": len(existing) >= needed,
+                "theory_professors_ids": theory_ids[course.course_id],
+                "can_enable_enrollment": total_capacity >= count,
+                "total_capacity": total_capacity,
+                "campaign_status": campaign_status(
+                    campaign,
+                    existing,
+                    enrolled.get(campaign.campaign_id, {}) if campaign else {},
+                ),
+            }
+        )
+    return courses_data
@@ -26,9 +26,11 @@ from infrastructure.persistence.models import (
     ClassroomReservation,
     Classroom,
 )
+from domain.academic_performance import attendance as attendance_vector
 
 # Imports de otros servicios
 from application.services.academic_calendar import get_group_sessions, get_lab_sessions
+from application.services import report_cache, room_occupancy
 
 
 class ProfessorService:
@@ -273,25 +275,25 @@ class ProfessorService:
             else get_lab_sessions(group)
         )
 
-        # Obtener todos los registros en una sola consulta
-        records = AttendanceRecord.objects.filter(enrollment__in=enrollments)
-        records_map = {}
-        for r in records:
-            if r.enrollment_id not in records_map:
-                records_map[r.enrollment_id] = {}
-            records_map[r.enrollment_id][r.session_number] = r.status
-
-        # Construir matriz
+        # Construir matriz: cada fila sale del vector de la matrícula, sin
+        # leer los registros de asistencia
         matrix = []
         for env in enrollments:
-            row = {"student": env.student, "enrollment": env, "attendance_data": []}
+            vector = env.attendance_vector
+            row = {
+                "student": env.student,
+                "enrollment": env,
+                "attendance_data": [],
+                "absence_streak": attendance_vector.current_absence_streak(vector),
+            }
+            row["absence_alert"] = (
+                row["absence_streak"] >= attendance_vector.ABSENCE_ALERT_STREAK
+            )
             for s in sessions:
                 row["attendance_data"].append(
                     {
                         "session_number": s["number"],
-                        "status": records_map.get(env.enrollment_id, {}).get(
-                            s["number"], "-"
-                        ),
+                        "status": attendance_vector.status_at(vector, s["number"]),
                     }
                 )
             matrix.append(row)
@@ -304,6 +306,53 @@ class ProfessorService:
             "matrix": matrix,
         }
 
+    def get_attendance_excel_file(self, user, group_id):
+        """
+        Ruta en media del Excel de asistencia. Solo se arma la matriz y el
+        workbook si cambió algún registro o la lista desde la última descarga.
+        """
+        group, group_type = self._find_group_by_id(user, group_id)
+        if not group:
+            return None
+
+        enrollments = self._get_group_enrollments(group, group_type)
+        state = enrollments.order_by().aggregate(
+            last_record=Max("attendance_records__updated_at"),
+            records=Count("attendance_records", distinct=True),
+            last_enrollment=Max("updated_at"),
+            enrollments=Count("enrollment_id", distinct=True),
+        )
+        # Las fechas de sesión dependen del semestre y del horario del grupo
+        semester = group.course.semester
+        if group_type == "course":
+            schedule = group.schedules.aggregate(
+                last=Max("updated_at"), total=Count("pk")
+            )
+        else:
+            schedule = (group.day_of_week, group.start_time, group.end_time)
+        # Un feriado o recuperación corre las sesiones sin tocar updated_at
+        exceptions = sorted(
+            semester.calendar_exceptions.values_list(
+                "exception_id", "date", "kind", "makeup_for_day"
+            )
+        )
+        version = report_cache.version_stamp(
+            *state.values(),
+            semester.start_date,
+            semester.end_date,
+            schedule,
+            exceptions,
+        )
+
+        def build():
+            data = self.get_attendance_report_matrix(user, group_id)
+            return self.generate_attendance_excel(
+                data["group"], data["sessions"], data["matrix"]
+            )
+
+        file_path = report_cache.get_or_build("attendance", group_id, version, build)
+        return file_path, f"Asistencia_{group.course.course_code}.xlsx"
+
     def generate_attendance_excel(self, group, sessions, matrix):
         """Genera un archivo Excel con la matriz de asistencia"""
         wb = openpyxl.Workbook()
@@ -800,15 +849,15 @@ class ProfessorService:
             )
 
     def _determine_current_session(self, all_sessions, date_str):
-        """Busca sesión por fecha o retorna la de hoy/última"""
+        """Busca sesión por fecha (en el índice, sin recorrer) o retorna la de hoy/última"""
         if date_str:
             try:
                 target = datetime.strptime(date_str, "%Y-%m-%d").date()
-                return next((s for s in all_sessions if s["date"] == target), None)
+                return all_sessions.on(target)
             except ValueError:
                 pass
 
-        today = next((s for s in all_sessions if s["is_today"]), None)
+        today = all_sessions.on(date.today())
 
         last_session = all_sessions[-1] if all_sessions else None
         return today if today else last_session
@@ -821,19 +870,33 @@ class ProfessorService:
         )
 
         if not records.exists() and session["is_today"]:
-            new_recs = [
-                AttendanceRecord(
-                    enrollment=e,
-                    session_number=session["number"],
-                    session_date=session["date"],
-                    status="F",
-                    professor_ip="0.0.0.0",
-                    recorded_by=user,
+            with transaction.atomic():
+                vectors = StudentEnrollment.lock_attendance(
+                    e.enrollment_id for e in enrollments
                 )
-                for e in enrollments
-            ]
-            AttendanceRecord.objects.bulk_create(new_recs)
-            return {str(r.enrollment_id): "F" for r in new_recs}
+                # Con las matrículas bloqueadas vuelvo a mirar: otro pedido (o el
+                # profe guardando) pudo crear la sesión mientras tanto
+                if not records.exists():
+                    new_recs = [
+                        AttendanceRecord(
+                            enrollment=e,
+                            session_number=session["number"],
+                            session_date=session["date"],
+                            status="F",
+                            professor_ip="0.0.0.0",
+                            recorded_by=user,
+                        )
+                        for e in enrollments
+                    ]
+                    AttendanceRecord.objects.bulk_create(new_recs)
+                    StudentEnrollment.apply_attendance_changes(
+                        (
+                            (r.enrollment_id, r.session_number, None, "F")
+                            for r in new_recs
+                        ),
+                        vectors,
+                    )
+                    return {str(r.enrollment_id): "F" for r in new_recs}
 
         return {str(r.enrollment_id): r.status for r in records}
 
@@ -848,21 +911,14 @@ class ProfessorService:
         return {"percentage": pct, "color": "success" if pct > 80 else "primary"}
 
     def _is_within_lab_schedule(self, lab):
-        """Valida si la hora actual corresponde al horario del lab"""
+        """
+        Valida si la hora actual corresponde al horario del lab.
+        Solo se llama si hoy hay sesión según el calendario (que ya sabe de
+        feriados y recuperaciones), así que aquí solo se revisa la hora.
+        """
         now = datetime.now()
         current_time = now.time()
 
-        # Mapeo simple de días en inglés a español
-        days = {
-            "MONDAY": "LUNES",
-            "TUESDAY": "MARTES",
-            "WEDNESDAY": "MIERCOLES",
-            "THURSDAY": "JUEVES",
-            "FRIDAY": "VIERNES",
-        }
-        if days.get(now.strftime("%A").upper()) != lab.day_of_week:
-            return False, f"El laboratorio es los {lab.get_day_of_week_display()}."
-
         # Margen de 15 minutos
         start_m = (
             datetime.combine(date.today(), lab.start_time) - timedelta(minutes=15)
@@ -881,23 +937,64 @@ class ProfessorService:
     def save_attendance_and_topics(
         self, enrollments, session_num, session_date, post_data, user, ip, group
     ):
-        """Guarda asistencia y temas (con límite diario)"""
+        """
+        Guarda asistencia y temas (con límite diario).
+        La asistencia de toda la sesión va en un solo upsert (la clave es
+        matrícula + sesión); con los estados anteriores se mueven los contadores
+        y el vector de cada matrícula (un UPDATE por tipo de cambio, no por alumno).
+        Las matrículas se bloquean antes de leer los estados anteriores, para que
+        dos guardados a la vez de la misma sesión no cuenten dos veces.
+        """
         with transaction.atomic():
             # 1. Asistencia
+            records = []
             for enrollment in enrollments:
                 status = post_data.get(f"attendance_{enrollment.enrollment_id}")
                 if status:
-                    AttendanceRecord.objects.update_or_create(
-                        enrollment=enrollment,
-                        session_number=session_num,
-                        defaults={
-                            "session_date": session_date,
-                            "status": status,
-                            "professor_ip": ip,
-                            "recorded_by": user,
-                        },
+                    records.append(
+                        AttendanceRecord(
+                            enrollment_id=enrollment.enrollment_id,
+                            session_number=session_num,
+                            session_date=session_date,
+                            status=status,
+                            professor_ip=ip,
+                            recorded_by=user,
+                        )
                     )
-                    enrollment.calculate_attendance_percentage()
+            if records:
+                vectors = StudentEnrollment.lock_attendance(
+                    r.enrollment_id for r in records
+                )
+                previous = dict(
+                    AttendanceRecord.objects.filter(
+                        enrollment_id__in=[r.enrollment_id for r in records],
+                        session_number=session_num,
+                    ).values_list("enrollment_id", "status")
+                )
+                AttendanceRecord.objects.bulk_create(
+                    records,
+                    update_conflicts=True,
+                    unique_fields=["enrollment", "session_number"],
+                    update_fields=[
+                        "session_date",
+                        "status",
+                        "professor_ip",
+                        "recorded_by",
+                        "updated_at",
+                    ],
+                )
+                StudentEnrollment.apply_attendance_changes(
+                    (
+                        (
+                            r.enrollment_id,
+                            r.session_number,
+                            previous.get(r.enrollment_id),
+                            r.status,
+                        )
+                        for r in records
+                    ),
+                    vectors,
+                )
 
             # 2. Temas (Solo Teoría)
             if group:
@@ -956,10 +1053,6 @@ class ProfessorService:
         Considera: horarios regulares, labs, y otras reservas aprobadas.
         """
 
-        def time_overlap(s1, e1, s2, e2):
-            """Helper para detectar cruces de horario"""
-            return s1 < e2 and s2 < e1
-
         # Obtener día de la semana
         day_name = date_obj.strftime("%A").upper()
         day_mapping = {
@@ -971,45 +1064,10 @@ class ProfessorService:
         }
         day_spanish = day_mapping.get(day_name, "LUNES")
 
-        occupied_ids = set()
-
-        # 1. Aulas ocupadas por horarios regulares de teoría
-        regular_schedules = Schedule.objects.filter(
-            day_of_week=day_spanish
-        ).select_related("room")
-
-        for schedule in regular_schedules:
-            if schedule.room and time_overlap(
-                start_time, end_time, schedule.start_time, schedule.end_time
-            ):
-                occupied_ids.add(schedule.room.classroom_id)
-
-        # 2. Aulas ocupadas por laboratorios
-        labs = LaboratoryGroup.objects.filter(day_of_week=day_spanish).select_related(
-            "room"
-        )
-
-        for lab in labs:
-            if lab.room and time_overlap(
-                start_time, end_time, lab.start_time, lab.end_time
-            ):
-                occupied_ids.add(lab.room.classroom_id)
-
-        # 3. Aulas con reservas aprobadas o pendientes en esa fecha
-        reservations = ClassroomReservation.objects.filter(
-            reservation_date=date_obj, status__in=["PENDIENTE", "APROBADA"]
-        ).select_related("classroom")
-
-        for reservation in reservations:
-            if time_overlap(
-                start_time, end_time, reservation.start_time, reservation.end_time
-            ):
-                occupied_ids.add(reservation.classroom.classroom_id)
-
-        # Retornar aulas disponibles
+        # Clases, labs y reservas pendientes/aprobadas de esa fecha: una sola consulta
         available = (
-            Classroom.objects.filter(is_active=True)
-            .exclude(classroom_id__in=occupied_ids)
+            room_occupancy.free_classrooms(day_spanish, start_time, end_time, date_obj)
+            .filter(is_active=True)
             .order_by("classroom_type", "name")
         )
 
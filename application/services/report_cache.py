@@ -0,0 +1,69 @@
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+# Carpeta en media donde quedan los Excel ya generados, uno por grupo y versión
+CACHE_ROOT = "reports/cache"
+
+# Solo se borran versiones que llevan un rato sin tocarse: una petición que
+# leyó el estado viejo puede guardar su versión después de la nueva, y no
+# tiene cómo saber cuál es la vigente
+PRUNE_AFTER = timedelta(minutes=10)
+
+
+def version_stamp(*parts):
+    """
+    Convierte lo que identifica el estado de un reporte (última escritura,
+    conteos, etc.) en un sello corto para el nombre del archivo.
+    """
+    raw = "|".join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def get_or_build(kind, key, version, builder, rebuild=False):
+    """
+    Devuelve la ruta en media del Excel para (kind, key) en esa versión.
+    Si no existe (o se pide rebuild) lo arma con builder() (que retorna un
+    Workbook), lo guarda y borra las versiones viejas del mismo grupo (las
+    que pasaron PRUNE_AFTER sin tocarse).
+    """
+    folder = f"{CACHE_ROOT}/{kind}/{key}"
+    file_path = f"{folder}/{version}.xlsx"
+    if not rebuild and default_storage.exists(file_path):
+        return file_path
+
+    wb = builder()
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        if rebuild:
+            default_storage.delete(file_path)
+        # Si otra petición lo generó en paralelo me quedo con el suyo
+        if not default_storage.exists(file_path):
+            default_storage.save(file_path, File(tmp))
+
+    _delete_old_versions(folder, keep=f"{version}.xlsx")
+    return file_path
+
+
+def _delete_old_versions(folder, keep):
+    try:
+        _, files = default_storage.listdir(folder)
+    except (FileNotFoundError, NotImplementedError):
+        return
+
+    limit = timezone.now() - PRUNE_AFTER
+    for name in files:
+        if name == keep:
+            continue
+        path = os.path.join(folder, name)
+        try:
+            if default_storage.get_modified_time(path) < limit:
+                default_storage.delete(path)
+        except (FileNotFoundError, NotImplementedError):
+            continue
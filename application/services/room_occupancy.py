@@ -0,0 +1,100 @@
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from domain.academic_structure.occupancy import Occupancy, RoomOccupancyIndex
+from infrastructure.persistence.models import (
+    Classroom,
+    ClassroomReservation,
+    LaboratoryGroup,
+    Schedule,
+)
+
+# Versión compartida (Redis): cualquier cambio en horarios, labs o reservas la rota
+VERSION_KEY = "room_occupancy:version"
+# Índices ya armados en este proceso, por (versión, día, fecha)
+_indexes = {}
+MAX_INDEXES = 64
+
+RESERVATION_BLOCKING_STATUSES = ["PENDIENTE", "APROBADA"]
+
+
+def invalidate():
+    """Se llama desde las señales de Schedule, LaboratoryGroup y ClassroomReservation"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_day_index(day_of_week, reservation_date=None):
+    """
+    Índice de ocupación para un día de la semana (clases y labs).
+    Si paso una fecha también entran las reservas pendientes/aprobadas de esa fecha.
+    """
+    key = (_current_version(), day_of_week, reservation_date)
+    index = _indexes.get(key)
+    if index is None:
+        if len(_indexes) >= MAX_INDEXES:
+            _indexes.clear()
+        index = RoomOccupancyIndex(_load_entries(day_of_week, reservation_date))
+        _indexes[key] = index
+    return index
+
+
+def _load_entries(day_of_week, reservation_date):
+    for room_id, start, end, schedule_id in Schedule.objects.filter(
+        day_of_week=day_of_week, room__isnull=False
+    ).values_list("room_id", "start_time", "end_time", "schedule_id"):
+        yield room_id, Occupancy(start, end, "CLASE", schedule_id, "")
+
+    for room_id, start, end, lab_id, nomenclature in LaboratoryGroup.objects.filter(
+        day_of_week=day_of_week, room__isnull=False
+    ).values_list("room_id", "start_time", "end_time", "lab_id", "lab_nomenclature"):
+        yield room_id, Occupancy(start, end, "LAB", lab_id, nomenclature)
+
+    if reservation_date:
+        for room_id, start, end, reservation_id in ClassroomReservation.objects.filter(
+            reservation_date=reservation_date,
+            status__in=RESERVATION_BLOCKING_STATUSES,
+        ).values_list("classroom_id", "start_time", "end_time", "reservation_id"):
+            yield room_id, Occupancy(start, end, "RESERVA", reservation_id, "")
+
+
+def free_classrooms(day_of_week, start, end, reservation_date=None):
+    """
+    Salones sin cruce en [start, end) resueltos en una sola consulta: un
+    NOT EXISTS por tabla con el predicado de solape start < fin AND inicio < end.
+    Cada subconsulta usa el índice (salón, día/fecha, inicio).
+    """
+    busy_class = Schedule.objects.filter(
+        room=OuterRef("pk"),
+        day_of_week=day_of_week,
+        start_time__lt=end,
+        end_time__gt=start,
+    )
+    busy_lab = LaboratoryGroup.objects.filter(
+        room=OuterRef("pk"),
+        day_of_week=day_of_week,
+        start_time__lt=end,
+        end_time__gt=start,
+    )
+    rooms = Classroom.objects.filter(~Exists(busy_class), ~Exists(busy_lab))
+
+    if reservation_date:
+        busy_reservation = ClassroomReservation.objects.filter(
+            classroom=OuterRef("pk"),
+            reservation_date=reservation_date,
+            status__in=RESERVATION_BLOCKING_STATUSES,
+            start_time__lt=end,
+            end_time__gt=start,
+        )
+        rooms = rooms.filter(~Exists(busy_reservation))
+
+    return rooms
@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from infrastructure.persistence.models import LabEnrollmentCampaign, StudentPostulation
+from application.services import campaign_events
+
+# Cupos ocupados de un lab en una campaña. En producción vive en Redis (INCR/DECR atómicos)
+KEY = "lab_seats:{campaign_id}:{lab_id}"
+
+
+def _key(campaign_id, lab_id):
+    return KEY.format(campaign_id=campaign_id, lab_id=lab_id)
+
+
+def _load(campaign_id, lab_id):
+    """Arranca el contador desde la BD. Si otro proceso ya lo cargó, gana el suyo (add)"""
+    taken = StudentPostulation.objects.filter(
+        campaign_id=campaign_id, lab_group_id=lab_id
+    ).count()
+    cache.add(_key(campaign_id, lab_id), taken, None)
+
+
+def reserve(campaign_id, lab):
+    """
+    Intenta tomar un cupo del lab. Un INCR atómico: si me paso de la capacidad
+    lo devuelvo y rechazo. No cuenta postulaciones, así que es O(1) aunque
+    cientos de alumnos postulen en el mismo minuto, y dos pedidos a la vez
+    nunca pueden quedarse con el último cupo.
+    """
+    key = _key(campaign_id, lab.lab_id)
+    for _ in range(2):
+        try:
+            taken = cache.incr(key)
+        except ValueError:
+            # Todavía no existe (o Redis lo expulsó): lo cargo y reintento
+            _load(campaign_id, lab.lab_id)
+            continue
+
+        if taken <= lab.capacity:
+            campaign_events.publish(campaign_id, {lab.lab_id: taken})
+            return True
+        # Me pasé: lo devuelvo sin avisar, para las pantallas nunca cambió
+        _decr(key)
+        return False
+    return False
+
+
+def release(campaign_id, lab_id):
+    """Devuelve un cupo (postulación borrada o que no llegó a guardarse)"""
+    taken = _decr(_key(campaign_id, lab_id))
+    if taken is not None:
+        campaign_events.publish(campaign_id, {lab_id: taken})
+
+
+def _decr(key):
+    try:
+        return cache.decr(key)
+    except ValueError:
+        # Sin contador no hay nada que devolver: se recarga de la BD al usarlo
+        return None
+
+
+def current(campaign_labs):
+    """
+    Inscritos según los contadores, sin tocar la BD.
+    campaign_labs: [(campaign_id, lab_id)] -> {lab_id: inscritos} (solo los cargados)
+    """
+    keys = {_key(campaign_id, lab_id): lab_id for campaign_id, lab_id in campaign_labs}
+    return {keys[key]: taken for key, taken in cache.get_many(keys.keys()).items()}
+
+
+def snapshot(campaign_labs):
+    """
+    Como current(), pero carga de la BD los contadores que falten (una sola
+    consulta agrupada para todos). Es el estado inicial del tablero en vivo.
+    """
+    campaign_labs = list(campaign_labs)
+    seats = current(campaign_labs)
+    missing = [pair for pair in campaign_labs if pair[1] not in seats]
+    if missing:
+        counts = dict.fromkeys(missing, 0)
+        for campaign_id, lab_id, taken in (
+            StudentPostulation.objects.filter(
+                campaign_id__in={c for c, _ in missing},
+                lab_group_id__in={lab for _, lab in missing},
+            )
+            .values_list("campaign_id", "lab_group_id")
+            .annotate(taken=Count("postulation_id"))
+            .order_by()
+        ):
+            if (campaign_id, lab_id) in counts:
+                counts[campaign_id, lab_id] = taken
+        for (campaign_id, lab_id), taken in counts.items():
+            cache.add(_key(campaign_id, lab_id), taken, None)
+        seats.update(current(missing))
+    return seats
+
+
+def reconcile(campaign_ids):
+    """
+    Vuelve a poner los contadores igual a la BD (después de asignaciones masivas
+    o si se sospecha que Redis se desfasó). Devuelve cuántos labs se corrigieron.
+    Conviene correrlo fuera de la hora pico: una reserva en vuelo (ya contada
+    pero todavía sin guardar) se perdería del contador.
+    """
+    # Labs sin postulaciones también: su contador debe quedar en 0
+    by_campaign = {}
+    for campaign_id, lab_id in LabEnrollmentCampaign.objects.filter(
+        campaign_id__in=campaign_ids, course__laboratories__isnull=False
+    ).values_list("campaign_id", "course__laboratories__lab_id"):
+        by_campaign.setdefault(campaign_id, {})[lab_id] = 0
+    for campaign_id, lab_id, taken in (
+        StudentPostulation.objects.filter(campaign_id__in=campaign_ids)
+        .values_list("campaign_id", "lab_group_id")
+        .annotate(taken=Count("postulation_id"))
+        .order_by()
+    ):
+        by_campaign.setdefault(campaign_id, {})[lab_id] = taken
+
+    counts = {
+        _key(campaign_id, lab_id): taken
+        for campaign_id, seats in by_campaign.items()
+        for lab_id, taken in seats.items()
+    }
+
+    before = cache.get_many(counts.keys())
+    fixed = sum(1 for key, taken in counts.items() if before.get(key) != taken)
+    cache.set_many(counts, None)
+
+    for campaign_id, seats in by_campaign.items():
+        campaign_events.publish(campaign_id, seats)
+    return fixed
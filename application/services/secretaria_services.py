@@ -1,13 +1,25 @@
+import codecs
 import csv
-import io
+import itertools
 import json
+import os
+import re
+import tempfile
+import uuid
+import zipfile
 import openpyxl
+from celery.result import AsyncResult
 from datetime import time, datetime, timedelta
 from typing import List, Dict, Optional
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.db import transaction
-from django.db.models import Count, Q, Avg, Sum
+from django.db.models import Count, Q, Avg, Sum, Max
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ObjectDoesNotExist
@@ -16,6 +28,9 @@ from infrastructure.persistence.models import (
     Classroom,
     Course,
     CustomUser,
+    Evaluation,
+    GradeRecord,
+    Semester,
     CourseGroup,
     LabEnrollmentCampaign,
     StudentPostulation,
@@ -27,6 +42,15 @@ from infrastructure.persistence.models import (
     Syllabus,
     SessionProgress,
     DAY_CHOICES,
+    CAMPAIGN_MODE_CHOICES,
+)
+from application.services import (
+    conflict_audit,
+    lab_assignment,
+    lab_overview,
+    report_cache,
+    room_occupancy,
+    student_timetable,
 )
 
 
@@ -141,109 +165,429 @@ class SecretariaService:
 
 
     # ==================== CARGA MASIVA (CSV) ====================
+    # Tamaño de lote para los IN (...) y los bulk_create de la carga masiva
+    ROSTER_BATCH_SIZE = 500
+
     @staticmethod
-    def process_student_csv(group_id, csv_file):
-        """Procesa el CSV de alumnos: Crea usuarios, matricula y limpia"""
+    def process_student_csv(
+        group_id, csv_file, defer_passwords=None, progress_callback=None
+    ):
+        """
+        Procesa el CSV de alumnos: Crea usuarios, matricula y limpia.
+        Trabajo por conjuntos: recorro el CSV en streaming por lotes, resuelvo
+        usuarios y emails con unos pocos IN y escribo con bulk_create / un delete.
+        defer_passwords=None usa settings.ROSTER_DEFER_PASSWORD_HASHING.
+        progress_callback recibe {"students", "created", "enrolled", "removed"}
+        por lote (students: alumnos distintos leídos, un CUI repetido cuenta una vez).
+        """
+        if defer_passwords is None:
+            defer_passwords = settings.ROSTER_DEFER_PASSWORD_HASHING
+
         try:
-            group = CourseGroup.objects.get(group_id=group_id)
+            group = CourseGroup.objects.select_related("course").get(
+                group_id=group_id
+            )
         except CourseGroup.DoesNotExist:
             return {"success": False, "error": "Grupo no encontrado"}
 
-        # Leer archivo
+        stats = {"created": 0, "enrolled": 0, "removed": 0}
+
+        def report():
+            if progress_callback:
+                progress_callback({"students": len(seen), **stats})
+
         try:
-            data = csv_file.read().decode("utf-8")
-            io_string = io.StringIO(data)
-            reader = csv.reader(io_string)
-            next(reader, None)  # Saltar header
-        except Exception as e:
+            with transaction.atomic():
+                # 1. Snapshot actual
+                current_ids = set(
+                    StudentEnrollment.objects.filter(group=group).values_list(
+                        "student__username", flat=True
+                    )
+                )
+
+                # 2. Usuarios y matrículas, lote por lote
+                reader = csv.reader(codecs.iterdecode(csv_file, "utf-8"))
+                seen = set()
+                for roster in SecretariaService._roster_chunks(reader, seen):
+                    students = SecretariaService._resolve_students(
+                        roster, stats, defer_passwords
+                    )
+
+                    new_enrollments = [
+                        StudentEnrollment(
+                            student=students[cui], group=group, course=group.course
+                        )
+                        for cui in roster
+                        if cui not in current_ids
+                    ]
+                    StudentEnrollment.objects.bulk_create(
+                        new_enrollments, batch_size=SecretariaService.ROSTER_BATCH_SIZE
+                    )
+                    SecretariaService._invalidate_timetables(new_enrollments)
+                    stats["enrolled"] += len(new_enrollments)
+                    report()
+
+                # 3. Limpieza (Desmatricular los que ya no están en el CSV)
+                to_remove = current_ids - seen
+                if to_remove:
+                    deleted = StudentEnrollment.objects.filter(
+                        group=group, student__username__in=to_remove
+                    ).delete()
+                    stats["removed"] = deleted[0]
+
+                # 4. Actualizar metadatos del grupo
+                group.students_loaded = True
+                group.last_student_upload_at = timezone.now()
+                group.capacity = len(seen)
+                group.save()
+        except (UnicodeDecodeError, csv.Error) as e:
+            return {"success": False, "error": f"Error al leer archivo: {str(e)}"}
+
+        report()
+        return {"success": True, "stats": stats, "group": group}
+
+    @staticmethod
+    def _iter_roster_rows(reader):
+        """Recorre el CSV y entrega (cui, nombre_crudo) de las filas válidas"""
+        next(reader, None)  # Saltar header
+
+        for row in reader:
+            if not row or len(row) < 3:
+                continue
+
+            cui = row[1].strip()
+            if cui.isdigit():
+                yield cui, row[2].strip().upper()
+
+    @staticmethod
+    def _roster_chunks(reader, seen):
+        """
+        Agrupa las filas en lotes {cui: nombre} de ROSTER_BATCH_SIZE.
+        Si un CUI se repite en el archivo me quedo con el primero (seen se comparte).
+        """
+        chunk = {}
+        for cui, full_name_raw in SecretariaService._iter_roster_rows(reader):
+            if cui in seen:
+                continue
+            seen.add(cui)
+            chunk[cui] = full_name_raw
+
+            if len(chunk) >= SecretariaService.ROSTER_BATCH_SIZE:
+                yield chunk
+                chunk = {}
+
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def process_roster_batch(
+        archive_file, file_name, defer_passwords=None, progress_callback=None
+    ):
+        """
+        Carga de inicio de semestre: un ZIP con un CSV por grupo o un XLSX con una
+        hoja por grupo. Cada archivo/hoja se llama <codigo_curso>_<grupo> (ej. 1703237_A).
+        Resuelvo a todos los alumnos de todos los grupos en una sola pasada y aplico
+        las matrículas de todos los grupos con un delete y un bulk_create.
+        """
+        if defer_passwords is None:
+            defer_passwords = settings.ROSTER_DEFER_PASSWORD_HASHING
+
+        def report(**progress):
+            if progress_callback:
+                progress_callback(progress)
+
+        # 1. Leer todos los archivos/hojas
+        try:
+            entries = SecretariaService._read_roster_archive(archive_file, file_name)
+        except (zipfile.BadZipFile, UnicodeDecodeError, csv.Error, ValueError) as e:
             return {"success": False, "error": f"Error al leer archivo: {str(e)}"}
 
-        student_cuis_in_csv = set()
+        report(phase="lectura", files=len(entries))
+
+        # 2. Ubicar los grupos con una sola consulta
+        keys = {
+            entry_name: SecretariaService._parse_group_key(entry_name)
+            for entry_name, _ in entries
+        }
+        codes = {key[0] for key in keys.values() if key}
+        groups_by_key = {
+            (g.course.course_code, g.group_code): g
+            for g in CourseGroup.objects.filter(
+                course__course_code__in=codes
+            ).select_related("course")
+        }
+
+        rosters = {}  # group_id -> (group, roster)
+        report_rows = []
+        for entry_name, roster in entries:
+            group = groups_by_key.get(keys[entry_name])
+            if not group:
+                report_rows.append(
+                    {"file": entry_name, "error": "Grupo no encontrado"}
+                )
+            elif group.group_id in rosters:
+                report_rows.append(
+                    {"file": entry_name, "error": "Grupo repetido en el archivo"}
+                )
+            else:
+                rosters[group.group_id] = (group, roster)
+
         stats = {"created": 0, "enrolled": 0, "removed": 0}
+        group_stats = {
+            group_id: {"created": 0, "enrolled": 0, "removed": 0}
+            for group_id in rosters
+        }
 
         with transaction.atomic():
-            # 1. Snapshot actual
-            current_ids = set(
-                StudentEnrollment.objects.filter(group=group).values_list(
-                    "student__username", flat=True
+            # 3. Snapshot por curso: la matrícula es única por (alumno, curso),
+            # así que un alumno que cambia de grupo se mueve, no se recrea
+            course_ids = {group.course_id for group, _ in rosters.values()}
+            current = {}  # (course_id, cui) -> (enrollment_id, group_id)
+            for enrollment_id, course_id, group_id, cui in (
+                StudentEnrollment.objects.filter(course_id__in=course_ids).values_list(
+                    "enrollment_id", "course_id", "group_id", "student__username"
                 )
+            ):
+                current[(course_id, cui)] = (enrollment_id, group_id)
+
+            # 4. Todos los alumnos de todos los grupos en una pasada
+            all_students = {}
+            for _, roster in rosters.values():
+                for cui, full_name_raw in roster.items():
+                    all_students.setdefault(cui, full_name_raw)
+
+            created_cuis = set()
+            students = SecretariaService._resolve_students(
+                all_students, stats, defer_passwords, created_cuis
+            )
+            report(phase="alumnos", students=len(students), **stats)
+
+            # 5. Diferencias por grupo
+            assigned = {}  # (course_id, cui) -> group_id del lote
+            new_enrollments = []
+            moved = []
+            credited = set()
+            for group_id, (group, roster) in rosters.items():
+                g_stats = group_stats[group_id]
+                for cui in roster:
+                    key = (group.course_id, cui)
+                    if key in assigned:
+                        # Mismo alumno en dos grupos del mismo curso: gana el primero
+                        g_stats["skipped"] = g_stats.get("skipped", 0) + 1
+                        continue
+                    assigned[key] = group_id
+
+                    if cui in created_cuis and cui not in credited:
+                        credited.add(cui)
+                        g_stats["created"] += 1
+
+                    if key not in current:
+                        new_enrollments.append(
+                            StudentEnrollment(
+                                student=students[cui],
+                                group=group,
+                                course=group.course,
+                            )
+                        )
+                        g_stats["enrolled"] += 1
+                    elif current[key][1] != group_id:
+                        moved.append(
+                            StudentEnrollment(
+                                enrollment_id=current[key][0],
+                                student=students[cui],
+                                group=group,
+                            )
+                        )
+                        g_stats["enrolled"] += 1
+
+            to_remove = []
+            for key, (enrollment_id, group_id) in current.items():
+                if group_id in rosters and key not in assigned:
+                    to_remove.append(enrollment_id)
+                    group_stats[group_id]["removed"] += 1
+
+            # 6. Aplicar todo con operaciones por conjunto
+            now = timezone.now()
+            if to_remove:
+                stats["removed"] = StudentEnrollment.objects.filter(
+                    enrollment_id__in=to_remove
+                ).delete()[0]
+            if moved:
+                # bulk_update no pasa por auto_now: sin updated_at los reportes
+                # cacheados del grupo no se enteran del cambio de sección
+                for enrollment in moved:
+                    enrollment.updated_at = now
+                StudentEnrollment.objects.bulk_update(
+                    moved,
+                    ["group", "updated_at"],
+                    batch_size=SecretariaService.ROSTER_BATCH_SIZE,
+                )
+            StudentEnrollment.objects.bulk_create(
+                new_enrollments, batch_size=SecretariaService.ROSTER_BATCH_SIZE
+            )
+            SecretariaService._invalidate_timetables(new_enrollments + moved)
+            stats["enrolled"] = len(new_enrollments) + len(moved)
+
+            # 7. Metadatos de los grupos
+            groups = []
+            for group, roster in rosters.values():
+                group.students_loaded = True
+                group.last_student_upload_at = now
+                group.capacity = len(roster)
+                group.updated_at = now
+                groups.append(group)
+            CourseGroup.objects.bulk_update(
+                groups,
+                ["students_loaded", "last_student_upload_at", "capacity", "updated_at"],
             )
 
-            for row in reader:
-                if not row or len(row) < 3:
-                    continue
+        for group_id, (group, roster) in rosters.items():
+            report_rows.append(
+                {"group": str(group), "students": len(roster), **group_stats[group_id]}
+            )
+        report(phase="fin", **stats)
 
-                cui = row[1].strip()
-                full_name_raw = row[2].strip().upper()
+        return {"success": True, "stats": stats, "groups": report_rows}
 
-                if not cui.isdigit():
-                    continue
-                student_cuis_in_csv.add(cui)
+    @staticmethod
+    def _read_roster_archive(archive_file, file_name):
+        """Devuelve [(nombre_archivo_u_hoja, {cui: nombre})] desde un ZIP o XLSX"""
+        entries = []
+        lower_name = file_name.lower()
+
+        if lower_name.endswith(".zip"):
+            with zipfile.ZipFile(archive_file) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(".csv"):
+                        continue
+                    with archive.open(info) as member:
+                        reader = csv.reader(codecs.iterdecode(member, "utf-8"))
+                        roster = {}
+                        for cui, name in SecretariaService._iter_roster_rows(reader):
+                            roster.setdefault(cui, name)
+                    entries.append((os.path.basename(info.filename), roster))
+
+        elif lower_name.endswith(".xlsx"):
+            wb = openpyxl.load_workbook(archive_file, read_only=True, data_only=True)
+            try:
+                for ws in wb.worksheets:
+                    rows = (
+                        [SecretariaService._cell_to_text(v) for v in row]
+                        for row in ws.iter_rows(values_only=True)
+                    )
+                    roster = {}
+                    for cui, name in SecretariaService._iter_roster_rows(rows):
+                        roster.setdefault(cui, name)
+                    entries.append((ws.title, roster))
+            finally:
+                wb.close()
 
-                # 2. Gestionar Usuario
-                student = SecretariaService._get_or_create_student(
-                    cui, full_name_raw, stats
-                )
+        else:
+            raise ValueError("Formato no soportado. Debe ser .zip o .xlsx")
 
-                # 3. Matricular
-                if cui not in current_ids:
-                    StudentEnrollment.objects.create(
-                        student=student, group=group, course=group.course
-                    )
-                    stats["enrolled"] += 1
+        return entries
 
-            # 4. Limpieza (Desmatricular los que ya no están en el CSV)
-            to_remove = current_ids - student_cuis_in_csv
-            if to_remove:
-                deleted = StudentEnrollment.objects.filter(
-                    group=group, student__username__in=to_remove
-                ).delete()
-                stats["removed"] = deleted[0]
+    @staticmethod
+    def _cell_to_text(value):
+        """Celdas de Excel a texto (los CUI numéricos pueden venir como float)"""
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
 
-            # 5. Actualizar metadatos del grupo
-            group.students_loaded = True
-            group.last_student_upload_at = timezone.now()
-            group.capacity = len(student_cuis_in_csv)
-            group.save()
+    @staticmethod
+    def _parse_group_key(entry_name):
+        """'1703237_A.csv' -> ('1703237', 'A'). None si el nombre no sigue el formato"""
+        stem = os.path.splitext(entry_name)[0].strip()
+        match = re.match(r"^(?P<course>.+?)[_\- ]+(?P<group>[^_\- ]+)$", stem)
+        if not match:
+            return None
+        return match.group("course"), match.group("group").upper()
 
-        return {"success": True, "stats": stats, "group": group}
+    @staticmethod
+    def _invalidate_timetables(enrollments):
+        """bulk_create/bulk_update no disparan señales: el horario en bits lo borro yo"""
+        student_ids = {enrollment.student_id for enrollment in enrollments}
+        transaction.on_commit(lambda: student_timetable.invalidate(student_ids))
 
     @staticmethod
-    def _get_or_create_student(cui, full_name_raw, stats):
-        """Helper privado para lógica de usuario/email"""
-        try:
-            student = CustomUser.objects.get(username=cui)
-            if not student.is_active:
-                student.is_active = True
-                student.account_status = "ACTIVO"
-                student.save()
-            return student
-        except CustomUser.DoesNotExist:
-            # Parsear nombres y generar email
-            first, last, email = SecretariaService._parse_names_and_email(
-                full_name_raw, cui
+    def _resolve_students(roster, stats, defer_passwords=False, created_cuis=None):
+        """
+        Helper privado para lógica de usuario/email en bloque.
+        Devuelve {cui: CustomUser}: reactiva a los que ya existían y crea el resto.
+        Con defer_passwords los nuevos quedan con password inutilizable y el hash
+        del CUI se calcula en su primer login (PendingActivationBackend).
+        Si me pasan created_cuis (set) anoto ahí los CUIs creados.
+        """
+        batch = SecretariaService.ROSTER_BATCH_SIZE
+        cuis = list(roster)
+
+        # 1. Usuarios existentes (un IN por lote)
+        students = {}
+        for i in range(0, len(cuis), batch):
+            for user in CustomUser.objects.filter(username__in=cuis[i : i + batch]):
+                students[user.username] = user
+
+        inactive_ids = [u.pk for u in students.values() if not u.is_active]
+        if inactive_ids:
+            CustomUser.objects.filter(pk__in=inactive_ids).update(
+                is_active=True, account_status="ACTIVO", updated_at=timezone.now()
+            )
+            for user in students.values():
+                user.is_active = True
+                user.account_status = "ACTIVO"
+
+        # 2. Emails candidatos de los nuevos: los ocupados se traen de una vez
+        missing = [cui for cui in cuis if cui not in students]
+        parsed = {
+            cui: SecretariaService._name_and_email_candidates(roster[cui], cui)
+            for cui in missing
+        }
+        candidates = [email for *_, emails in parsed.values() for email in emails]
+        taken_emails = set()
+        for i in range(0, len(candidates), batch):
+            taken_emails.update(
+                CustomUser.objects.filter(
+                    email__in=candidates[i : i + batch]
+                ).values_list("email", flat=True)
             )
 
-            student = CustomUser.objects.create(
-                username=cui,
-                password=make_password(cui),
-                email=email,
-                first_name=first,
-                last_name=last,
-                user_role="ALUMNO",
-                is_active=True,
-                account_status="ACTIVO",
+        # 3. Crear los nuevos
+        new_users = []
+        for cui in missing:
+            first, last, emails = parsed[cui]
+            email = SecretariaService._pick_free_email(emails, taken_emails)
+            taken_emails.add(email)
+            new_users.append(
+                CustomUser(
+                    username=cui,
+                    password=make_password(None if defer_passwords else cui),
+                    pending_activation=defer_passwords,
+                    email=email,
+                    first_name=first,
+                    last_name=last,
+                    user_role="ALUMNO",
+                    is_active=True,
+                    account_status="ACTIVO",
+                )
             )
-            stats["created"] += 1
-            return student
+
+        for user in CustomUser.objects.bulk_create(new_users, batch_size=batch):
+            students[user.username] = user
+        stats["created"] += len(new_users)
+        if created_cuis is not None:
+            created_cuis.update(missing)
+
+        return students
 
     @staticmethod
-    def _parse_names_and_email(full_name_csv, cui):
-        """Lógica pura de strings para nombres y emails"""
+    def _name_and_email_candidates(full_name_csv, cui):
+        """Nombres formateados + lista de emails candidatos en orden de preferencia"""
         try:
             parts = full_name_csv.replace('"', "").split(",")
             if len(parts) < 2:
-                return "SinNombre", "SinApellido", f"err_{cui}@unsa.edu.pe"
+                return "SinNombre", "SinApellido", [f"err_{cui}@unsa.edu.pe"]
 
             last_part = parts[0].strip().split("/")
             first_part = parts[1].strip()
@@ -256,91 +600,466 @@ class SecretariaService:
             # Email logic
             initial = first_name[0].lower() if first_name else "x"
             pat_slug = last_part[0].lower() if last_part else "x"
+            mat_slug = last_part[1].lower() if len(last_part) > 1 else ""
 
-            email = f"{initial}{pat_slug}@unsa.edu.pe"
+            return (
+                first_name,
+                last_name,
+                [
+                    f"{initial}{pat_slug}@unsa.edu.pe",
+                    f"{initial}{pat_slug}{mat_slug}@unsa.edu.pe",
+                    f"{initial}{pat_slug}{cui}@unsa.edu.pe",
+                ],
+            )
 
-            # Verificación simple de colisión
-            if CustomUser.objects.filter(email=email).exists():
-                mat_slug = last_part[1].lower() if len(last_part) > 1 else ""
-                email = f"{initial}{pat_slug}{mat_slug}@unsa.edu.pe"
-                if CustomUser.objects.filter(email=email).exists():
-                    email = f"{initial}{pat_slug}{cui}@unsa.edu.pe"
+        except (AttributeError, IndexError, TypeError):
+            return "Error", "Error", [f"error_{cui}@unsa.edu.pe"]
 
-            return first_name, last_name, email
+    @staticmethod
+    def _pick_free_email(emails, taken_emails=None):
+        """Verificación simple de colisión: el último candidato se usa sin verificar"""
 
-        except (AttributeError, IndexError, TypeError):
-            return "Error", "Error", f"error_{cui}@unsa.edu.pe"
+        def is_taken(email):
+            if taken_emails is not None:
+                return email in taken_emails
+            return CustomUser.objects.filter(email=email).exists()
 
+        for email in emails[:-1]:
+            if not is_taken(email):
+                return email
+        return emails[-1]
 
-    # ==================== REPORTES (EXCEL) ====================
+
+    # ==================== TAREAS EN SEGUNDO PLANO ====================
     @staticmethod
-    def generate_grades_excel_workbook(group_id):
-        """Genera el objeto Workbook con las notas"""
-        group = CourseGroup.objects.get(group_id=group_id)
-        course = group.course
+    def enqueue_student_csv(group_id, csv_file):
+        """
+        Guarda el CSV en media y encola su procesamiento en Celery.
+        Retorna el id de la tarea para consultar su avance.
+        """
+        from application.tasks import process_student_csv_task
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"Notas {course.course_code}"
+        file_path = default_storage.save(
+            f"uploads/rosters/{uuid.uuid4()}.csv", csv_file
+        )
+        task = process_student_csv_task.delay(str(group_id), file_path)
+        return task.id
 
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(
-            start_color="4F81BD", end_color="4F81BD", fill_type="solid"
+    @staticmethod
+    def enqueue_roster_batch(archive_file):
+        """Igual que enqueue_student_csv pero para el ZIP/XLSX con varios grupos"""
+        from application.tasks import process_roster_batch_task
+
+        extension = os.path.splitext(archive_file.name)[1].lower()
+        file_path = default_storage.save(
+            f"uploads/rosters/{uuid.uuid4()}{extension}", archive_file
+        )
+        task = process_roster_batch_task.delay(file_path)
+        return task.id
+
+    @staticmethod
+    def enqueue_consolidated_grades(semester_id=None, course_id=None, force=False):
+        """
+        Si el consolidado ya está generado (y no se pide regenerar) lo devuelvo
+        tal cual; si no, encolo la tarea que lo arma.
+        """
+        from application.tasks import build_consolidated_grades_task
+
+        if not force:
+            artifact = SecretariaService.get_consolidated_grades_artifact(
+                semester_id, course_id
+            )
+            if artifact:
+                return {"ready": True, "artifact": artifact}
+
+        task = build_consolidated_grades_task.delay(
+            str(semester_id) if semester_id else None,
+            str(course_id) if course_id else None,
+            force,
         )
-        thin_border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin"),
+        return {"ready": False, "task_id": task.id}
+
+    @staticmethod
+    def get_job_status(task_id):
+        """Estado de una tarea de Celery en formato JSON para el polling del front"""
+        result = AsyncResult(str(task_id))
+        data = {"task_id": str(task_id), "state": result.state, "ready": False}
+
+        if result.state == "PROGRESS":
+            data["progress"] = result.info
+        elif result.successful():
+            data["ready"] = True
+            data["result"] = result.result
+        elif result.failed():
+            data["ready"] = True
+            data["error"] = str(result.result)
+
+        return data
+
+    # ==================== REPORTES (EXCEL) ====================
+    EXCEL_CHUNK_SIZE = 500
+
+    @staticmethod
+    def _add_report_styles(wb):
+        """Estilos con nombre: se registran una vez y las celdas solo los referencian"""
+        side = Side(style="thin")
+        border = Border(left=side, right=side, top=side, bottom=side)
+
+        header = NamedStyle(name="report_header")
+        header.font = Font(bold=True, color="FFFFFF")
+        header.fill = PatternFill(
+            start_color="4F81BD", end_color="4F81BD", fill_type="solid"
         )
+        header.border = border
+
+        cell = NamedStyle(name="report_cell")
+        cell.border = border
+
+        wb.add_named_style(header)
+        wb.add_named_style(cell)
 
+    @staticmethod
+    def _styled_row(ws, values, style):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            row.append(cell)
+        return row
+
+    @staticmethod
+    def _write_grades_sheet(ws, course, group, evals, rows):
+        """
+        Escribe una hoja de notas. rows entrega (cui, nombre, {evaluation_id: nota}, final)
+        y se consume a medida que se escribe.
+        """
         # Encabezado Reporte
-        ws["A1"] = f"REPORTE DE NOTAS - {course.course_name}"
-        ws["A2"] = (
-            f"Curso: {course.course_code} | Grupo: {group.group_code} | Créditos: {course.credits}"
+        ws.append([f"REPORTE DE NOTAS - {course.course_name}"])
+        ws.append(
+            [
+                f"Curso: {course.course_code} | Grupo: {group.group_code} | Créditos: {course.credits}"
+            ]
         )
+        ws.append([])
 
         # Columnas Dinámicas
-        evals = course.evaluations.all().order_by("unit", "order")
         headers = ["CUI", "Alumno"] + [e.name for e in evals] + ["FINAL"]
-
-        # Escribir Headers
-        for col, txt in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col, value=txt)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
+        ws.append(SecretariaService._styled_row(ws, headers, "report_header"))
 
         # Escribir Data
+        for cui, full_name, grades, final in rows:
+            values = (
+                [cui, full_name]
+                + [grades.get(ev.evaluation_id, "-") for ev in evals]
+                + [final if final is not None else "-"]
+            )
+            ws.append(SecretariaService._styled_row(ws, values, "report_cell"))
+
+    @staticmethod
+    def generate_grades_excel_workbook(group_id):
+        """
+        Genera el Workbook con las notas en modo write-only: las filas se escriben
+        mientras recorro las matrículas con .iterator(), así la memoria no crece
+        con el tamaño del grupo. El workbook se tiene que guardar una sola vez.
+        """
+        group = CourseGroup.objects.select_related("course").get(group_id=group_id)
+        course = group.course
+
+        wb = openpyxl.Workbook(write_only=True)
+        SecretariaService._add_report_styles(wb)
+        ws = wb.create_sheet(f"Notas {course.course_code}")
+
+        evals = list(course.evaluations.all().order_by("unit", "order"))
         enrollments = (
             StudentEnrollment.objects.filter(group=group, status="ACTIVO")
             .select_related("student")
             .prefetch_related("grade_records")
+            .iterator(chunk_size=SecretariaService.EXCEL_CHUNK_SIZE)
         )
+        rows = (
+            (
+                env.student.username,
+                env.student.get_full_name(),
+                {g.evaluation_id: g.rounded_score for g in env.grade_records.all()},
+                env.final_grade,
+            )
+            for env in enrollments
+        )
+        SecretariaService._write_grades_sheet(ws, course, group, evals, rows)
 
-        row_num = 5
-        for env in enrollments:
-            grades = {g.evaluation_id: g.rounded_score for g in env.grade_records.all()}
+        return wb, f"Notas_{course.course_code}_{group.group_code}.xlsx"
 
-            ws.cell(row=row_num, column=1, value=env.student.username).border = (
-                thin_border
+    @staticmethod
+    def get_grades_excel_file(group_id):
+        """
+        Ruta en media del Excel de notas del grupo. Solo se regenera si cambió
+        alguna nota, la matrícula o las evaluaciones desde la última descarga.
+        """
+        group = CourseGroup.objects.select_related("course").get(group_id=group_id)
+        file_path = report_cache.get_or_build(
+            "grades",
+            group.group_id,
+            SecretariaService._grades_version(group),
+            lambda: SecretariaService.generate_grades_excel_workbook(group_id)[0],
+        )
+        return file_path, f"Notas_{group.course.course_code}_{group.group_code}.xlsx"
+
+    @staticmethod
+    def _grades_version(group):
+        """Sello de versión: última escritura y conteos de notas/matrículas"""
+        state = StudentEnrollment.objects.filter(group=group, status="ACTIVO").aggregate(
+            last_grade=Max("grade_records__updated_at"),
+            grades=Count("grade_records", distinct=True),
+            last_enrollment=Max("updated_at"),
+            enrollments=Count("enrollment_id", distinct=True),
+        )
+        evaluations = group.course.evaluations.order_by("unit", "order").values_list(
+            "evaluation_id", "name", "unit", "order"
+        )
+        return report_cache.version_stamp(
+            *state.values(), *evaluations, group.course.updated_at
+        )
+
+    @staticmethod
+    def generate_consolidated_grades_workbook(
+        semester_id=None, course_id=None, progress_callback=None
+    ):
+        """
+        Consolidado de cierre de semestre: una hoja por grupo de todo el semestre
+        (o de un curso). Son 4 consultas en total sin importar cuántos grupos haya:
+        grupos, evaluaciones, notas y matrículas (estas últimas en streaming).
+        """
+        groups = CourseGroup.objects.select_related("course").order_by(
+            "course__course_code", "course_id", "group_code", "group_id"
+        )
+        if course_id:
+            groups = groups.filter(course_id=course_id)
+        elif semester_id:
+            groups = groups.filter(course__semester_id=semester_id)
+        groups = list(groups)
+        groups_by_id = {g.group_id: g for g in groups}
+
+        evals_by_course = {}
+        for ev in Evaluation.objects.filter(
+            course_id__in={g.course_id for g in groups}
+        ).order_by("unit", "order"):
+            evals_by_course.setdefault(ev.course_id, []).append(ev)
+
+        grades = {}  # enrollment_id -> {evaluation_id: nota}
+        for enrollment_id, evaluation_id, score in GradeRecord.objects.filter(
+            enrollment__group_id__in=groups_by_id.keys(),
+            enrollment__status="ACTIVO",
+        ).values_list("enrollment_id", "evaluation_id", "rounded_score").iterator(
+            chunk_size=SecretariaService.EXCEL_CHUNK_SIZE
+        ):
+            grades.setdefault(enrollment_id, {})[evaluation_id] = score
+
+        # Matrículas ordenadas igual que los grupos: así escribo hoja por hoja
+        enrollments = (
+            StudentEnrollment.objects.filter(
+                group_id__in=groups_by_id.keys(), status="ACTIVO"
+            )
+            .order_by(
+                "group__course__course_code",
+                "group__course_id",
+                "group__group_code",
+                "group_id",
+                "student__username",
             )
-            ws.cell(row=row_num, column=2, value=env.student.get_full_name()).border = (
-                thin_border
+            .values_list(
+                "enrollment_id",
+                "group_id",
+                "student__username",
+                "student__first_name",
+                "student__last_name",
+                "final_grade",
             )
+            .iterator(chunk_size=SecretariaService.EXCEL_CHUNK_SIZE)
+        )
+        rows_by_group = itertools.groupby(enrollments, key=lambda row: row[1])
+
+        wb = openpyxl.Workbook(write_only=True)
+        SecretariaService._add_report_styles(wb)
+        used_titles = set()
+        pending = next(rows_by_group, None)
+
+        for done, group in enumerate(groups, 1):
+            rows = []
+            if pending and pending[0] == group.group_id:
+                rows = (
+                    (
+                        cui,
+                        f"{first_name} {last_name}".strip(),
+                        grades.get(enrollment_id, {}),
+                        final,
+                    )
+                    for enrollment_id, _, cui, first_name, last_name, final in pending[1]
+                )
 
-            col_idx = 3
-            for ev in evals:
-                val = grades.get(ev.evaluation_id, "-")
-                ws.cell(row=row_num, column=col_idx, value=val).border = thin_border
-                col_idx += 1
+            ws = wb.create_sheet(
+                SecretariaService._sheet_title(
+                    f"{group.course.course_code} {group.group_code}", used_titles
+                )
+            )
+            SecretariaService._write_grades_sheet(
+                ws,
+                group.course,
+                group,
+                evals_by_course.get(group.course_id, []),
+                rows,
+            )
+            if rows:
+                pending = next(rows_by_group, None)
 
-            final = env.final_grade if env.final_grade is not None else "-"
-            ws.cell(row=row_num, column=col_idx, value=final).border = thin_border
-            row_num += 1
+            if progress_callback:
+                progress_callback({"done": done, "total": len(groups)})
 
-        return wb, f"Notas_{course.course_code}_{group.group_code}.xlsx"
+        if not groups:
+            wb.create_sheet("Sin grupos")
+
+        return wb, len(groups)
+
+    @staticmethod
+    def _sheet_title(title, used_titles):
+        """Excel: máximo 31 caracteres, sin []:*?/\\ y sin repetir"""
+        title = re.sub(r"[\[\]:*?/\\]", "-", title)[:31]
+        candidate, n = title, 2
+        while candidate.lower() in used_titles:
+            suffix = f" ({n})"
+            candidate = title[: 31 - len(suffix)] + suffix
+            n += 1
+        used_titles.add(candidate.lower())
+        return candidate
+
+    @staticmethod
+    def _consolidated_scope(semester_id=None, course_id=None):
+        return f"course-{course_id}" if course_id else f"semester-{semester_id}"
+
+    @staticmethod
+    def _consolidated_groups(semester_id=None, course_id=None):
+        if course_id:
+            return CourseGroup.objects.filter(course_id=course_id)
+        return CourseGroup.objects.filter(course__semester_id=semester_id)
+
+    @staticmethod
+    def _consolidated_version(semester_id=None, course_id=None):
+        """El mismo sello que _grades_version, sobre todos los grupos del alcance"""
+        if course_id:
+            courses = Course.objects.filter(course_id=course_id)
+        else:
+            courses = Course.objects.filter(semester_id=semester_id)
+        groups = SecretariaService._consolidated_groups(semester_id, course_id)
+
+        state = StudentEnrollment.objects.filter(
+            group__in=groups, status="ACTIVO"
+        ).aggregate(
+            last_grade=Max("grade_records__updated_at"),
+            grades=Count("grade_records", distinct=True),
+            last_enrollment=Max("updated_at"),
+            enrollments=Count("enrollment_id", distinct=True),
+        )
+        evaluations = (
+            Evaluation.objects.filter(course__in=courses)
+            .order_by("course_id", "unit", "order", "evaluation_id")
+            .values_list("evaluation_id", "name", "unit", "order")
+        )
+        return report_cache.version_stamp(
+            *state.values(),
+            *evaluations,
+            *groups.order_by("group_id").values_list("group_id", "group_code"),
+            courses.aggregate(last=Max("updated_at"))["last"],
+        )
+
+    @staticmethod
+    def _consolidated_cache_key(semester_id, course_id, version):
+        scope = SecretariaService._consolidated_scope(semester_id, course_id)
+        return f"grades_consolidated:{scope}:{version}"
+
+    @staticmethod
+    def build_consolidated_grades_file(
+        semester_id=None, course_id=None, progress_callback=None, force=False
+    ):
+        """
+        Genera el consolidado y deja su ficha en caché. Como los Excel por grupo,
+        va versionado por la última nota/matrícula: una nota nueva cambia la
+        versión y el archivo anterior se borra al generar el nuevo.
+        """
+        version = SecretariaService._consolidated_version(semester_id, course_id)
+        built = {}
+
+        def build():
+            wb, built["groups"] = (
+                SecretariaService.generate_consolidated_grades_workbook(
+                    semester_id, course_id, progress_callback
+                )
+            )
+            return wb
+
+        file_path = report_cache.get_or_build(
+            "consolidated",
+            SecretariaService._consolidated_scope(semester_id, course_id),
+            version,
+            build,
+            rebuild=force,
+        )
+        if "groups" not in built:
+            # Ya estaba generado en esta versión (otra tarea se adelantó)
+            built["groups"] = SecretariaService._consolidated_groups(
+                semester_id, course_id
+            ).count()
+
+        if course_id:
+            label = Course.objects.get(course_id=course_id).course_code
+        else:
+            label = Semester.objects.get(semester_id=semester_id).name
+
+        artifact = {
+            "file_path": file_path,
+            "filename": f"Consolidado_Notas_{label}.xlsx",
+            "groups": built["groups"],
+            "generated_at": timezone.now().isoformat(),
+        }
+        cache.set(
+            SecretariaService._consolidated_cache_key(semester_id, course_id, version),
+            artifact,
+            settings.REPORT_ARTIFACT_TIMEOUT,
+        )
+        return artifact
+
+    @staticmethod
+    def get_consolidated_grades_artifact(semester_id=None, course_id=None):
+        """
+        Artefacto de la versión actual (o None si cambió alguna nota, expiró o
+        se borró el archivo)
+        """
+        version = SecretariaService._consolidated_version(semester_id, course_id)
+        artifact = cache.get(
+            SecretariaService._consolidated_cache_key(semester_id, course_id, version)
+        )
+        if artifact and default_storage.exists(artifact["file_path"]):
+            return artifact
+        return None
+
+    # ==================== AUDITORÍA DE CRUCES ====================
+    @staticmethod
+    def get_conflict_audit_context(semester_id=None):
+        """Reporte de cruces de salón/profesor/alumno del semestre elegido (o el activo)"""
+        semesters = Semester.objects.all()
+        try:
+            semester_id = uuid.UUID(str(semester_id)) if semester_id else None
+        except ValueError:
+            semester_id = None  # ?semester= mal escrito: se muestra el activo
+
+        semester = None
+        if semester_id:
+            semester = semesters.filter(semester_id=semester_id).first()
+        if not semester:
+            semester = semesters.filter(is_active=True).first() or semesters.first()
+
+        context = {"semesters": semesters, "selected_semester": semester}
+        if semester:
+            context["audit"] = conflict_audit.audit_semester(semester.semester_id)
+        return context
 
     # ==================== GESTIÓN DE LABORATORIOS ====================
 
@@ -359,11 +1078,16 @@ class SecretariaService:
 
     @staticmethod
     def calculate_lab_groups_needed(count):
-        if count <= 30:
-            return 1
-        elif count <= 60:
-            return 2
-        return 3
+        return lab_overview.labs_needed(count)
+
+    @staticmethod
+    def get_lab_management_overview():
+        """
+        Todo lo que pinta el tablero de laboratorios (matriculados, labs, docentes
+        de teoría, cupos y campaña) para todos los cursos con lab de una vez.
+        Sale de caché por un minuto; se arma en pocas consultas agrupadas.
+        """
+        return lab_overview.get()
 
     @staticmethod
     @transaction.atomic
@@ -445,48 +1169,29 @@ class SecretariaService:
                 f"Cruce con Teoría: {s.start_time}-{s.end_time}",
             )
 
-        # 2. Sala (Room)
+        # 2. Sala (Room): índice de ocupación del día
         if room_id:
-            occupied = Schedule.objects.filter(room_id=room_id, day_of_week=day)
-            for s in occupied:
-                register_conflict(
-                    overlap(start, end, s.start_time, s.end_time),
-                    f"Salón ocupado por clase: {s.start_time}",
-                )
-
-            labs = LaboratoryGroup.objects.filter(room_id=room_id, day_of_week=day)
+            exclude = set()
             if exclude_lab_id:
-                labs = labs.exclude(lab_id=exclude_lab_id)
+                exclude.add(("LAB", uuid.UUID(str(exclude_lab_id))))
 
-            for l in labs:
-                register_conflict(
-                    overlap(start, end, l.start_time, l.end_time),
-                    f"Salón ocupado por Lab {l.lab_nomenclature}",
-                )
+            index = room_occupancy.get_day_index(day)
+            for block in index.conflicts(
+                uuid.UUID(str(room_id)), start, end, exclude=exclude
+            ):
+                if block.kind == "LAB":
+                    register_conflict(True, f"Salón ocupado por Lab {block.label}")
+                else:
+                    register_conflict(True, f"Salón ocupado por clase: {block.start}")
 
         return {"has_conflict": has_conflict, "messages": msgs}
 
-
     @staticmethod
     def get_available_classrooms(day, start, end):
-        """Busca labs libres en ese horario"""
-
-        def overlap(s1, e1, s2, e2):
-            return s1 < e2 and s2 < e1
-
-        occupied_ids = set()
-        # Clases
-        for s in Schedule.objects.filter(day_of_week=day).select_related("room"):
-            if s.room and overlap(start, end, s.start_time, s.end_time):
-                occupied_ids.add(s.room.classroom_id)
-        # Labs
-        for l in LaboratoryGroup.objects.filter(day_of_week=day).select_related("room"):
-            if l.room and overlap(start, end, l.start_time, l.end_time):
-                occupied_ids.add(l.room.classroom_id)
-
-        return Classroom.objects.filter(
+        """Busca labs libres en ese horario (una consulta con NOT EXISTS)"""
+        return room_occupancy.free_classrooms(day, start, end).filter(
             is_active=True, classroom_type="LABORATORIO"
-        ).exclude(classroom_id__in=occupied_ids)
+        )
 
     @staticmethod
     def delete_lab_group(lab_id):
@@ -552,15 +1257,21 @@ class SecretariaService:
 
     @staticmethod
     @transaction.atomic
-    def enable_lab_enrollment(course_id, days_duration=7):
+    def enable_lab_enrollment(course_id, days_duration=7, allocation_mode="DIRECTO"):
         """
         Paso 2: ¡Abrir las puertas!
         Si todo está en orden, creamos la campaña. Esto permite que los botones
         de "Matricularse" aparezcan en la pantalla de los alumnos.
+        En modo SORTEO no se reparte nada mientras dure: los alumnos ordenan
+        sus labs y el sorteo se hace al cerrar.
         """
         result = {"success": False, "errors": []}
 
         try:
+            if allocation_mode not in dict(CAMPAIGN_MODE_CHOICES):
+                result["errors"].append("Modo de asignación no válido.")
+                return result
+
             # Primero nos aseguramos que matemáticamente sea posible
             check = SecretariaService.can_enable_enrollment(course_id)
             if not check["can_enable"]:
@@ -587,6 +1298,7 @@ class SecretariaService:
                 start_date=now,
                 end_date=now + timedelta(days=days_duration),
                 is_closed=False,
+                allocation_mode=allocation_mode,
             )
 
             result["success"] = True
@@ -619,37 +1331,9 @@ class SecretariaService:
             )
         )
 
-        labs_data = []
-        for lab in labs:
-            if lab.enrolled_count == 0:
-                status = "empty"
-            elif lab.enrolled_count < lab.capacity * 0.8:
-                status = "normal"
-            elif lab.enrolled_count <= lab.capacity:
-                status = "almost-full"
-            else:
-                status = "exceeded"
-
-            labs_data.append(
-                {
-                    "lab_id": str(lab.lab_id),
-                    "nomenclature": lab.lab_nomenclature,
-                    "capacity": lab.capacity,
-                    "enrolled": lab.enrolled_count,
-                    "available": max(0, lab.capacity - lab.enrolled_count),
-                    "status": status,
-                }
-            )
-
-        return {
-            "exists": True,
-            "campaign_id": str(campaign.campaign_id),
-            "is_active": not campaign.is_closed,
-            "is_closed": campaign.is_closed,
-            "start_date": campaign.start_date.isoformat(),
-            "end_date": campaign.end_date.isoformat(),
-            "labs": labs_data,
-        }
+        return lab_overview.campaign_status(
+            campaign, labs, {lab.lab_id: lab.enrolled_count for lab in labs}
+        )
 
 
     @staticmethod
@@ -658,12 +1342,19 @@ class SecretariaService:
         La lista de espera.
         Muestra quiénes se anotaron en un grupo específico y en qué orden llegaron.
         También avisamos si ese alumno tiene conflicto (para que el jefe sepa).
+        Los horarios de todos salen de una sola vez, no uno por alumno.
         """
-        postulations = (
+        postulations = list(
             StudentPostulation.objects.filter(lab_group_id=lab_id, status="PENDIENTE")
-            .select_related("student")
+            .select_related("student", "lab_group")
             .order_by("timestamp")
         )
+        if not postulations:
+            return []
+
+        lab_group = postulations[0].lab_group
+        lab_mask = student_timetable.lab_mask(lab_group)
+        timetables = student_timetable.get_many(p.student_id for p in postulations)
 
         students = []
         for i, post in enumerate(postulations, 1):
@@ -675,8 +1366,8 @@ class SecretariaService:
                     "email": post.student.email,
                     "timestamp": post.timestamp.strftime("%d/%m/%Y %H:%M"),
                     # Revisamos si el alumno tiene problemas de horario
-                    "has_conflict": SecretariaService._check_student_schedule_conflict(
-                        post.student.user_id, post.lab_group
+                    "has_conflict": timetables[post.student_id].conflicts(
+                        lab_mask, exclude_lab=lab_group.lab_id, include_pending=False
                     ),
                 }
             )
@@ -688,57 +1379,22 @@ class SecretariaService:
         """
         El "Detector de Choques".
         Revisa la agenda del alumno para ver si tiene clases a la misma hora
-        que el lab que quiere.
+        que el lab que quiere (teoría y otros labs asignados), con su horario en bits.
         """
-
-        def overlap(s1, e1, s2, e2):
-            return s1 < e2 and s2 < e1
-
-        def same_day_and_overlap(other):
-            return (
-                other.day_of_week == lab_group.day_of_week
-                and overlap(
-                    lab_group.start_time,
-                    lab_group.end_time,
-                    other.start_time,
-                    other.end_time,
-                )
-            )
-
-        enrollments = (
-            StudentEnrollment.objects.filter(student_id=student_id, status="ACTIVO")
-            .select_related("course", "group", "lab_assignment__lab_group")
+        timetable = student_timetable.get(student_id)
+        return timetable.conflicts(
+            student_timetable.lab_mask(lab_group),
+            exclude_lab=lab_group.lab_id,
+            include_pending=False,
         )
 
-        for enrollment in enrollments:
-            if enrollment.group and _has_theory_conflict(enrollment.group, same_day_and_overlap):
-                return True
-
-            if _has_lab_conflict(enrollment, lab_group, same_day_and_overlap):
-                return True
-
-        return False
-
-
-    def _has_theory_conflict(group, conflict_check):
-        schedules = Schedule.objects.filter(course_group=group)
-        return any(conflict_check(sch) for sch in schedules)
-
-
-    def _has_lab_conflict(enrollment, lab_group, conflict_check):
-        if not enrollment.lab_assignment:
-            return False
-
-        other_lab = enrollment.lab_assignment.lab_group
-        if other_lab.lab_id == lab_group.lab_id:
-            return False
-
-        return conflict_check(other_lab)
-
     @staticmethod
     @transaction.atomic
     def close_lab_enrollment(course_id):
-        """Solo cierra la campaña, los alumnos ya están matriculados."""
+        """
+        Cierra la campaña. Si es por orden de llegada los alumnos ya están
+        matriculados; si es por sorteo, aquí se reparten todos los cupos.
+        """
         result = {"success": False, "errors": []}
 
         try:
@@ -750,7 +1406,11 @@ class SecretariaService:
                 result["errors"].append("No hay campaña activa para cerrar.")
                 return result
 
-            # Solo cerrar la campaña
+            if campaign.allocation_mode == "SORTEO":
+                lottery = lab_assignment.run_lottery(campaign)
+                campaign.lottery_seed = lottery["seed"]
+                result["lottery"] = lottery
+
             campaign.is_closed = True
             campaign.closed_at = timezone.now()
             campaign.save()
@@ -762,6 +1422,29 @@ class SecretariaService:
 
         return result
 
+    @staticmethod
+    def simulate_lab_assignment(course_id):
+        """
+        Qué pasaría si se asigna ahora: quién se queda sin lab, por qué y cuántos
+        cupos faltan. No guarda nada.
+        """
+        result = {"success": False, "errors": []}
+
+        try:
+            report = lab_assignment.simulate([course_id])
+            if not report["courses"]:
+                result["errors"].append("No hay campaña activa para simular.")
+                return result
+
+            result["success"] = True
+            result["summary"] = report["summary"]
+            result["course"] = report["courses"][0]
+
+        except Exception as e:
+            result["errors"].append(str(e))
+
+        return result
+
     # Helper pequeño para no repetir código al guardar en base de datos
     @staticmethod
     def _assign_student(postulation, lab_group, method):
@@ -1,5 +1,6 @@
 from collections import defaultdict
 from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
 from infrastructure.persistence.models import (
@@ -13,7 +14,10 @@ from infrastructure.persistence.models import (
     LabEnrollmentCampaign,
     StudentPostulation,
     LabAssignment,
+    LabPreference,
 )
+from domain.academic_performance import attendance as attendance_vector
+from application.services import seat_counters, student_timetable
 
 
 class StudentService:
@@ -335,16 +339,15 @@ class StudentService:
 
     @staticmethod
     def _calculate_attendance_metrics(enrollment, include_records=False):
-        """Helper privado para no repetir la lógica del 70% / 30%"""
-        # Si me piden el detalle, traigo los objetos, sino solo cuento
-        records_qs = enrollment.attendance_records.all().order_by("session_number")
-
-        total = records_qs.count()
-        present = records_qs.filter(status="P").count()
-        justified = records_qs.filter(
-            status="J"
-        ).count()  # La 'J' cuenta como asistencia para el %
-        absent = records_qs.filter(status="F").count()
+        """
+        Helper privado para no repetir la lógica del 70% / 30%.
+        Los números salen de los contadores de la matrícula, sin contar registros.
+        """
+        total = enrollment.attendance_total
+        present = enrollment.attendance_present
+        justified = enrollment.attendance_justified  # La 'J' cuenta como asistencia
+        absent = enrollment.attendance_absent
+        streak = attendance_vector.current_absence_streak(enrollment.attendance_vector)
 
         percentage = round(((present + justified) / total) * 100, 2) if total > 0 else 0
 
@@ -366,10 +369,14 @@ class StudentService:
             "percentage": percentage,
             "status_class": status_class,
             "status_text": status_text,
+            "absence_streak": streak,
+            "absence_alert": streak >= attendance_vector.ABSENCE_ALERT_STREAK,
         }
 
         if include_records:
-            result["attendance_records"] = records_qs
+            result["attendance_records"] = enrollment.attendance_records.all().order_by(
+                "session_number"
+            )
 
         return result
 
@@ -380,42 +387,86 @@ class StudentService:
         """
         Obtiene las campañas activas donde el alumno puede inscribirse
         Retorna: Lista de cursos con labs disponibles y sus campañas
+        Son las mismas consultas tenga 1 o 7 cursos: todo sale con IN y los
+        inscritos de cada lab con un solo Count.
         """
         # 1. Cursos activos del estudiante SIN lab asignado
-        enrollments_no_lab = StudentEnrollment.objects.filter(
-            student=student, status="ACTIVO", lab_assignment__isnull=True
-        ).select_related("course")
+        enrollments_no_lab = list(
+            StudentEnrollment.objects.filter(
+                student=student, status="ACTIVO", lab_assignment__isnull=True
+            ).select_related("course")
+        )
+        course_ids = [enrollment.course_id for enrollment in enrollments_no_lab]
+
+        # 2. Campaña activa de cada curso (la primera si hubiera más de una)
+        campaigns = {}
+        for campaign in LabEnrollmentCampaign.objects.filter(
+            course_id__in=course_ids, is_closed=False
+        ).order_by("created_at"):
+            campaigns.setdefault(campaign.course_id, campaign)
+        if not campaigns:
+            return []
+        campaign_ids = [campaign.campaign_id for campaign in campaigns.values()]
+
+        # 3. Postulaciones que ya hizo en esas campañas
+        postulated = {
+            postulation.campaign_id: postulation
+            for postulation in StudentPostulation.objects.filter(
+                campaign_id__in=campaign_ids, student=student
+            )
+        }
 
-        campaigns_data = []
+        # 4. Labs de esos cursos con sus inscritos en la campaña
+        labs_by_course = {}
+        for lab in (
+            LaboratoryGroup.objects.filter(course_id__in=campaigns.keys())
+            .select_related("room", "professor", "external_professor")
+            .annotate(
+                enrolled_count=Count(
+                    "postulations",
+                    filter=Q(postulations__campaign_id__in=campaign_ids),
+                )
+            )
+        ):
+            labs_by_course.setdefault(lab.course_id, []).append(lab)
+
+        # 4b. Preferencias ya registradas (solo si hay campañas por sorteo)
+        ranked = defaultdict(list)
+        lottery_ids = [
+            campaign.campaign_id
+            for campaign in campaigns.values()
+            if campaign.allocation_mode == "SORTEO"
+        ]
+        if lottery_ids:
+            for campaign_id, lab_id in (
+                LabPreference.objects.filter(
+                    campaign_id__in=lottery_ids, student=student
+                )
+                .order_by("rank")
+                .values_list("campaign_id", "lab_group_id")
+            ):
+                ranked[campaign_id].append(lab_id)
 
-        for enrollment in enrollments_no_lab:
-            # 2. Verificar si hay campaña activa para este curso
-            campaign = LabEnrollmentCampaign.objects.filter(
-                course=enrollment.course, is_closed=False
-            ).first()
+        # Su horario una sola vez; cada lab es solo un AND
+        timetable = student_timetable.get(student.pk)
 
+        campaigns_data = []
+        for enrollment in enrollments_no_lab:
+            campaign = campaigns.get(enrollment.course_id)
             if not campaign:
                 continue
 
-            # 3. Verificar si ya postuló
-            already_postulated = StudentPostulation.objects.filter(
-                campaign=campaign, student=student
-            ).first()
-
-            # 4. Obtener todos los labs del curso
-            labs = LaboratoryGroup.objects.filter(
-                course=enrollment.course
-            ).select_related("room", "professor", "external_professor")
+            already_postulated = postulated.get(campaign.campaign_id)
+            is_lottery = campaign.allocation_mode == "SORTEO"
+            preferences = ranked.get(campaign.campaign_id, [])
 
             # 5. Por cada lab, verificar conflictos de horario
             labs_with_status = []
-            for lab in labs:
-                has_conflict = StudentService._check_student_lab_conflict(student, lab)
-
-                # Contar cuántos ya están inscritos
-                enrolled_count = StudentPostulation.objects.filter(
-                    campaign=campaign, lab_group=lab
-                ).count()
+            for lab in labs_by_course.get(enrollment.course_id, []):
+                has_conflict = timetable.conflicts(
+                    student_timetable.lab_mask(lab), exclude_lab=lab.lab_id
+                )
+                enrolled_count = lab.enrolled_count
 
                 labs_with_status.append(
                     {
@@ -424,6 +475,11 @@ class StudentService:
                         "enrolled_count": enrolled_count,
                         "is_full": enrolled_count >= lab.capacity,
                         "available_spots": max(0, lab.capacity - enrolled_count),
+                        "preference_rank": (
+                            preferences.index(lab.lab_id) + 1
+                            if lab.lab_id in preferences
+                            else None
+                        ),
                     }
                 )
 
@@ -433,7 +489,9 @@ class StudentService:
                     "campaign": campaign,
                     "labs": labs_with_status,
                     "already_postulated": already_postulated,
-                    "can_postulate": not already_postulated,
+                    "can_postulate": not already_postulated and not is_lottery,
+                    "is_lottery": is_lottery,
+                    "preferences": preferences,
                 }
             )
 
@@ -461,60 +519,12 @@ class StudentService:
         - Horarios de teoría de TODOS sus cursos
         - Otros labs ya asignados
         - Otras postulaciones pendientes en otras campañas
+        Todo eso ya está en su horario en bits: es un AND con el lab.
         """
-
-        def overlap(s1, e1, s2, e2):
-            return s1 < e2 and s2 < e1
-
-        # 1. Obtener todas las matrículas activas del alumno
-        enrollments = StudentEnrollment.objects.filter(
-            student=student, status="ACTIVO"
-        ).select_related("course", "group")
-
-        for enrollment in enrollments:
-            # 2. Verificar horarios de teoría
-            if enrollment.group:
-                schedules = Schedule.objects.filter(course_group=enrollment.group)
-                for sch in schedules:
-                    if sch.day_of_week == lab_group.day_of_week:
-                        if overlap(
-                            lab_group.start_time,
-                            lab_group.end_time,
-                            sch.start_time,
-                            sch.end_time,
-                        ):
-                            return True
-
-            # 3. Verificar labs ya asignados
-            if enrollment.lab_assignment:
-                other_lab = enrollment.lab_assignment.lab_group
-                if other_lab.lab_id != lab_group.lab_id:
-                    if other_lab.day_of_week == lab_group.day_of_week:
-                        if overlap(
-                            lab_group.start_time,
-                            lab_group.end_time,
-                            other_lab.start_time,
-                            other_lab.end_time,
-                        ):
-                            return True
-
-        # 4. Verificar otras postulaciones pendientes (en otras campañas activas)
-        other_postulations = StudentPostulation.objects.filter(
-            student=student, status="PENDIENTE"
-        ).select_related("lab_group")
-
-        for post in other_postulations:
-            if post.lab_group.lab_id != lab_group.lab_id:
-                if post.lab_group.day_of_week == lab_group.day_of_week:
-                    if overlap(
-                        lab_group.start_time,
-                        lab_group.end_time,
-                        post.lab_group.start_time,
-                        post.lab_group.end_time,
-                    ):
-                        return True
-
-        return False
+        timetable = student_timetable.get(student.pk)
+        return timetable.conflicts(
+            student_timetable.lab_mask(lab_group), exclude_lab=lab_group.lab_id
+        )
 
     @staticmethod
     @transaction.atomic
@@ -534,6 +544,13 @@ class StudentService:
                 result["errors"].append("La campaña de inscripción no está disponible.")
                 return result
 
+            # En campañas por sorteo no hay cupos por orden de llegada
+            if campaign.allocation_mode == "SORTEO":
+                result["errors"].append(
+                    "Esta campaña es por sorteo: ordena tus laboratorios preferidos."
+                )
+                return result
+
             # 2. Verificar que el alumno está matriculado en el curso
             enrollment = StudentEnrollment.objects.filter(
                 student=student, course=campaign.course, status="ACTIVO"
@@ -570,33 +587,39 @@ class StudentService:
                 )
                 return result
 
-            # 6. Verificar cupos disponibles
-            current_enrolled = StudentPostulation.objects.filter(
-                campaign=campaign, lab_group=lab
-            ).count()
-
-            if current_enrolled >= lab.capacity:
+            # 6. Reservar cupo (contador atómico: dos alumnos a la vez no
+            # pueden quedarse con el último cupo)
+            if not seat_counters.reserve(campaign.campaign_id, lab):
                 result["errors"].append(
                     "Este laboratorio ya no tiene cupos disponibles."
                 )
                 return result
 
-            # 7. Crear postulación Y asignar inmediatamente
-            postulation = StudentPostulation.objects.create(
-                campaign=campaign, student=student, lab_group=lab, status="ACEPTADO"
-            )
-
-            # 8. Crear asignación inmediata
-            assignment = LabAssignment.objects.create(
-                postulation=postulation,
-                student=student,
-                lab_group=lab,
-                assignment_method="DIRECTO",
-            )
-
-            # 9. Actualizar matrícula
-            enrollment.lab_assignment = assignment
-            enrollment.save()
+            try:
+                with transaction.atomic():
+                    # 7. Crear postulación Y asignar inmediatamente
+                    postulation = StudentPostulation.objects.create(
+                        campaign=campaign,
+                        student=student,
+                        lab_group=lab,
+                        status="ACEPTADO",
+                    )
+
+                    # 8. Crear asignación inmediata
+                    assignment = LabAssignment.objects.create(
+                        postulation=postulation,
+                        student=student,
+                        lab_group=lab,
+                        assignment_method="DIRECTO",
+                    )
+
+                    # 9. Actualizar matrícula
+                    enrollment.lab_assignment = assignment
+                    enrollment.save()
+            except Exception:
+                # No se guardó (ej. doble clic): devuelvo el cupo
+                seat_counters.release(campaign.campaign_id, lab.lab_id)
+                raise
 
             result["success"] = True
             result["postulation_id"] = str(postulation.postulation_id)
@@ -606,6 +629,65 @@ class StudentService:
 
         return result
 
+    @staticmethod
+    @transaction.atomic
+    def save_lab_preferences(student, campaign_id, lab_ids):
+        """
+        En campañas por sorteo: el alumno ordena los labs que quiere (el 1° es
+        el que más quiere). Puede cambiar el orden hasta que cierre la campaña;
+        cada envío reemplaza al anterior. Aquí no se reserva ningún cupo.
+        """
+        result = {"success": False, "errors": []}
+
+        try:
+            campaign = LabEnrollmentCampaign.objects.filter(
+                campaign_id=campaign_id, is_closed=False, allocation_mode="SORTEO"
+            ).first()
+
+            if not campaign:
+                result["errors"].append("La campaña de sorteo no está disponible.")
+                return result
+
+            if not StudentEnrollment.objects.filter(
+                student=student, course_id=campaign.course_id, status="ACTIVO"
+            ).exists():
+                result["errors"].append("No estás matriculado en este curso.")
+                return result
+
+            lab_ids = [str(lab_id) for lab_id in lab_ids]
+            if len(set(lab_ids)) != len(lab_ids):
+                result["errors"].append("No puedes repetir un laboratorio.")
+                return result
+
+            labs = {
+                str(lab.lab_id): lab
+                for lab in LaboratoryGroup.objects.filter(
+                    course_id=campaign.course_id, lab_id__in=lab_ids
+                )
+            }
+            if len(labs) != len(lab_ids):
+                result["errors"].append("El laboratorio seleccionado no existe.")
+                return result
+
+            LabPreference.objects.filter(campaign=campaign, student=student).delete()
+            LabPreference.objects.bulk_create(
+                LabPreference(
+                    campaign=campaign,
+                    student=student,
+                    lab_group=labs[lab_id],
+                    rank=rank,
+                )
+                for rank, lab_id in enumerate(lab_ids, start=1)
+            )
+
+            result["success"] = True
+            result["saved"] = len(lab_ids)
+
+        except Exception as e:
+            result["errors"].append(f"Error al guardar preferencias: {str(e)}")
+
+        return result
+
     @staticmethod
     def get_student_postulations(student):
         """
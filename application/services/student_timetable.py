@@ -0,0 +1,93 @@
+from django.core.cache import cache
+
+from domain.academic_structure.timetable import WeeklyTimetable, block_mask
+from infrastructure.persistence.models import StudentEnrollment, StudentPostulation
+
+# Horario en bits de cada alumno (Redis). Las señales lo borran cuando algo cambia
+KEY = "timetable:{student_id}"
+# Por si alguna escritura masiva se escapa de la invalidación
+TIMEOUT = 60 * 60 * 24
+
+
+def _key(student_id):
+    return KEY.format(student_id=student_id)
+
+
+def lab_mask(lab_group):
+    return block_mask(lab_group.day_of_week, lab_group.start_time, lab_group.end_time)
+
+
+def get(student_id):
+    return get_many([student_id])[student_id]
+
+
+def get_many(student_ids):
+    """
+    {student_id: WeeklyTimetable}. Lo que está en caché sale de ahí y el resto
+    se arma en 3 consultas para todos a la vez (no una por matrícula).
+    """
+    student_ids = set(student_ids)
+    keys = {_key(student_id): student_id for student_id in student_ids}
+    cached = cache.get_many(keys.keys())
+    timetables = {keys[key]: WeeklyTimetable(*value) for key, value in cached.items()}
+
+    missing = student_ids - timetables.keys()
+    if missing:
+        built = _build(missing)
+        cache.set_many(
+            {_key(student_id): tuple(t) for student_id, t in built.items()}, TIMEOUT
+        )
+        timetables.update(built)
+    return timetables
+
+
+def invalidate(student_ids):
+    cache.delete_many([_key(student_id) for student_id in student_ids])
+
+
+def _build(student_ids):
+    theory = dict.fromkeys(student_ids, 0)
+    assigned = {student_id: {} for student_id in student_ids}
+    pending = {student_id: {} for student_id in student_ids}
+
+    active = StudentEnrollment.objects.filter(
+        student_id__in=student_ids, status="ACTIVO"
+    )
+    for student_id, day, start, end in active.filter(
+        group__schedules__isnull=False
+    ).values_list(
+        "student_id",
+        "group__schedules__day_of_week",
+        "group__schedules__start_time",
+        "group__schedules__end_time",
+    ):
+        theory[student_id] |= block_mask(day, start, end)
+
+    for student_id, lab_id, day, start, end in active.filter(
+        lab_assignment__isnull=False
+    ).values_list(
+        "student_id",
+        "lab_assignment__lab_group_id",
+        "lab_assignment__lab_group__day_of_week",
+        "lab_assignment__lab_group__start_time",
+        "lab_assignment__lab_group__end_time",
+    ):
+        assigned[student_id][lab_id] = block_mask(day, start, end)
+
+    for student_id, lab_id, day, start, end in StudentPostulation.objects.filter(
+        student_id__in=student_ids, status="PENDIENTE"
+    ).values_list(
+        "student_id",
+        "lab_group_id",
+        "lab_group__day_of_week",
+        "lab_group__start_time",
+        "lab_group__end_time",
+    ):
+        pending[student_id][lab_id] = block_mask(day, start, end)
+
+    return {
+        student_id: WeeklyTimetable(
+            theory[student_id], assigned[student_id], pending[student_id]
+        )
+        for student_id in student_ids
+    }
@@ -0,0 +1,63 @@
+from celery import shared_task
+from django.core.files.storage import default_storage
+
+from application.services.secretaria_services import SecretariaService
+
+
+@shared_task(bind=True)
+def process_student_csv_task(self, group_id, file_path):
+    """
+    Carga masiva de alumnos en segundo plano.
+    Lee el CSV desde media en streaming y publica el avance en el estado de la tarea.
+    """
+
+    def report(progress):
+        self.update_state(state="PROGRESS", meta=progress)
+
+    try:
+        with default_storage.open(file_path, "rb") as csv_file:
+            result = SecretariaService.process_student_csv(
+                group_id, csv_file, progress_callback=report
+            )
+    finally:
+        default_storage.delete(file_path)
+
+    if not result["success"]:
+        return {"success": False, "error": result["error"]}
+
+    return {
+        "success": True,
+        "stats": result["stats"],
+        "group_code": result["group"].group_code,
+    }
+
+
+@shared_task(bind=True)
+def process_roster_batch_task(self, file_path):
+    """Carga de inicio de semestre (ZIP/XLSX con varios grupos) en segundo plano"""
+
+    def report(progress):
+        self.update_state(state="PROGRESS", meta=progress)
+
+    try:
+        with default_storage.open(file_path, "rb") as archive_file:
+            return SecretariaService.process_roster_batch(
+                archive_file, file_path, progress_callback=report
+            )
+    finally:
+        default_storage.delete(file_path)
+
+
+@shared_task(bind=True)
+def build_consolidated_grades_task(
+    self, semester_id=None, course_id=None, force=False
+):
+    """Consolidado de notas (una hoja por grupo) con avance por grupo escrito"""
+
+    def report(progress):
+        self.update_state(state="PROGRESS", meta=progress)
+
+    artifact = SecretariaService.build_consolidated_grades_file(
+        semester_id, course_id, progress_callback=report, force=force
+    )
+    return {"success": True, **artifact}
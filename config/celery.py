@@ -10,7 +10,9 @@ app = Celery("sgac")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # 3. Descubrir tareas automáticamente en todas las apps instaladas (tasks.py)
+#    y en la capa de aplicación, que no es una app de Django
 app.autodiscover_tasks()
+app.autodiscover_tasks(["application"])
 
 
 @app.task(bind=True)
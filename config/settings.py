@@ -121,6 +121,17 @@ DATABASES = {
 # Modelo de Usuario Personalizado
 AUTH_USER_MODEL = "persistence.CustomUser"
 
+# El segundo backend activa en su primer login a los alumnos creados sin contraseña
+AUTHENTICATION_BACKENDS = [
+    "django.contrib.auth.backends.ModelBackend",
+    "infrastructure.persistence.backends.PendingActivationBackend",
+]
+
+# Carga masiva: los alumnos nuevos se crean sin hash y se activan al entrar por primera vez
+ROSTER_DEFER_PASSWORD_HASHING = config(
+    "ROSTER_DEFER_PASSWORD_HASHING", default=True, cast=bool
+)
+
 # ==================== CACHE & CELERY (REDIS) ====================
 REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
 
@@ -139,6 +150,9 @@ CACHES = {
     }
 }
 
+# Reportes generados en segundo plano: cuánto tiempo se reutiliza el archivo (segundos)
+REPORT_ARTIFACT_TIMEOUT = config("REPORT_ARTIFACT_TIMEOUT", default=3600, cast=int)
+
 # ==================== VALIDACIÓN DE PASSWORD ====================
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -33,3 +33,17 @@ LOGGING = {
         "level": "WARNING",  # Solo mostrar warnings y errores en tests
     },
 }
+
+# Celery: ejecutar tareas en el mismo proceso, sin Redis
+CELERY_BROKER_URL = "memory://"
+CELERY_RESULT_BACKEND = "cache+memory://"
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_STORE_EAGER_RESULT = True
+
+# Caché local: los tests no dependen de Redis
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
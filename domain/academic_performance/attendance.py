@@ -0,0 +1,50 @@
+# Asistencia de una matrícula en un string: un carácter por sesión.
+# "PPF-J" = sesión 1 presente, 2 presente, 3 falta, 4 sin registro, 5 justificada
+NO_RECORD = "-"
+
+# Faltas seguidas a partir de las cuales se avisa al profe y al alumno
+ABSENCE_ALERT_STREAK = 3
+
+
+def set_status(vector, session_number, status):
+    """Devuelve el vector con la sesión cambiada (rellena con '-' si es más corto)"""
+    index = session_number - 1
+    if len(vector) <= index:
+        return vector.ljust(index, NO_RECORD) + status
+    return vector[:index] + status + vector[index + 1 :]
+
+
+def status_at(vector, session_number):
+    index = session_number - 1
+    return vector[index] if 0 <= index < len(vector) else NO_RECORD
+
+
+def build(statuses):
+    """statuses: {session_number: estado} -> vector"""
+    vector = ""
+    for session_number in sorted(statuses):
+        vector = set_status(vector, session_number, statuses[session_number])
+    return vector
+
+
+def current_absence_streak(vector):
+    """Faltas seguidas al final (las sesiones sin registro no cortan la racha)"""
+    streak = 0
+    for status in reversed(vector):
+        if status == "F":
+            streak += 1
+        elif status != NO_RECORD:
+            break
+    return streak
+
+
+def longest_absence_streak(vector):
+    """La racha de faltas más larga del semestre"""
+    longest = streak = 0
+    for status in vector:
+        if status == "F":
+            streak += 1
+            longest = max(longest, streak)
+        elif status != NO_RECORD:
+            streak = 0
+    return longest
@@ -0,0 +1,35 @@
+from datetime import timedelta
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def session_dates(start, end, weekdays):
+    """
+    Fechas de clase entre start y end (incluidas) para los días de la semana
+    dados (0=Lunes ... 6=Domingo), en orden. Sin recorrer día por día: el
+    primer día de cada weekday sale con un módulo y el resto de 7 en 7.
+    weekdays tiene que ser hashable (tupla o frozenset) para el caché.
+    """
+    dates = []
+    for weekday in set(weekdays):
+        current = start + timedelta(days=(weekday - start.weekday()) % 7)
+        if current > end:
+            continue
+        weeks = (end - current).days // 7 + 1
+        dates.extend(current + timedelta(weeks=week) for week in range(weeks))
+    dates.sort()
+    return tuple(dates)
+
+
+def class_dates(start, end, weekdays, closed=(), makeups=()):
+    """
+    session_dates con las excepciones del semestre aplicadas.
+    closed: fechas sin clases (feriados, suspensiones)
+    makeups: [(fecha, weekday)] días de recuperación y qué día se dicta en cada uno
+    """
+    dates = set(session_dates(start, end, weekdays))
+    dates.update(
+        day for day, weekday in makeups if weekday in weekdays and start <= day <= end
+    )
+    dates.difference_update(closed)
+    return sorted(dates)
@@ -0,0 +1,41 @@
+import heapq
+from itertools import count
+
+
+def sweep_overlaps(blocks):
+    """
+    Barrido (sweep-line) sobre bloques (inicio, fin, item).
+    Ordeno por inicio y mantengo un heap con los bloques activos por fin;
+    cada bloque nuevo se cruza con todos los que siguen activos.
+    Devuelve los pares de bloques (tal cual llegaron) que se solapan:
+    O(n log n + cruces).
+    """
+    active = []
+    tie = count()
+
+    for block in sorted(blocks, key=lambda b: (b[0], b[1])):
+        start, end = block[0], block[1]
+        # Fuera los que terminaron antes (o justo cuando) empieza este
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        for _, _, other in active:
+            yield other, block
+
+        heapq.heappush(active, (end, next(tie), block))
+
+
+def overlaps_by_key(blocks, key):
+    """
+    Igual que sweep_overlaps pero solo entre bloques que comparten key(item)
+    (mismo salón, mismo profesor...). Items sin key (None) se ignoran.
+    """
+    grouped = {}
+    for block in blocks:
+        k = key(block[2])
+        if k is not None:
+            grouped.setdefault(k, []).append(block)
+
+    for k, group in grouped.items():
+        for a, b in sweep_overlaps(group):
+            yield k, a, b
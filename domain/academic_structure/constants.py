@@ -20,6 +20,19 @@ POSTULATION_STATUS_CHOICES = [
 # Formas de asignar laboratorio
 ASSIGNMENT_METHOD_CHOICES = [("AUTOMATIC", "Automático"), ("LOTTERY", "Sorteo")]
 
+# Cómo reparte cupos una campaña de laboratorio
+CAMPAIGN_MODE_CHOICES = [
+    ("DIRECTO", "Por orden de llegada"),
+    ("SORTEO", "Sorteo al cierre por preferencias"),
+]
+
+# Días que se salen del horario normal del semestre
+CALENDAR_EXCEPTION_CHOICES = [
+    ("FERIADO", "Feriado"),
+    ("SUSPENSION", "Suspensión de clases"),
+    ("RECUPERACION", "Día de recuperación"),
+]
+
 # Estado de la matrícula del alumno
 ENROLLMENT_STATUS_CHOICES = [
     ("ACTIVO", "Activo"),
@@ -0,0 +1,71 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+# Un bloque ocupado de un salón. kind: "CLASE", "LAB" o "RESERVA"; ref_id es la PK de origen
+Occupancy = namedtuple("Occupancy", "start end kind ref_id label")
+
+
+class RoomOccupancyIndex:
+    """
+    Índice de ocupación de salones para un día.
+    Por salón guardo los bloques ordenados por inicio y el máximo fin acumulado,
+    así "¿está libre?" es una búsqueda binaria aunque haya bloques solapados.
+    No toca la BD: recibe (room_id, Occupancy) y responde en memoria.
+    """
+
+    def __init__(self, entries=()):
+        by_room = {}
+        for room_id, occupancy in entries:
+            if room_id is not None:
+                by_room.setdefault(room_id, []).append(occupancy)
+
+        self._rooms = {}
+        for room_id, blocks in by_room.items():
+            blocks.sort(key=lambda b: (b.start, b.end))
+            max_end = []
+            for block in blocks:
+                max_end.append(
+                    block.end if not max_end or block.end > max_end[-1] else max_end[-1]
+                )
+            self._rooms[room_id] = ([b.start for b in blocks], max_end, blocks)
+
+    def rooms(self):
+        return self._rooms.keys()
+
+    def conflicts(self, room_id, start, end, exclude=()):
+        """
+        Bloques del salón que se cruzan con [start, end).
+        exclude: pares (kind, ref_id) a ignorar (ej. el mismo lab que se edita).
+        """
+        if room_id not in self._rooms:
+            return []
+
+        starts, max_end, blocks = self._rooms[room_id]
+        # Solo los bloques que empiezan antes de `end` pueden cruzarse
+        i = bisect_left(starts, end) - 1
+        found = []
+        # Retrocedo mientras algún bloque anterior termine después de `start`
+        while i >= 0 and max_end[i] > start:
+            block = blocks[i]
+            if block.end > start and (block.kind, block.ref_id) not in exclude:
+                found.append(block)
+            i -= 1
+
+        found.reverse()
+        return found
+
+    def is_free(self, room_id, start, end, exclude=()):
+        if not exclude:
+            # Camino rápido: basta mirar el máximo fin antes de `end`
+            if room_id not in self._rooms:
+                return True
+            starts, max_end, _ = self._rooms[room_id]
+            i = bisect_left(starts, end) - 1
+            return i < 0 or max_end[i] <= start
+        return not self.conflicts(room_id, start, end, exclude)
+
+    def busy_rooms(self, start, end):
+        """Salones con algún bloque cruzado con [start, end)"""
+        return {
+            room_id for room_id in self._rooms if not self.is_free(room_id, start, end)
+        }
@@ -0,0 +1,57 @@
+from collections import namedtuple
+from datetime import time
+
+# La semana en franjas de 10 minutos: 7 días x 144 franjas = 1008 bits en un int
+SLOT_MINUTES = 10
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_DAYS = ("LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO")
+DAY_OFFSETS = {day: i * SLOTS_PER_DAY for i, day in enumerate(WEEK_DAYS)}
+
+
+def _minutes(value):
+    if isinstance(value, str):
+        # Un lab recién creado en el form todavía trae "08:00"
+        value = time.fromisoformat(value)
+    return value.hour * 60 + value.minute
+
+
+def block_mask(day, start, end):
+    """
+    Bits de las franjas que toca el bloque. Redondeo hacia afuera (inicio hacia
+    abajo, fin hacia arriba) para no perder cruces si algún horario no cae
+    justo en múltiplo de 10 minutos. Los bloques que solo se tocan no se cruzan.
+    """
+    offset = DAY_OFFSETS.get(day)
+    if offset is None:
+        return 0
+    first = _minutes(start) // SLOT_MINUTES
+    last = -(-_minutes(end) // SLOT_MINUTES)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << (offset + first)
+
+
+class WeeklyTimetable(namedtuple("WeeklyTimetable", "theory assigned pending")):
+    """
+    Horario semanal de un alumno como máscaras de bits.
+    theory: int con todas sus clases de teoría
+    assigned / pending: {lab_id: int} labs asignados y postulaciones pendientes
+    (separados por lab para poder ignorar el mismo lab que se está revisando).
+    Revisar un cruce es un AND, sin tocar la BD.
+    """
+
+    @classmethod
+    def empty(cls):
+        return cls(0, {}, {})
+
+    def busy_mask(self, exclude_lab=None, include_pending=True):
+        mask = self.theory
+        sources = (self.assigned, self.pending) if include_pending else (self.assigned,)
+        for labs in sources:
+            for lab_id, lab_mask in labs.items():
+                if lab_id != exclude_lab:
+                    mask |= lab_mask
+        return mask
+
+    def conflicts(self, mask, exclude_lab=None, include_pending=True):
+        return bool(mask & self.busy_mask(exclude_lab, include_pending))
@@ -0,0 +1,274 @@
+import random
+from collections import deque, namedtuple
+
+# Un bloque semanal: ("LUNES", time(8, 0), time(10, 0)). label es solo para reportes
+TimeBlock = namedtuple("TimeBlock", "day start end label", defaults=(None,))
+
+# Un lab ofertado: seats son los cupos que quedan libres
+LabOption = namedtuple("LabOption", "lab_id course_id seats block")
+
+# Un alumno que necesita lab en un curso. preferred: lab al que ya postuló (o None)
+LabRequest = namedtuple("LabRequest", "student_id course_id preferred")
+
+# Motivos por los que un alumno se queda sin lab
+NO_OPTIONS = "CRUCE"  # Todos los labs del curso se cruzan con su horario
+NO_SEATS = "SIN_CUPO"  # Tenía labs compatibles pero estaban llenos
+
+
+def overlaps(a, b):
+    return a.day == b.day and a.start < b.end and b.start < a.end
+
+
+class AssignmentResult:
+    """Resultado del motor: quién va a qué lab y quién se queda sin lab (y por qué)"""
+
+    def __init__(self):
+        self.assigned = {}  # (student_id, course_id) -> lab_id
+        self.unassigned = {}  # (student_id, course_id) -> motivo
+        self.options = {}  # (student_id, course_id) -> [lab_id compatibles]
+        self.causes = {}  # (student_id, course_id) -> [qué se cruza], solo si es CRUCE
+        self.order = []  # En sorteo: (student_id, course_id) en el orden que eligieron
+
+    def __len__(self):
+        return len(self.assigned)
+
+
+class LabAssignmentEngine:
+    """
+    Asignación global de labs, sin BD: trabaja con datos ya cargados.
+
+    Cada curso es un problema de matching bipartito con capacidades
+    (alumno -> lab compatible, cada lab con sus cupos). Lo resuelvo con caminos
+    de aumento (BFS): si el lab que quiere un alumno está lleno, busco a alguien
+    de ese lab que pueda moverse a otro con cupo. Así el número de alumnos
+    asignados en el curso es el máximo posible, no depende del orden.
+
+    Entre cursos no es un matching puro (dos labs del mismo alumno no pueden
+    cruzarse), así que voy curso por curso empezando por los más ajustados de
+    cupos y agrego al horario del alumno el lab que le tocó.
+    """
+
+    def __init__(self, labs, busy):
+        """
+        labs: iterable de LabOption
+        busy: {student_id: [TimeBlock]} horario fijo (teoría, labs ya asignados...)
+        """
+        self.labs_by_course = {}
+        for lab in labs:
+            self.labs_by_course.setdefault(lab.course_id, []).append(lab)
+        self.busy = {student: list(blocks) for student, blocks in busy.items()}
+
+    def solve(self, requests):
+        result = AssignmentResult()
+
+        by_course = {}
+        for request in requests:
+            by_course.setdefault(request.course_id, []).append(request)
+
+        # Primero los cursos con menos holgura (cupos - demanda)
+        def slack(course_id):
+            seats = sum(lab.seats for lab in self.labs_by_course.get(course_id, []))
+            return seats - len(by_course[course_id])
+
+        for course_id in sorted(by_course, key=lambda c: (slack(c), str(c))):
+            self._solve_course(course_id, by_course[course_id], result)
+
+        return result
+
+    def solve_first_fit(self, requests):
+        """
+        Mismo criterio que el asignar_labs de siempre: en orden de llegada, el
+        primer lab compatible con cupo. No mueve a nadie, pero es predecible.
+        """
+        result = AssignmentResult()
+        taken = {}
+
+        for request in requests:
+            key = (request.student_id, request.course_id)
+            busy = self.busy.setdefault(request.student_id, [])
+            compatible = [
+                lab
+                for lab in self.labs_by_course.get(request.course_id, [])
+                if not any(overlaps(lab.block, block) for block in busy)
+            ]
+            result.options[key] = [lab.lab_id for lab in compatible]
+
+            lab = next(
+                (lab for lab in compatible if taken.get(lab.lab_id, 0) < lab.seats),
+                None,
+            )
+            if lab is None:
+                self._mark_unassigned(key, bool(compatible), result)
+                continue
+
+            taken[lab.lab_id] = taken.get(lab.lab_id, 0) + 1
+            busy.append(lab.block)
+            result.assigned[key] = lab.lab_id
+
+        return result
+
+    def solve_lottery(self, requests, preferences, seed):
+        """
+        Dictadura serial con orden sorteado: cada alumno, en el orden que salió
+        del sorteo, se queda con el lab mejor rankeado que aún tenga cupo y no
+        se le cruce. Si sus preferencias ya se llenaron, le toca el primer lab
+        compatible que quede (no rankear un lab no deja a nadie sin lab).
+        preferences: {(student_id, course_id): [lab_id, ...]} del 1° al último.
+        Con la misma semilla y las mismas preferencias sale siempre lo mismo.
+        Los que registraron preferencias eligen antes que los que no.
+        """
+        result = AssignmentResult()
+        taken = {}
+
+        ordered = sorted(
+            lottery_order(requests, seed),
+            key=lambda r: (r.student_id, r.course_id) not in preferences,
+        )
+        for request in ordered:
+            key = (request.student_id, request.course_id)
+            result.order.append(key)
+            busy = self.busy.setdefault(request.student_id, [])
+            labs = {
+                lab.lab_id: lab
+                for lab in self.labs_by_course.get(request.course_id, [])
+                if not any(overlaps(lab.block, block) for block in busy)
+            }
+            ranking = [lab_id for lab_id in preferences.get(key, []) if lab_id in labs]
+            ranking += [lab_id for lab_id in labs if lab_id not in ranking]
+            result.options[key] = ranking
+
+            lab_id = next(
+                (
+                    lab_id
+                    for lab_id in ranking
+                    if taken.get(lab_id, 0) < labs[lab_id].seats
+                ),
+                None,
+            )
+            if lab_id is None:
+                self._mark_unassigned(key, bool(ranking), result)
+                continue
+
+            taken[lab_id] = taken.get(lab_id, 0) + 1
+            busy.append(labs[lab_id].block)
+            result.assigned[key] = lab_id
+
+        return result
+
+    def _solve_course(self, course_id, requests, result):
+        labs = {lab.lab_id: lab for lab in self.labs_by_course.get(course_id, [])}
+        holders = {lab_id: set() for lab_id in labs}
+        match = {}
+
+        # Labs compatibles de cada alumno, con el que eligió primero
+        options = {}
+        for request in requests:
+            busy = self.busy.get(request.student_id, [])
+            compatible = [
+                lab_id
+                for lab_id, lab in labs.items()
+                if not any(overlaps(lab.block, block) for block in busy)
+            ]
+            compatible.sort(key=lambda lab_id: lab_id != request.preferred)
+            options[request.student_id] = compatible
+            result.options[(request.student_id, course_id)] = compatible
+
+        # Los que tienen menos opciones van primero (menos caminos largos)
+        for request in sorted(requests, key=lambda r: len(options[r.student_id])):
+            self._augment(request.student_id, options, labs, holders, match)
+
+        for request in requests:
+            key = (request.student_id, course_id)
+            lab_id = match.get(request.student_id)
+            if lab_id:
+                result.assigned[key] = lab_id
+                self.busy.setdefault(request.student_id, []).append(labs[lab_id].block)
+            else:
+                self._mark_unassigned(key, bool(options[request.student_id]), result)
+
+    def _mark_unassigned(self, key, had_options, result):
+        if had_options:
+            result.unassigned[key] = NO_SEATS
+            return
+
+        student_id, course_id = key
+        result.unassigned[key] = NO_OPTIONS
+        causes = {
+            block.label
+            for lab in self.labs_by_course.get(course_id, [])
+            for block in self.busy.get(student_id, [])
+            if overlaps(lab.block, block)
+        }
+        result.causes[key] = sorted(label for label in causes if label)
+
+    @staticmethod
+    def _augment(root, options, labs, holders, match):
+        """BFS desde root buscando un lab con cupo; si lo encuentro, desplazo la cadena"""
+        reached_lab = {}  # lab -> alumno que llegó a él
+        via_lab = {root: None}  # alumno -> lab del que saldría
+        queue = deque([root])
+
+        free_lab = None
+        while queue and free_lab is None:
+            student = queue.popleft()
+            for lab_id in options[student]:
+                if lab_id in reached_lab:
+                    continue
+                reached_lab[lab_id] = student
+                if len(holders[lab_id]) < labs[lab_id].seats:
+                    free_lab = lab_id
+                    break
+                for other in holders[lab_id]:
+                    if other not in via_lab:
+                        via_lab[other] = lab_id
+                        queue.append(other)
+
+        if free_lab is None:
+            return False
+
+        lab_id = free_lab
+        while lab_id is not None:
+            student = reached_lab[lab_id]
+            previous = via_lab[student]
+            holders[lab_id].add(student)
+            match[student] = lab_id
+            if previous is not None:
+                holders[previous].discard(student)
+            lab_id = previous
+        return True
+
+
+def lottery_order(requests, seed):
+    """
+    Orden del sorteo. Parto de un orden fijo (por id) para que el resultado
+    dependa solo de la semilla y no de cómo vinieron las filas de la BD.
+    """
+    ordered = sorted(requests, key=lambda r: (str(r.student_id), str(r.course_id)))
+    random.Random(seed).shuffle(ordered)
+    return ordered
+
+
+def suggest_extra_seats(result):
+    """
+    Cuántos cupos agregar y en qué labs para que entren los que quedaron SIN_CUPO.
+    Con el matching por curso basta un cupo más en cualquier lab compatible por
+    alumno; elijo primero el lab que sirve a más alumnos (cobertura golosa) para
+    concentrar el aumento en pocos grupos. Los de CRUCE no se arreglan con cupos.
+    """
+    pending = {
+        key: result.options.get(key, [])
+        for key, reason in result.unassigned.items()
+        if reason == NO_SEATS
+    }
+    extra = {}
+    while pending:
+        counts = {}
+        for options in pending.values():
+            for lab_id in options:
+                counts[lab_id] = counts.get(lab_id, 0) + 1
+        if not counts:
+            break
+        best = max(counts, key=lambda lab_id: (counts[lab_id], str(lab_id)))
+        extra[best] = counts[best]
+        pending = {k: v for k, v in pending.items() if best not in v}
+    return extra
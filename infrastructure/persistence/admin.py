@@ -5,6 +5,7 @@ from .models import (
     ExternalProfessor,
     Classroom,
     Semester,
+    CalendarException,
     Course,
     CourseGroup,
     Schedule,
@@ -16,6 +17,7 @@ from .models import (
     SessionProgress,
     LabEnrollmentCampaign,
     StudentPostulation,
+    LabPreference,
     LabAssignment,
     StudentEnrollment,
     AttendanceRecord,
@@ -86,6 +88,19 @@ class SemesterAdmin(admin.ModelAdmin):
     ordering = ["-start_date"]
 
 
+@admin.register(CalendarException)
+class CalendarExceptionAdmin(admin.ModelAdmin):
+    list_display = ["date", "kind", "makeup_for_day", "semester", "description"]
+    list_filter = ["kind", "semester"]
+    ordering = ["date"]
+
+    def has_delete_permission(self, request, obj=None):
+        # Una recuperación con asistencia tomada no se borra (ver check_attendance_kept)
+        if obj and obj.kind == "RECUPERACION" and obj._has_attendance_on(obj.date):
+            return False
+        return super().has_delete_permission(request, obj)
+
+
 @admin.register(Classroom)
 class ClassroomAdmin(admin.ModelAdmin):
     list_display = ["code", "name", "capacity", "classroom_type", "is_active"]
@@ -197,8 +212,8 @@ class SessionProgressAdmin(admin.ModelAdmin):
 
 @admin.register(LabEnrollmentCampaign)
 class LabEnrollmentCampaignAdmin(admin.ModelAdmin):
-    list_display = ["course", "start_date", "end_date", "is_closed"]
-    list_filter = ["is_closed"]
+    list_display = ["course", "allocation_mode", "start_date", "end_date", "is_closed"]
+    list_filter = ["is_closed", "allocation_mode"]
     raw_id_fields = ["course"]
 
 
@@ -210,6 +225,13 @@ class StudentPostulationAdmin(admin.ModelAdmin):
     raw_id_fields = ["campaign", "student", "lab_group"]
 
 
+@admin.register(LabPreference)
+class LabPreferenceAdmin(admin.ModelAdmin):
+    list_display = ["student", "campaign", "lab_group", "rank"]
+    search_fields = ["student__email", "campaign__course__course_name"]
+    raw_id_fields = ["campaign", "student", "lab_group"]
+
+
 @admin.register(LabAssignment)
 class LabAssignmentAdmin(admin.ModelAdmin):
     list_display = ["student", "lab_group", "assignment_method", "assigned_at"]
@@ -244,6 +266,26 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     search_fields = ["enrollment__student__email"]
     raw_id_fields = ["enrollment", "recorded_by"]
 
+    # Editar a mano no pasa por apply_attendance_changes: recuento la matrícula
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.enrollment.calculate_attendance_percentage()
+
+    def delete_model(self, request, obj):
+        enrollment = obj.enrollment
+        super().delete_model(request, obj)
+        enrollment.calculate_attendance_percentage()
+
+    def delete_queryset(self, request, queryset):
+        enrollments = list(
+            StudentEnrollment.objects.filter(
+                attendance_records__in=queryset
+            ).distinct()
+        )
+        super().delete_queryset(request, queryset)
+        for enrollment in enrollments:
+            enrollment.calculate_attendance_percentage()
+
 
 @admin.register(GradeRecord)
 class GradeRecordAdmin(admin.ModelAdmin):
@@ -7,3 +7,9 @@ class PersistenceConfig(AppConfig):
     name = "infrastructure.persistence"
     # El nombre corto que se usa en settings.py y migraciones
     label = "persistence"
+
+    def ready(self):
+        # Señales que mantienen al día los índices/cachés derivados de los modelos
+        from .signals import connect_signals
+
+        connect_signals()
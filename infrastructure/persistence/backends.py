@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.utils.crypto import constant_time_compare
+
+UserModel = get_user_model()
+
+
+class PendingActivationBackend(ModelBackend):
+    """
+    Activa en su primer login a los alumnos creados por la carga masiva con
+    password inutilizable (pending_activation). La contraseña inicial sigue siendo el CUI: solo que el
+    hash PBKDF2 lo calculo aquí, una vez por alumno, y no durante la carga.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or not password:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            return None
+
+        # Solo cuentas marcadas por la carga masiva: una password inutilizable
+        # por sí sola también puede ser una cuenta bloqueada
+        if user.user_role != "ALUMNO" or not user.pending_activation:
+            return None
+
+        if not constant_time_compare(password, user.username):
+            return None
+
+        # Una cuenta desactivada no se activa (ni se guarda nada) por loguearse
+        if not self.user_can_authenticate(user):
+            return None
+
+        user.set_password(password)
+        user.pending_activation = False
+        user.save(update_fields=["password", "pending_activation", "updated_at"])
+        return user
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-16 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0003_classroomreservation_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attendancerecord",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="graderecord",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
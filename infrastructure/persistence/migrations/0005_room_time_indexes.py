@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-16 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0004_record_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="classroomreservation",
+            index=models.Index(
+                fields=["classroom", "reservation_date", "start_time"],
+                name="classroom_r_classro_8a4c8a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="laboratorygroup",
+            index=models.Index(
+                fields=["room", "day_of_week", "start_time"],
+                name="laboratory__room_id_2d7440_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="schedule",
+            index=models.Index(
+                fields=["room", "day_of_week", "start_time"],
+                name="schedules_room_id_a4ab52_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.11 on 2026-10-16 21:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0005_room_time_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="labenrollmentcampaign",
+            name="allocation_mode",
+            field=models.CharField(
+                choices=[
+                    ("DIRECTO", "Por orden de llegada"),
+                    ("SORTEO", "Sorteo al cierre por preferencias"),
+                ],
+                default="DIRECTO",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="labenrollmentcampaign",
+            name="lottery_seed",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.CreateModel(
+            name="LabPreference",
+            fields=[
+                (
+                    "preference_id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "campaign",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preferences",
+                        to="persistence.labenrollmentcampaign",
+                    ),
+                ),
+                (
+                    "lab_group",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preferences",
+                        to="persistence.laboratorygroup",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        limit_choices_to={"user_role": "ALUMNO"},
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lab_preferences",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Preferencia Lab",
+                "verbose_name_plural": "Preferencias Lab",
+                "db_table": "lab_preferences",
+                "ordering": ["rank"],
+                "unique_together": {
+                    ("campaign", "student", "rank"),
+                    ("campaign", "student", "lab_group"),
+                },
+            },
+        ),
+    ]
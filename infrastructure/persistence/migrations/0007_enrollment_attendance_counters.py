@@ -0,0 +1,68 @@
+# Generated by Django 4.2.11 on 2026-10-16 22:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+COUNTER_FIELDS = [
+    "attendance_present",
+    "attendance_justified",
+    "attendance_absent",
+    "attendance_total",
+]
+
+
+def fill_counters(apps, schema_editor):
+    """Los contadores arrancan con lo que ya hay en attendance_records"""
+    StudentEnrollment = apps.get_model("persistence", "StudentEnrollment")
+    enrollments = StudentEnrollment.objects.annotate(
+        present=Count("attendance_records", filter=Q(attendance_records__status="P")),
+        justified=Count(
+            "attendance_records", filter=Q(attendance_records__status="J")
+        ),
+        absent=Count("attendance_records", filter=Q(attendance_records__status="F")),
+        total=Count("attendance_records"),
+    ).filter(total__gt=0)
+
+    batch = []
+    for enrollment in enrollments.iterator(chunk_size=1000):
+        enrollment.attendance_present = enrollment.present
+        enrollment.attendance_justified = enrollment.justified
+        enrollment.attendance_absent = enrollment.absent
+        enrollment.attendance_total = enrollment.total
+        batch.append(enrollment)
+        if len(batch) == 1000:
+            StudentEnrollment.objects.bulk_update(batch, COUNTER_FIELDS)
+            batch = []
+    StudentEnrollment.objects.bulk_update(batch, COUNTER_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0006_lab_lottery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentenrollment",
+            name="attendance_present",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="studentenrollment",
+            name="attendance_justified",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="studentenrollment",
+            name="attendance_absent",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="studentenrollment",
+            name="attendance_total",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+def fill_vectors(apps, schema_editor):
+    """Arma el vector de cada matrícula con sus registros de asistencia"""
+    from domain.academic_performance import attendance
+
+    StudentEnrollment = apps.get_model("persistence", "StudentEnrollment")
+    AttendanceRecord = apps.get_model("persistence", "AttendanceRecord")
+
+    statuses = {}
+    for enrollment_id, session_number, status in AttendanceRecord.objects.values_list(
+        "enrollment_id", "session_number", "status"
+    ).iterator(chunk_size=5000):
+        statuses.setdefault(enrollment_id, {})[session_number] = status
+
+    batch = [
+        StudentEnrollment(pk=enrollment_id, attendance_vector=attendance.build(rows))
+        for enrollment_id, rows in statuses.items()
+    ]
+    StudentEnrollment.objects.bulk_update(
+        batch, ["attendance_vector"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0007_enrollment_attendance_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentenrollment",
+            name="attendance_vector",
+            field=models.CharField(blank=True, default="", max_length=200),
+        ),
+        migrations.RunPython(fill_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 4.2.11 on 2026-10-16 23:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0008_enrollment_attendance_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CalendarException",
+            fields=[
+                (
+                    "exception_id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("FERIADO", "Feriado"),
+                            ("SUSPENSION", "Suspensión de clases"),
+                            ("RECUPERACION", "Día de recuperación"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                (
+                    "makeup_for_day",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("LUNES", "Lunes"),
+                            ("MARTES", "Martes"),
+                            ("MIERCOLES", "Miércoles"),
+                            ("JUEVES", "Jueves"),
+                            ("VIERNES", "Viernes"),
+                        ],
+                        max_length=10,
+                        null=True,
+                    ),
+                ),
+                ("description", models.CharField(blank=True, max_length=200)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "semester",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="calendar_exceptions",
+                        to="persistence.semester",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Excepción de Calendario",
+                "verbose_name_plural": "Excepciones de Calendario",
+                "db_table": "calendar_exceptions",
+                "ordering": ["date"],
+                "unique_together": {("semester", "date")},
+            },
+        ),
+        migrations.CreateModel(
+            name="SessionIndex",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("session_number", models.PositiveSmallIntegerField()),
+                ("session_date", models.DateField()),
+                (
+                    "course_group",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="session_index",
+                        to="persistence.coursegroup",
+                    ),
+                ),
+                (
+                    "lab_group",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="session_index",
+                        to="persistence.laboratorygroup",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Índice de Sesiones",
+                "verbose_name_plural": "Índice de Sesiones",
+                "db_table": "session_index",
+                "unique_together": {
+                    ("course_group", "session_number"),
+                    ("lab_group", "session_number"),
+                },
+            },
+        ),
+        migrations.AddIndex(
+            model_name="sessionindex",
+            index=models.Index(
+                fields=["course_group", "session_date"],
+                name="session_idx_group_date",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sessionindex",
+            index=models.Index(
+                fields=["lab_group", "session_date"],
+                name="session_idx_lab_date",
+            ),
+        ),
+    ]
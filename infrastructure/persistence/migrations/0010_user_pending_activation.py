@@ -0,0 +1,30 @@
+# Generated by Django 4.2.11 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+def mark_pending(apps, schema_editor):
+    """
+    Alumnos de cargas anteriores con password diferida: password inutilizable y
+    nunca entraron. Una cuenta bloqueada a propósito ya tuvo su primer login.
+    """
+    CustomUser = apps.get_model("persistence", "CustomUser")
+    CustomUser.objects.filter(
+        user_role="ALUMNO", password__startswith="!", last_login__isnull=True
+    ).update(pending_activation=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("persistence", "0009_calendar_exceptions_session_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="pending_activation",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+    ]
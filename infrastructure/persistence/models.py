@@ -3,10 +3,13 @@ from decimal import Decimal
 from datetime import date, datetime
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models import Max, Q
+from django.core.exceptions import ValidationError
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Round
 
 # --- IMPORTACIONES DE MI CAPA DE DOMINIO ---
 # Traigo mis reglas de negocio para no tenerlas hardcodeadas aquí
+from domain.academic_performance import attendance as attendance_vector
 from domain.shared.constants import DAY_CHOICES
 from domain.identity.constants import ROLE_CHOICES, USER_STATUS_CHOICES
 from domain.academic_structure.constants import (
@@ -15,6 +18,8 @@ from domain.academic_structure.constants import (
     EVALUATION_TYPE_CHOICES,
     POSTULATION_STATUS_CHOICES,
     ASSIGNMENT_METHOD_CHOICES,
+    CAMPAIGN_MODE_CHOICES,
+    CALENDAR_EXCEPTION_CHOICES,
     ENROLLMENT_STATUS_CHOICES,
     ATTENDANCE_STATUS_CHOICES,
     RESERVATION_STATUS_CHOICES,
@@ -42,6 +47,11 @@ class CustomUser(AbstractUser):
         max_length=20, choices=USER_STATUS_CHOICES, default="INACTIVO"
     )
 
+    # Creado por la carga masiva sin contraseña: se activa en su primer login
+    # (PendingActivationBackend). Una cuenta bloqueada con password inutilizable
+    # no lleva esta marca.
+    pending_activation = models.BooleanField(default=False)
+
     # Seguridad básica
     failed_login_attempts = models.IntegerField(default=0)
     last_login_ip = models.GenericIPAddressField(blank=True, null=True)
@@ -117,6 +127,84 @@ class Semester(models.Model):
         return self.name
 
 
+class CalendarException(models.Model):
+    """
+    Un día que no sigue el horario normal: feriado o suspensión (no hay clases)
+    o recuperación (ese día se dicta lo de otro día, ej. el sábado va lo del lunes)
+    """
+
+    exception_id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False
+    )
+    semester = models.ForeignKey(
+        Semester, on_delete=models.CASCADE, related_name="calendar_exceptions"
+    )
+    date = models.DateField()
+    kind = models.CharField(max_length=15, choices=CALENDAR_EXCEPTION_CHOICES)
+    # Solo en recuperación: qué día de la semana se dicta
+    makeup_for_day = models.CharField(
+        max_length=10, choices=DAY_CHOICES, blank=True, null=True
+    )
+    description = models.CharField(max_length=200, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "calendar_exceptions"
+        unique_together = [["semester", "date"]]
+        ordering = ["date"]
+        verbose_name = "Excepción de Calendario"
+        verbose_name_plural = "Excepciones de Calendario"
+
+    def __str__(self):
+        return f"{self.date} - {self.get_kind_display()}"
+
+    def clean(self):
+        self.check_attendance_kept()
+
+    def check_attendance_kept(self, deleting=False):
+        """
+        La asistencia ya tomada tiene que seguir cayendo en un día de clases:
+        un feriado no va sobre un día con asistencia, y una recuperación que ya
+        tuvo asistencia no se borra ni se mueve (esos registros quedarían sin
+        número de sesión). Se llama desde clean() y antes de guardar o borrar.
+        """
+        if not self.semester_id:
+            return
+
+        if (
+            not deleting
+            and self.kind != "RECUPERACION"
+            and self._has_attendance_on(self.date)
+        ):
+            # Si ese día ya se tomó asistencia la clase sí se dictó: no puede ser feriado
+            raise ValidationError(
+                {"date": "Ese día ya tiene asistencia registrada: hubo clases."}
+            )
+
+        previous = (
+            CalendarException.objects.filter(pk=self.pk)
+            .values_list("date", "kind", "makeup_for_day")
+            .first()
+        )
+        if (
+            previous
+            and previous[1] == "RECUPERACION"
+            and (deleting or previous != (self.date, self.kind, self.makeup_for_day))
+            and self._has_attendance_on(previous[0])
+        ):
+            raise ValidationError(
+                "Esa recuperación ya tiene asistencia registrada: no se puede "
+                "borrar ni cambiar."
+            )
+
+    def _has_attendance_on(self, day):
+        return bool(day) and AttendanceRecord.objects.filter(
+            enrollment__course__semester_id=self.semester_id,
+            session_date=day,
+        ).exists()
+
+
 class Course(models.Model):
     course_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     # Relación con semestre: si borro semestre, chau cursos
@@ -250,6 +338,10 @@ class Schedule(models.Model):
         verbose_name_plural = "Bloques de Horario"
         unique_together = [["course_group", "day_of_week", "start_time"]]
         ordering = ["day_of_week", "start_time"]
+        indexes = [
+            # Búsqueda de salones libres: WHERE room = ? AND day = ? AND start < ?
+            models.Index(fields=["room", "day_of_week", "start_time"]),
+        ]
 
     def __str__(self):
         return f"{self.course_group} ({self.get_day_of_week_display()} {self.start_time}-{self.end_time})"
@@ -301,6 +393,9 @@ class LaboratoryGroup(models.Model):
         unique_together = [["course", "lab_nomenclature"]]
         verbose_name = "Grupo de Laboratorio"
         verbose_name_plural = "Grupos de Laboratorio"
+        indexes = [
+            models.Index(fields=["room", "day_of_week", "start_time"]),
+        ]
 
     def __str__(self):
         return f"{self.course.course_code} - Lab {self.lab_nomenclature}"
@@ -314,6 +409,49 @@ class LaboratoryGroup(models.Model):
         return "Sin asignar"
 
 
+class SessionIndex(models.Model):
+    """
+    Sesión N de un grupo o lab -> fecha (y al revés), ya con feriados y
+    recuperaciones aplicados. Se borra cuando cambian horarios o excepciones
+    y se vuelve a armar la próxima vez que alguien lo pide.
+    """
+
+    course_group = models.ForeignKey(
+        CourseGroup,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="session_index",
+    )
+    lab_group = models.ForeignKey(
+        LaboratoryGroup,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="session_index",
+    )
+    session_number = models.PositiveSmallIntegerField()
+    session_date = models.DateField()
+
+    class Meta:
+        db_table = "session_index"
+        unique_together = [
+            ["course_group", "session_number"],
+            ["lab_group", "session_number"],
+        ]
+        indexes = [
+            # Fecha -> número de sesión
+            models.Index(
+                fields=["course_group", "session_date"], name="session_idx_group_date"
+            ),
+            models.Index(
+                fields=["lab_group", "session_date"], name="session_idx_lab_date"
+            ),
+        ]
+        verbose_name = "Índice de Sesiones"
+        verbose_name_plural = "Índice de Sesiones"
+
+
 # ==================== SÍLABOS Y EVALUACIONES ====================
 
 
@@ -504,6 +642,14 @@ class LabEnrollmentCampaign(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     closed_at = models.DateTimeField(blank=True, null=True)
 
+    # DIRECTO: el primero que llega se queda el cupo. SORTEO: los alumnos
+    # ordenan sus labs durante la campaña y al cerrar se reparte por sorteo
+    allocation_mode = models.CharField(
+        max_length=10, choices=CAMPAIGN_MODE_CHOICES, default="DIRECTO"
+    )
+    # Semilla del sorteo: con ella y las preferencias se puede repetir el resultado
+    lottery_seed = models.CharField(max_length=32, blank=True)
+
     class Meta:
         db_table = "lab_enrollment_campaigns"
         verbose_name = "Campaña de Matrícula Lab"
@@ -558,6 +704,38 @@ class StudentPostulation(models.Model):
         ]
 
 
+class LabPreference(models.Model):
+    """En campañas por sorteo: 'Prefiero el lab B, luego el A...'"""
+
+    preference_id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False
+    )
+    campaign = models.ForeignKey(
+        LabEnrollmentCampaign, on_delete=models.CASCADE, related_name="preferences"
+    )
+    student = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="lab_preferences",
+        limit_choices_to={"user_role": "ALUMNO"},
+    )
+    lab_group = models.ForeignKey(
+        LaboratoryGroup, on_delete=models.CASCADE, related_name="preferences"
+    )
+    rank = models.PositiveSmallIntegerField()  # 1 = el que más quiere
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "lab_preferences"
+        unique_together = [
+            ["campaign", "student", "rank"],
+            ["campaign", "student", "lab_group"],
+        ]
+        verbose_name = "Preferencia Lab"
+        verbose_name_plural = "Preferencias Lab"
+        ordering = ["rank"]
+
+
 class LabAssignment(models.Model):
     """El resultado final: Tú te quedas en este lab"""
 
@@ -629,6 +807,15 @@ class StudentEnrollment(models.Model):
     current_attendance_percentage = models.DecimalField(
         max_digits=5, decimal_places=2, default=0
     )
+    # Contadores de asistencia: se mueven con cada registro que se guarda
+    # (apply_attendance_changes), así nadie tiene que contar attendance_records
+    attendance_present = models.PositiveIntegerField(default=0)
+    attendance_justified = models.PositiveIntegerField(default=0)
+    attendance_absent = models.PositiveIntegerField(default=0)
+    attendance_total = models.PositiveIntegerField(default=0)
+    # Un carácter por sesión ("PPF-J"): para rachas y la matriz del profe
+    # sin leer los registros uno por uno
+    attendance_vector = models.CharField(max_length=200, blank=True, default="")
     final_grade = models.DecimalField(
         max_digits=4, decimal_places=2, blank=True, null=True
     )
@@ -646,14 +833,24 @@ class StudentEnrollment(models.Model):
 
     def calculate_attendance_percentage(self):
         """
-        Calcula y actualiza el porcentaje de asistencia.
+        Recalcula desde cero contadores, vector y porcentaje de asistencia.
         Lógica: Cuenta Presentes y Justificadas sobre el total.
+        El camino normal es apply_attendance_changes; esto queda para cargas
+        que escriben registros por su cuenta (seed, admin).
         """
-        total_sessions = self.attendance_records.count()
-
-        if total_sessions > 0:
-            attended = self.attendance_records.filter(status__in=["P", "J"]).count()
-            percentage = (attended / total_sessions) * 100
+        statuses = dict(
+            self.attendance_records.values_list("session_number", "status")
+        )
+        counts = list(statuses.values())
+        self.attendance_present = counts.count("P")
+        self.attendance_justified = counts.count("J")
+        self.attendance_absent = counts.count("F")
+        self.attendance_total = len(counts)
+        self.attendance_vector = attendance_vector.build(statuses)
+
+        if self.attendance_total > 0:
+            attended = self.attendance_present + self.attendance_justified
+            percentage = (attended / self.attendance_total) * 100
             self.current_attendance_percentage = round(percentage, 2)
         else:
             self.current_attendance_percentage = 0
@@ -661,6 +858,80 @@ class StudentEnrollment(models.Model):
         self.save()
         return self.current_attendance_percentage
 
+    @classmethod
+    def lock_attendance(cls, enrollment_ids):
+        """
+        Bloquea las matrículas (siempre en orden de pk, para no cruzarse con otro
+        guardado) y devuelve {pk: vector}. Hay que llamarlo dentro de una
+        transacción y ANTES de leer los estados anteriores: un registro que
+        todavía no existe no se puede bloquear, la matrícula sí. Así dos primeros
+        guardados de la misma sesión no ven los dos "None" y suman dos veces.
+        """
+        return dict(
+            cls.objects.select_for_update()
+            .filter(pk__in=list(enrollment_ids))
+            .order_by("pk")
+            .values_list("pk", "attendance_vector")
+        )
+
+    @classmethod
+    def apply_attendance_changes(cls, changes, vectors=None):
+        """
+        Mueve los contadores y el vector según lo que cambió en cada registro.
+        changes: [(enrollment_id, session_number, estado anterior o None si es
+        nuevo, estado nuevo)]
+        vectors: lo que devolvió lock_attendance; si no viene se bloquean aquí.
+        Las matrículas con el mismo cambio van en un solo UPDATE (a lo sumo uno
+        por cada par anterior -> nuevo), con el porcentaje calculado ahí mismo.
+        Los vectores se guardan con un solo bulk_update.
+        """
+        columns = {
+            "P": "attendance_present",
+            "J": "attendance_justified",
+            "F": "attendance_absent",
+        }
+        by_change = {}
+        sessions = {}
+        for enrollment_id, session_number, old, new in changes:
+            if old != new:
+                by_change.setdefault((old, new), []).append(enrollment_id)
+                sessions.setdefault(enrollment_id, []).append((session_number, new))
+
+        for (old, new), ids in by_change.items():
+            delta = dict.fromkeys(columns.values(), 0)
+            if old:
+                delta[columns[old]] -= 1
+            delta[columns[new]] += 1
+            # Después del cambio el total nunca es 0: siempre hay al menos este registro
+            total = F("attendance_total") + (0 if old else 1)
+            attended = (
+                F("attendance_present")
+                + F("attendance_justified")
+                + delta["attendance_present"]
+                + delta["attendance_justified"]
+            )
+            cls.objects.filter(pk__in=ids).update(
+                attendance_total=total,
+                current_attendance_percentage=Round(attended * 100.0 / total, 2),
+                **{
+                    column: F(column) + value
+                    for column, value in delta.items()
+                    if value
+                },
+            )
+
+        if not sessions:
+            return
+        if vectors is None:
+            vectors = cls.lock_attendance(sessions.keys())
+        updated = []
+        for enrollment_id, changed in sessions.items():
+            vector = vectors[enrollment_id]
+            for session_number, status in changed:
+                vector = attendance_vector.set_status(vector, session_number, status)
+            updated.append(cls(pk=enrollment_id, attendance_vector=vector))
+        cls.objects.bulk_update(updated, ["attendance_vector"])
+
     def calculate_final_grade(self):
         """
         Calcula nota final basándose en los pesos de las evaluaciones.
@@ -717,6 +988,8 @@ class AttendanceRecord(models.Model):
     )
 
     recorded_at = models.DateTimeField(auto_now_add=True)
+    # Última escritura: sirve de versión para los Excel cacheados
+    updated_at = models.DateTimeField(auto_now=True)
     recorded_by = models.ForeignKey(
         CustomUser,
         on_delete=models.SET_NULL,
@@ -744,6 +1017,8 @@ class GradeRecord(models.Model):
     rounded_score = models.DecimalField(max_digits=4, decimal_places=2)
 
     recorded_at = models.DateTimeField(auto_now_add=True)
+    # Última escritura: sirve de versión para los Excel cacheados
+    updated_at = models.DateTimeField(auto_now=True)
     recorded_by = models.ForeignKey(
         CustomUser,
         on_delete=models.SET_NULL,
@@ -857,6 +1132,7 @@ class ClassroomReservation(models.Model):
         indexes = [
             models.Index(fields=["reservation_date", "status"]),
             models.Index(fields=["professor", "status"]),
+            models.Index(fields=["classroom", "reservation_date", "start_time"]),
         ]
 
     def __str__(self):
@@ -0,0 +1,204 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from .models import (
+    CalendarException,
+    ClassroomReservation,
+    Course,
+    CourseGroup,
+    LabAssignment,
+    LabEnrollmentCampaign,
+    LaboratoryGroup,
+    Schedule,
+    Semester,
+    StudentEnrollment,
+    StudentPostulation,
+    Syllabus,
+)
+
+
+def _invalidate_room_occupancy(sender, **kwargs):
+    # Import tardío: la app de persistencia carga antes que los servicios
+    from application.services import room_occupancy
+
+    # Después del commit: si rota antes, otro pedido arma el índice con los datos
+    # viejos bajo la versión nueva y queda así hasta el próximo cambio
+    transaction.on_commit(room_occupancy.invalidate)
+
+
+def _invalidate_lab_overview(sender, **kwargs):
+    from application.services import lab_overview
+
+    transaction.on_commit(lab_overview.invalidate)
+
+
+def _release_lab_seat(sender, instance, **kwargs):
+    from application.services import seat_counters
+
+    # Si la transacción se revierte la postulación sigue ahí: su cupo también
+    campaign_id, lab_id = instance.campaign_id, instance.lab_group_id
+    transaction.on_commit(lambda: seat_counters.release(campaign_id, lab_id))
+
+
+def _invalidate_student_timetable(sender, instance, **kwargs):
+    """El horario en bits del alumno (o de todos los del grupo/lab) ya no vale"""
+    from application.services import student_timetable
+
+    if isinstance(instance, Schedule):
+        students = StudentEnrollment.objects.filter(
+            group_id=instance.course_group_id
+        ).values_list("student_id", flat=True)
+    elif isinstance(instance, LaboratoryGroup):
+        students = set(
+            LabAssignment.objects.filter(lab_group=instance).values_list(
+                "student_id", flat=True
+            )
+        ) | set(
+            StudentPostulation.objects.filter(lab_group=instance).values_list(
+                "student_id", flat=True
+            )
+        )
+    else:
+        students = [instance.student_id]
+
+    # Después del commit: si no, otro pedido podría volver a cachear el horario viejo
+    students = list(students)
+    transaction.on_commit(lambda: student_timetable.invalidate(students))
+
+
+def _invalidate_session_calendar(sender, instance, **kwargs):
+    """
+    Borra el índice de sesiones de los grupos/labs afectados; se vuelve a armar
+    al leerlo. Se borra en la misma transacción del cambio (para que ella misma
+    lea lo nuevo) y otra vez al confirmar: un pedido que armó el índice con el
+    horario viejo mientras tanto no lo deja guardado.
+    """
+    from application.services import academic_calendar
+
+    if isinstance(instance, Schedule):
+        group_ids, lab_ids = [instance.course_group_id], []
+    elif isinstance(instance, LaboratoryGroup):
+        group_ids, lab_ids = [], [instance.lab_id]
+    else:
+        if isinstance(instance, Course):
+            courses = [instance]
+        else:  # Semester o CalendarException
+            semester_id = getattr(instance, "semester_id", instance.pk)
+            courses = Course.objects.filter(semester_id=semester_id)
+        group_ids = list(
+            CourseGroup.objects.filter(course__in=courses).values_list(
+                "group_id", flat=True
+            )
+        )
+        lab_ids = list(
+            LaboratoryGroup.objects.filter(course__in=courses).values_list(
+                "lab_id", flat=True
+            )
+        )
+
+    academic_calendar.invalidate(group_ids, lab_ids)
+    transaction.on_commit(lambda: academic_calendar.invalidate(group_ids, lab_ids))
+
+
+def _snapshot_session_numbers(sender, instance, **kwargs):
+    """Antes del cambio: qué número tenía cada sesión con asistencia ya tomada"""
+    from application.services import academic_calendar
+
+    # Cubre también los cambios que no pasan por clean() (shell, scripts)
+    instance.check_attendance_kept(deleting=kwargs["signal"] is pre_delete)
+    instance._numbering_before = academic_calendar.numbering_before(instance)
+
+
+def _renumber_attendance(sender, instance, **kwargs):
+    """
+    Un feriado o recuperación agregado después corre los números de sesión: la
+    asistencia ya guardada se renumera por fecha en la misma transacción
+    """
+    from application.services import academic_calendar
+
+    academic_calendar.renumber_attendance(
+        getattr(instance, "_numbering_before", None)
+    )
+
+
+def connect_signals():
+    for model in (Schedule, LaboratoryGroup, ClassroomReservation):
+        post_save.connect(
+            _invalidate_room_occupancy,
+            sender=model,
+            dispatch_uid=f"room_occupancy_save_{model.__name__}",
+        )
+        post_delete.connect(
+            _invalidate_room_occupancy,
+            sender=model,
+            dispatch_uid=f"room_occupancy_delete_{model.__name__}",
+        )
+
+    for model in (LaboratoryGroup, LabEnrollmentCampaign, CourseGroup, Syllabus):
+        post_save.connect(
+            _invalidate_lab_overview,
+            sender=model,
+            dispatch_uid=f"lab_overview_save_{model.__name__}",
+        )
+        post_delete.connect(
+            _invalidate_lab_overview,
+            sender=model,
+            dispatch_uid=f"lab_overview_delete_{model.__name__}",
+        )
+
+    post_delete.connect(
+        _release_lab_seat,
+        sender=StudentPostulation,
+        dispatch_uid="lab_seats_release",
+    )
+
+    for model in (
+        StudentEnrollment,
+        StudentPostulation,
+        LabAssignment,
+        Schedule,
+        LaboratoryGroup,
+    ):
+        post_save.connect(
+            _invalidate_student_timetable,
+            sender=model,
+            dispatch_uid=f"student_timetable_save_{model.__name__}",
+        )
+        post_delete.connect(
+            _invalidate_student_timetable,
+            sender=model,
+            dispatch_uid=f"student_timetable_delete_{model.__name__}",
+        )
+
+    for model in (Schedule, LaboratoryGroup, Course, Semester, CalendarException):
+        post_save.connect(
+            _invalidate_session_calendar,
+            sender=model,
+            dispatch_uid=f"session_calendar_save_{model.__name__}",
+        )
+        post_delete.connect(
+            _invalidate_session_calendar,
+            sender=model,
+            dispatch_uid=f"session_calendar_delete_{model.__name__}",
+        )
+
+    pre_save.connect(
+        _snapshot_session_numbers,
+        sender=CalendarException,
+        dispatch_uid="session_numbers_snapshot_save",
+    )
+    pre_delete.connect(
+        _snapshot_session_numbers,
+        sender=CalendarException,
+        dispatch_uid="session_numbers_snapshot_delete",
+    )
+    post_save.connect(
+        _renumber_attendance,
+        sender=CalendarException,
+        dispatch_uid="session_numbers_renumber_save",
+    )
+    post_delete.connect(
+        _renumber_attendance,
+        sender=CalendarException,
+        dispatch_uid="session_numbers_renumber_delete",
+    )
@@ -1,3 +1,5 @@
+from argparse import ArgumentTypeError
+
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from infrastructure.persistence.models import (
@@ -6,18 +8,64 @@ from infrastructure.persistence.models import (
     StudentPostulation,
     LabAssignment,
     LabEnrollmentCampaign,
-    Schedule,
 )
+from application.services import lab_assignment, student_timetable
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError("debe ser un entero positivo")
+    return number
 
 
 class Command(BaseCommand):
     help = "Matricula automáticamente a todos los alumnos en laboratorios sin cruce de horario"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--optimo",
+            action="store_true",
+            help="Asignación global (matching por curso): asigna al máximo de alumnos posible",
+        )
+        parser.add_argument(
+            "--precarga",
+            action="store_true",
+            help="Mismo criterio de siempre pero cargando todo en memoria y guardando en bloque",
+        )
+        parser.add_argument(
+            "--simular",
+            action="store_true",
+            help="No guarda nada: muestra quién quedaría sin lab, por qué y cuántos cupos faltan",
+        )
+        parser.add_argument(
+            "--lote",
+            type=positive_int,
+            default=lab_assignment.WRITE_CHUNK_SIZE,
+            help="Filas por inserción masiva (solo con --optimo o --precarga)",
+        )
+
     def handle(self, *args, **kwargs):
         self.stdout.write(
             self.style.WARNING("Iniciando asignación masiva de laboratorios...")
         )
 
+        if kwargs.get("simular"):
+            strategy = "precarga" if kwargs.get("precarga") else "optimo"
+            self._print_simulation(lab_assignment.simulate(strategy=strategy))
+            return
+
+        if kwargs.get("optimo") or kwargs.get("precarga"):
+            summary = lab_assignment.assign_all(
+                strategy="optimo" if kwargs.get("optimo") else "precarga",
+                chunk_size=kwargs["lote"],
+                progress_callback=self._print_progress,
+            )
+            self._print_summary(summary)
+            for phase, seconds in summary["timings"].items():
+                self.stdout.write(f"⏱ {phase}: {seconds:.2f}s")
+            return
+
         stats = {
             "assigned": 0,
             "skipped_no_campaign": 0,
@@ -32,9 +80,10 @@ class Command(BaseCommand):
         ).select_related("student", "course", "group")
 
         for enrollment in enrollments:
-            # Verificar si hay campaña activa para este curso
+            # Verificar si hay campaña activa para este curso (las de sorteo
+            # se reparten al cerrarlas, no por orden de llegada)
             campaign = LabEnrollmentCampaign.objects.filter(
-                course=enrollment.course, is_closed=False
+                course=enrollment.course, is_closed=False, allocation_mode="DIRECTO"
             ).first()
 
             if not campaign:
@@ -102,7 +151,9 @@ class Command(BaseCommand):
                 else:
                     stats["skipped_conflict"] += 1
 
-        # Resumen
+        self._print_summary(stats)
+
+    def _print_summary(self, stats):
         self.stdout.write(self.style.SUCCESS("\n" + "=" * 50))
         self.stdout.write(self.style.SUCCESS("RESUMEN DE ASIGNACIÓN"))
         self.stdout.write(self.style.SUCCESS("=" * 50))
@@ -112,44 +163,42 @@ class Command(BaseCommand):
         self.stdout.write(f"⊗ Labs llenos: {stats['skipped_full']}")
         self.stdout.write(self.style.SUCCESS("=" * 50))
 
-    def _has_schedule_conflict(self, student, lab_group):
-        """Verifica si el estudiante tiene cruce de horario"""
-
-        def overlap(s1, e1, s2, e2):
-            return s1 < e2 and s2 < e1
+    def _print_simulation(self, report):
+        self.stdout.write(self.style.WARNING("SIMULACIÓN: no se guardó ningún cambio"))
+        for course in report["courses"]:
+            if not course["unassigned"]:
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"\n{course['course_code']} - {course['course_name']}: "
+                    f"{course['assigned']}/{course['demand']} entrarían"
+                )
+            )
+            for student in course["unassigned"]:
+                causes = ", ".join(student["causes"])
+                self.stdout.write(
+                    f"  ⊗ {student['cui']} {student['full_name']}: "
+                    f"{student['reason']} {causes}".rstrip()
+                )
+            for lab in course["extra_seats"]:
+                self.stdout.write(f"  + {lab['label']}: +{lab['seats']} cupo(s)")
+
+        self._print_summary(report["summary"])
+        self.stdout.write(
+            f"✚ Cupos extra sugeridos: {report['summary']['extra_seats']}"
+        )
+        self.stdout.write(f"⏱ {report['summary']['seconds']:.2f}s")
 
-        # Obtener todas las matrículas del estudiante
-        enrollments = StudentEnrollment.objects.filter(
-            student=student, status="ACTIVO"
-        ).select_related("group")
+    def _print_progress(self, progress):
+        self.stdout.write(
+            f"  {progress['phase']}: {progress['done']}/{progress['total']}"
+        )
 
-        for enrollment in enrollments:
-            # Verificar horarios de teoría
-            if enrollment.group:
-                schedules = Schedule.objects.filter(course_group=enrollment.group)
-                for sch in schedules:
-                    if sch.day_of_week == lab_group.day_of_week:
-                        if overlap(
-                            lab_group.start_time,
-                            lab_group.end_time,
-                            sch.start_time,
-                            sch.end_time,
-                        ):
-                            return True
-
-            # Verificar otros labs asignados
-            if enrollment.lab_assignment:
-                other_lab = enrollment.lab_assignment.lab_group
-                if other_lab.day_of_week == lab_group.day_of_week:
-                    if overlap(
-                        lab_group.start_time,
-                        lab_group.end_time,
-                        other_lab.start_time,
-                        other_lab.end_time,
-                    ):
-                        return True
-
-        return False
+    def _has_schedule_conflict(self, student, lab_group):
+        """Verifica si el estudiante tiene cruce de horario (teoría y labs asignados)"""
+        return student_timetable.get(student.pk).conflicts(
+            student_timetable.lab_mask(lab_group), include_pending=False
+        )
 
     def _all_labs_full(self, campaign, labs):
         """Verifica si todos los labs están llenos"""
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from infrastructure.persistence.models import Semester
+from application.services.conflict_audit import audit_semester
+
+
+class Command(BaseCommand):
+    help = "Reporta todos los cruces de salón, profesor y alumno de un semestre"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--semestre",
+            help="Nombre del semestre (ej. 2025-1). Por defecto el semestre activo",
+        )
+        parser.add_argument(
+            "--detalle",
+            action="store_true",
+            help="Lista cada cruce además del resumen",
+        )
+
+    def handle(self, *args, **options):
+        semester = self._get_semester(options.get("semestre"))
+        self.stdout.write(
+            self.style.WARNING(f"Auditando cruces del semestre {semester.name}...")
+        )
+
+        report = audit_semester(semester.semester_id)
+
+        if options["detalle"]:
+            for kind, title in (
+                ("room", "SALONES"),
+                ("professor", "PROFESORES"),
+                ("student", "ALUMNOS"),
+            ):
+                self.stdout.write(self.style.SUCCESS(f"\n{title}"))
+                for c in report[kind]:
+                    who = (
+                        c["resource"]
+                        or f"{c['students']} alumnos ({', '.join(c['sample'])})"
+                    )
+                    self.stdout.write(
+                        f"  {c['day']} {c['start']:%H:%M}-{c['end']:%H:%M} | {who} | "
+                        f"{c['first']} ↔ {c['second']}"
+                    )
+
+        # Resumen
+        stats = report["stats"]
+        self.stdout.write(self.style.SUCCESS("\n" + "=" * 50))
+        self.stdout.write(self.style.SUCCESS("RESUMEN DE CRUCES"))
+        self.stdout.write(self.style.SUCCESS("=" * 50))
+        self.stdout.write(f"⊗ Cruces de salón: {stats['room']}")
+        self.stdout.write(f"⊗ Cruces de profesor: {stats['professor']}")
+        self.stdout.write(
+            f"⊗ Alumnos con cruce: {stats['student']} "
+            f"(en {len(report['student'])} pares de actividades)"
+        )
+        self.stdout.write(self.style.SUCCESS("=" * 50))
+
+    def _get_semester(self, name):
+        semesters = Semester.objects.all()
+        semester = (
+            semesters.filter(name=name).first()
+            if name
+            else semesters.filter(is_active=True).first()
+        )
+        if not semester:
+            raise CommandError("No se encontró el semestre")
+        return semester
@@ -165,15 +165,40 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // D. Actualización status campañas
-    const activeCampaigns = document.querySelectorAll('[data-course-id]');
-    if (activeCampaigns.length > 0) {
-        setInterval(() => {
-            activeCampaigns.forEach(card => {
-                const courseId = card.dataset.courseId;
-                if (typeof updateCampaignStatus === 'function') updateCampaignStatus(courseId);
+    // D. Actualización status campañas (en vivo por SSE, solo llegan los labs que cambian)
+    const liveCourses = document.querySelectorAll('[data-live-course]');
+    const streamUrl = document.getElementById('url-campaign-stream')?.value;
+    if (liveCourses.length > 0 && streamUrl && window.EventSource) {
+        const params = new URLSearchParams();
+        liveCourses.forEach(card => params.append('course', card.dataset.liveCourse));
+
+        const statusLabels = {
+            'empty': 'Vacío', 'normal': 'Normal', 'almost-full': 'Casi lleno', 'exceeded': 'Sobrepasado'
+        };
+        // Mismos umbrales que SecretariaService.get_campaign_status
+        const labStatus = (enrolled, capacity) => {
+            if (enrolled === 0) return 'empty';
+            if (enrolled < capacity * 0.8) return 'normal';
+            if (enrolled <= capacity) return 'almost-full';
+            return 'exceeded';
+        };
+
+        // EventSource reconecta solo cuando el servidor cierra el stream
+        const source = new EventSource(`${streamUrl}?${params}`);
+        source.addEventListener('seats', (event) => {
+            const seats = JSON.parse(event.data);
+            Object.entries(seats).forEach(([labId, enrolled]) => {
+                const countEl = document.querySelector(`[data-lab-enrolled="${labId}"]`);
+                if (countEl) countEl.textContent = enrolled;
+
+                const badge = document.querySelector(`[data-lab-status="${labId}"]`);
+                if (badge) {
+                    const status = labStatus(enrolled, parseInt(badge.dataset.capacity, 10));
+                    badge.className = `badge lab-status-badge status-${status}`;
+                    badge.textContent = statusLabels[status];
+                }
             });
-        }, 30000);
+        });
     }
 
     // ==========================================================
@@ -479,6 +504,158 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // ==========================================================
+    // 7. CARGA MASIVA EN SEGUNDO PLANO (CELERY)
+    // ==========================================================
+
+    function pollJobStatus(statusUrl, onProgress, onDone) {
+        fetch(statusUrl)
+            .then(response => response.json())
+            .then(data => {
+                if (data.ready) {
+                    onDone(data);
+                } else {
+                    if (data.progress) onProgress(data.progress);
+                    setTimeout(() => pollJobStatus(statusUrl, onProgress, onDone), 1500);
+                }
+            })
+            .catch(err => {
+                console.error(err);
+                setTimeout(() => pollJobStatus(statusUrl, onProgress, onDone), 3000);
+            });
+    }
+
+    function renderBatchReport(statusBox, result) {
+        // Reporte por grupo de la carga de inicio de semestre. Nombres de
+        // archivo, hojas y grupos vienen del usuario: van como texto, no HTML
+        const stats = result.stats;
+        const summary = document.createElement('div');
+        summary.textContent = `Listo: ${stats.created} nuevos, ${stats.enrolled} matriculados, ` +
+            `${stats.removed} retirados.`;
+        const list = document.createElement('ul');
+        list.className = 'mb-0 fw-normal';
+        result.groups.forEach(g => {
+            const item = document.createElement('li');
+            if (g.error) {
+                item.className = 'text-danger';
+                item.textContent = `${g.file}: ${g.error}`;
+            } else {
+                item.textContent = `${g.group}: ${g.students} alumnos, ${g.created} nuevos, ` +
+                    `${g.enrolled} matriculados, ${g.removed} retirados`;
+            }
+            list.appendChild(item);
+        });
+        statusBox.replaceChildren(summary, list);
+    }
+
+    document.querySelectorAll('.roster-upload-form').forEach(form => {
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+            const button = form.querySelector('button[type="submit"]');
+            const statusBox = form.parentElement.querySelector('.roster-upload-status');
+            button.disabled = true;
+            statusBox.className = 'roster-upload-status small mt-1 text-muted';
+            statusBox.textContent = 'Subiendo archivo...';
+
+            fetch(form.action, {
+                method: 'POST',
+                headers: { 'X-Requested-With': 'XMLHttpRequest', 'X-CSRFToken': getCookie('csrftoken') },
+                body: new FormData(form)
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.error);
+                statusBox.textContent = 'En cola...';
+
+                pollJobStatus(
+                    data.status_url,
+                    progress => {
+                        if (progress.phase) {
+                            // Carga por lote (ZIP/XLSX): avance por fases
+                            statusBox.textContent = `Procesando (${progress.phase})...`;
+                            return;
+                        }
+                        statusBox.textContent = `Procesando: ${progress.students} alumnos · ` +
+                            `${progress.created} nuevos · ${progress.enrolled} matriculados · ${progress.removed} retirados`;
+                    },
+                    job => {
+                        button.disabled = false;
+                        if (job.result && job.result.success) {
+                            const stats = job.result.stats;
+                            statusBox.className = 'roster-upload-status small mt-1 text-success fw-bold';
+                            if (job.result.groups) {
+                                renderBatchReport(statusBox, job.result);
+                                return;
+                            }
+                            statusBox.textContent = `Listo: ${stats.created} nuevos, ${stats.enrolled} matriculados, ` +
+                                `${stats.removed} retirados en ${job.result.group_code}.`;
+                        } else {
+                            statusBox.className = 'roster-upload-status small mt-1 text-danger fw-bold';
+                            statusBox.textContent = 'Error: ' + ((job.result && job.result.error) || job.error);
+                        }
+                    }
+                );
+            })
+            .catch(err => {
+                button.disabled = false;
+                statusBox.className = 'roster-upload-status small mt-1 text-danger fw-bold';
+                statusBox.textContent = 'Error: ' + err.message;
+            });
+        });
+    });
+
+    // ==========================================================
+    // 8. CONSOLIDADO DE NOTAS (CELERY)
+    // ==========================================================
+    const consolidatedForm = document.getElementById('consolidatedGradesForm');
+    if (consolidatedForm) {
+        const statusBox = document.getElementById('consolidatedGradesStatus');
+        const button = consolidatedForm.querySelector('button[type="submit"]');
+
+        const finish = (downloadUrl) => {
+            button.disabled = false;
+            statusBox.className = 'small mt-2 text-success fw-bold';
+            statusBox.innerHTML = `Consolidado listo. <a href="${downloadUrl}">Descargar</a>`;
+            window.location.href = downloadUrl;
+        };
+
+        consolidatedForm.addEventListener('submit', function(e) {
+            e.preventDefault();
+            button.disabled = true;
+            statusBox.className = 'small mt-2 text-muted';
+            statusBox.textContent = 'Preparando...';
+
+            fetch(consolidatedForm.action, {
+                method: 'POST',
+                headers: { 'X-Requested-With': 'XMLHttpRequest', 'X-CSRFToken': getCookie('csrftoken') },
+                body: new FormData(consolidatedForm)
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.error);
+                if (data.ready) return finish(data.download_url);
+
+                pollJobStatus(
+                    data.status_url,
+                    progress => {
+                        statusBox.textContent = `Generando: ${progress.done} de ${progress.total} grupos...`;
+                    },
+                    job => {
+                        if (job.result && job.result.success) return finish(data.download_url);
+                        button.disabled = false;
+                        statusBox.className = 'small mt-2 text-danger fw-bold';
+                        statusBox.textContent = 'Error: ' + job.error;
+                    }
+                );
+            })
+            .catch(err => {
+                button.disabled = false;
+                statusBox.className = 'small mt-2 text-danger fw-bold';
+                statusBox.textContent = 'Error: ' + err.message;
+            });
+        });
+    }
+
     // Inicializar gráficos al final
     initCharts();
 });
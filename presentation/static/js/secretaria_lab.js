@@ -8,6 +8,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initViewStudentsModal();
     initDeleteModal();
     initProfessorTypeToggles();
+    initSimulateModal();
 });
 
 // 1. Manejo del Modal de Habilitar Inscripción
@@ -166,4 +167,107 @@ function initProfessorTypeToggles() {
             });
         });
     });
-}
\ No newline at end of file
+}
+// 5. Simulación de cierre (no guarda nada, se puede repetir tras ajustar cupos)
+function initSimulateModal() {
+    const modal = document.getElementById('simulateAssignmentModal');
+    if (!modal) return;
+
+    modal.addEventListener('show.bs.modal', function(event) {
+        const button = event.relatedTarget;
+        const urlFetch = button.getAttribute('data-url-fetch');
+        const courseName = button.getAttribute('data-course-name');
+
+        document.getElementById('simulateModalTitle').textContent = `Simulación de Asignación - ${courseName}`;
+        const bodyContainer = document.getElementById('simulateAssignmentBody');
+
+        bodyContainer.innerHTML = `
+            <div class="text-center py-5">
+                <div class="spinner-border text-primary" role="status">
+                    <span class="visually-hidden">Cargando...</span>
+                </div>
+                <p class="mt-2 text-muted">Simulando asignación...</p>
+            </div>
+        `;
+
+        fetch(urlFetch)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.errors.join(' '));
+                renderSimulation(data, bodyContainer);
+            })
+            .catch(error => {
+                bodyContainer.innerHTML = `
+                    <div class="alert alert-danger">
+                        <i class="bi bi-exclamation-triangle me-2"></i>
+                        Error al simular: ${error.message}
+                    </div>
+                `;
+            });
+    });
+}
+
+// Renderiza el resultado de la simulación
+function renderSimulation(data, container) {
+    const course = data.course;
+    const summary = data.summary;
+
+    let html = `
+        <div class="row text-center mb-3">
+            <div class="col"><div class="fs-4 fw-bold">${course.demand}</div><small class="text-muted">Sin lab</small></div>
+            <div class="col"><div class="fs-4 fw-bold text-success">${course.assigned}</div><small class="text-muted">Entrarían</small></div>
+            <div class="col"><div class="fs-4 fw-bold text-danger">${course.unassigned.length}</div><small class="text-muted">Quedarían fuera</small></div>
+            <div class="col"><div class="fs-4 fw-bold">${course.free_seats}</div><small class="text-muted">Cupos libres</small></div>
+        </div>
+    `;
+
+    if (course.unassigned.length === 0) {
+        html += `
+            <div class="alert alert-success mb-0">
+                <i class="bi bi-check-circle me-2"></i>
+                Con las capacidades actuales todos los alumnos tendrían laboratorio.
+            </div>
+        `;
+        container.innerHTML = html;
+        return;
+    }
+
+    if (course.extra_seats.length > 0) {
+        html += '<div class="alert alert-warning"><strong>Cupos sugeridos:</strong><ul class="mb-0">';
+        course.extra_seats.forEach(lab => {
+            html += `<li>${lab.label}: +${lab.seats} cupo(s)</li>`;
+        });
+        html += '</ul></div>';
+    }
+
+    html += `
+        <div class="table-responsive">
+            <table class="table table-hover align-middle mb-0">
+                <thead class="bg-light">
+                    <tr>
+                        <th>CUI</th>
+                        <th>Alumno</th>
+                        <th>Motivo</th>
+                    </tr>
+                </thead>
+                <tbody>
+    `;
+
+    course.unassigned.forEach(student => {
+        const reason = student.reason === 'CRUCE'
+            ? `<span class="badge bg-danger">Cruce</span> <small class="text-muted">${student.causes.join(', ')}</small>`
+            : '<span class="badge bg-warning text-dark">Sin cupo</span>';
+
+        html += `
+            <tr>
+                <td><small>${student.cui}</small></td>
+                <td>${student.full_name}</td>
+                <td>${reason}</td>
+            </tr>
+        `;
+    });
+
+    html += '</tbody></table></div>';
+    html += `<p class="text-muted small mt-2 mb-0">Simulado en ${summary.seconds}s. No se guardó ningún cambio.</p>`;
+    container.innerHTML = html;
+}
@@ -5,8 +5,74 @@
 
 document.addEventListener('DOMContentLoaded', function() {
     initEnrollmentSystem();
+    initLotteryPreferences();
 });
 
+// Campañas por sorteo: el alumno solo guarda su orden de labs
+function initLotteryPreferences() {
+    document.querySelectorAll('.btn-save-preferences').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const campaignId = this.dataset.campaignId;
+            const container = document.querySelector(
+                `.lottery-ranking[data-campaign-id="${campaignId}"]`
+            );
+            const ranked = Array.from(container.querySelectorAll('.lab-rank'))
+                .filter(select => select.value)
+                .map(select => ({ rank: parseInt(select.value), labId: select.dataset.labId }))
+                .sort((a, b) => a.rank - b.rank);
+
+            const ranks = ranked.map(item => item.rank);
+            if (!ranked.length || new Set(ranks).size !== ranks.length) {
+                Swal.fire({
+                    title: 'Revisa tu orden',
+                    text: 'Elige al menos un laboratorio y no repitas el número de opción.',
+                    icon: 'warning',
+                    confirmButtonColor: '#ffc107'
+                });
+                return;
+            }
+
+            const originalText = btn.innerHTML;
+            btn.disabled = true;
+            btn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Guardando...';
+
+            fetch(btn.dataset.urlPreferences, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken')
+                },
+                body: JSON.stringify({
+                    campaign_id: campaignId,
+                    lab_ids: ranked.map(item => item.labId)
+                })
+            })
+            .then(res => res.json())
+            .then(data => {
+                Swal.fire({
+                    title: data.success ? 'Orden guardado' : 'No se pudo guardar',
+                    text: data.success
+                        ? 'Puedes cambiarlo hasta que cierre la campaña.'
+                        : (data.errors || []).join(', '),
+                    icon: data.success ? 'success' : 'warning',
+                    confirmButtonColor: data.success ? '#198754' : '#ffc107'
+                });
+                resetButton(btn, originalText);
+            })
+            .catch(err => {
+                console.error(err);
+                Swal.fire({
+                    title: 'Error de Sistema',
+                    text: 'Hubo un problema de conexión. Por favor intenta nuevamente.',
+                    icon: 'error',
+                    confirmButtonColor: '#dc3545'
+                });
+                resetButton(btn, originalText);
+            });
+        });
+    });
+}
+
 function initEnrollmentSystem() {
     const modalElement = document.getElementById('confirmPostulationModal');
     if (!modalElement) return; // Si no hay modal, no ejecutamos nada
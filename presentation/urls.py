@@ -52,6 +52,11 @@ urlpatterns = [
         student_views.postulate_to_lab,
         name="student_lab_postulate",
     ),
+    path(
+        "student/lab-enrollment/preferences/",
+        student_views.save_lab_preferences,
+        name="student_lab_preferences",
+    ),
     path(
         "student/lab-enrollment/details/<uuid:lab_id>/",
         student_views.get_lab_details,
@@ -173,9 +178,19 @@ urlpatterns = [
     ),
     path(
         "secretaria/upload/group/<uuid:group_id>/",
-        secretaria_views.upload_students_to_group_view,
+        secretaria_views.UploadStudentsToGroupView.as_view(),
         name="secretaria_upload_students_to_group",
     ),
+    path(
+        "secretaria/upload/batch/",
+        secretaria_views.UploadRosterBatchView.as_view(),
+        name="secretaria_upload_roster_batch",
+    ),
+    path(
+        "secretaria/jobs/<str:task_id>/",
+        secretaria_views.JobStatusView.as_view(),
+        name="secretaria_job_status",
+    ),
     path(
         "secretaria/reportes/notas/",
         secretaria_views.SecretariaGradeReportView.as_view(),
@@ -186,6 +201,16 @@ urlpatterns = [
         secretaria_views.download_grades_excel,
         name="secretaria_download_grades",
     ),
+    path(
+        "secretaria/reportes/notas/consolidado/",
+        secretaria_views.ConsolidatedGradesView.as_view(),
+        name="secretaria_consolidated_grades",
+    ),
+    path(
+        "secretaria/reportes/cruces/",
+        secretaria_views.SecretariaConflictAuditView.as_view(),
+        name="secretaria_conflict_audit",
+    ),
     # ==================== SECRETARÍA: SÍLABOS ====================
     path(
         "secretaria/syllabus/",
@@ -244,6 +269,16 @@ urlpatterns = [
         secretaria_lab_views.GetLabEnrolledStudentsView.as_view(),
         name="secretaria_lab_enrolled_students",
     ),
+    path(
+        "secretaria/laboratories/simulate/<uuid:course_id>/",
+        secretaria_lab_views.SimulateLabAssignmentView.as_view(),
+        name="secretaria_lab_simulate",
+    ),
+    path(
+        "secretaria/laboratories/campaign-stream/",
+        secretaria_lab_views.CampaignStatusStreamView.as_view(),
+        name="secretaria_lab_campaign_stream",
+    ),
     path(
         "secretaria/laboratories/close-enrollment/<uuid:course_id>/",
         secretaria_lab_views.CloseLabEnrollmentView.as_view(),
@@ -2,7 +2,8 @@ import json
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, JsonResponse
 from datetime import datetime
 
 # Modelos solo para get_object_or_404 puntuales
@@ -100,23 +101,31 @@ def attendance_report(request, group_id):
     if request.user.user_role != "PROFESOR":
         return redirect("presentation:login")
 
+    # Exportación Excel (se reutiliza el archivo si no hubo cambios)
+    if request.GET.get("export") == "excel":
+        excel = _service.get_attendance_excel_file(request.user, group_id)
+        if not excel:
+            return redirect("presentation:professor_dashboard")
+        file_path, filename = excel
+        try:
+            handle = default_storage.open(file_path, "rb")
+        except FileNotFoundError:
+            # Otra descarga podó esta versión justo ahora: se vuelve a armar
+            file_path, filename = _service.get_attendance_excel_file(
+                request.user, group_id
+            )
+            handle = default_storage.open(file_path, "rb")
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=filename,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
     data = _service.get_attendance_report_matrix(request.user, group_id)
     if not data:
         return redirect("presentation:professor_dashboard")
 
-    # Exportación Excel
-    if request.GET.get("export") == "excel":
-        wb = _service.generate_attendance_excel(
-            data["group"], data["sessions"], data["matrix"]
-        )
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        filename = f"Asistencia_{data['group'].course.course_code}.xlsx"
-        response["Content-Disposition"] = f"attachment; filename={filename}"
-        wb.save(response)
-        return response
-
     return render(request, "professor/attendance_report.html", data)
 
 
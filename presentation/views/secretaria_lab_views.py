@@ -3,20 +3,22 @@ from datetime import time
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.views.generic import TemplateView, View
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 # Capa de Infraestructura / Persistencia (Solo para lectura en GETs complejos)
 from infrastructure.persistence.models import (
+    LabEnrollmentCampaign,
     LaboratoryGroup,
     Classroom,
     CustomUser,
     ExternalProfessor,
-    CourseGroup,
 )
 
 # Capa de Aplicación (Lógica de Negocio)
+from application.services import campaign_events, seat_counters
 from application.services.secretaria_services import SecretariaService
 
 # Mixins de Seguridad
@@ -34,46 +36,10 @@ class LabManagementView(SecretariaRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # 1. Obtener cursos base
-        courses_with_lab = SecretariaService.get_courses_with_lab()
-        courses_data = []
-
-        # 2. Construir DTOs para la vista (Idealmente esto iría en un método del servicio,
-        #    pero es aceptable aquí para orquestación de presentación).
-        for course in courses_with_lab:
-            # Métricas del curso
-            count = SecretariaService.get_course_enrollment_count(course.course_id)
-            needed = SecretariaService.calculate_lab_groups_needed(count)
-
-            # Datos existentes (Lectura directa permitida en presentación para QuerySets)
-            existing = LaboratoryGroup.objects.filter(course=course)
-
-            # IDs de profesores teóricos para sugerirlos primero en el select
-            theory_ids = list(
-                CourseGroup.objects.filter(
-                    course=course, professor__isnull=False
-                ).values_list("professor_id", flat=True)
-            )
-
-            # Validaciones de negocio
-            can_enable_check = SecretariaService.can_enable_enrollment(course.course_id)
-            campaign_status = SecretariaService.get_campaign_status(course.course_id)
-
-            courses_data.append(
-                {
-                    "course": course,
-                    "enrollment_count": count,
-                    "labs_needed": needed,
-                    "existing_labs": existing,
-                    "has_all_labs": existing.count() >= needed,
-                    "theory_professors_ids": theory_ids,
-                    "can_enable_enrollment": can_enable_check["can_enable"],
-                    "total_capacity": can_enable_check["total_capacity"],
-                    "campaign_status": campaign_status,
-                }
-            )
+        # 1. Cursos con lab y sus métricas, todo agrupado (no consultas por curso)
+        courses_data = SecretariaService.get_lab_management_overview()
 
-        # 3. Cargar catálogos para los formularios
+        # 2. Cargar catálogos para los formularios
         context["courses_data"] = courses_data
         context["classrooms"] = Classroom.objects.filter(
             is_active=True, classroom_type="LABORATORIO"
@@ -203,6 +169,49 @@ class GetCampaignStatusView(SecretariaRequiredMixin, View):
         return JsonResponse(status)
 
 
+class CampaignStatusStreamView(SecretariaRequiredMixin, View):
+    """
+    SSE: cupos de las campañas abiertas en vivo (?course=<id>&course=<id>...).
+    El estado inicial sale de los contadores de cupos y luego solo llegan los
+    labs que cambian; ningún cliente vuelve a contar postulaciones en la BD.
+    Necesita servirse por ASGI (config.asgi) para no bloquear un worker.
+    """
+
+    def get(self, request):
+        campaigns = dict(
+            LabEnrollmentCampaign.objects.filter(
+                course_id__in=request.GET.getlist("course"), is_closed=False
+            ).values_list("campaign_id", "course_id")
+        )
+        by_course = {
+            course_id: campaign_id for campaign_id, course_id in campaigns.items()
+        }
+        campaign_labs = [
+            (by_course[course_id], lab_id)
+            for lab_id, course_id in LaboratoryGroup.objects.filter(
+                course_id__in=by_course
+            ).values_list("lab_id", "course_id")
+        ]
+        initial = {
+            str(lab_id): taken
+            for lab_id, taken in seat_counters.snapshot(campaign_labs).items()
+        }
+
+        # Bajo WSGI (runserver) Django junta todo el stream antes de mandarlo:
+        # ahí solo va el estado actual y el navegador reconecta a los segundos
+        duration = (
+            campaign_events.STREAM_SECONDS if isinstance(request, ASGIRequest) else 0
+        )
+        response = StreamingHttpResponse(
+            campaign_events.stream(list(campaigns), initial, duration),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Nginx no debe juntar los eventos en su buffer
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class GetLabEnrolledStudentsView(SecretariaRequiredMixin, View):
     """API: Obtiene alumnos inscritos en un lab."""
 
@@ -211,6 +220,14 @@ class GetLabEnrolledStudentsView(SecretariaRequiredMixin, View):
         return JsonResponse({"students": students})
 
 
+class SimulateLabAssignmentView(SecretariaRequiredMixin, View):
+    """API: Simula la asignación de la campaña sin guardar nada."""
+
+    def get(self, request, course_id):
+        result = SecretariaService.simulate_lab_assignment(course_id)
+        return JsonResponse(result, status=200 if result["success"] else 400)
+
+
 # ==================== GESTIÓN DE CAMPAÑA ====================
 
 
@@ -219,7 +236,8 @@ class EnableLabEnrollmentView(SecretariaRequiredMixin, View):
 
     def post(self, request, course_id):
         days = int(request.POST.get("days_duration", 7))
-        result = SecretariaService.enable_lab_enrollment(course_id, days)
+        mode = request.POST.get("allocation_mode", "DIRECTO")
+        result = SecretariaService.enable_lab_enrollment(course_id, days, mode)
 
         if result["success"]:
             messages.success(request, f"Matricula habilitada por {days} días")
@@ -236,7 +254,15 @@ class CloseLabEnrollmentView(SecretariaRequiredMixin, View):
     def post(self, request, course_id):
         result = SecretariaService.close_lab_enrollment(course_id)
 
-        if result["success"]:
+        if result["success"] and "lottery" in result:
+            lottery = result["lottery"]
+            messages.success(
+                request,
+                f"Sorteo realizado (semilla {lottery['seed']}): "
+                f"{lottery['assigned']} asignados, "
+                f"{lottery['first_choice']} en su primera opción",
+            )
+        elif result["success"]:
             messages.success(
                 request, "Matricula cerrada y alumnos asignados correctamente"
             )
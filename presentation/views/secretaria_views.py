@@ -1,9 +1,15 @@
 import json
-from django.urls import reverse_lazy
+from urllib.parse import urlencode
+from django.core.files.storage import default_storage
+from django.urls import reverse, reverse_lazy
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
+from django.http import (
+    FileResponse,
+    JsonResponse,
+)
 from django.views.generic import (
+    View,
     TemplateView,
     ListView,
     CreateView,
@@ -11,7 +17,12 @@ from django.views.generic import (
     DeleteView,
 )
 
-from infrastructure.persistence.models import Classroom, CourseGroup, DAY_CHOICES
+from infrastructure.persistence.models import (
+    Classroom,
+    CourseGroup,
+    Semester,
+    DAY_CHOICES,
+)
 from .mixins import SecretariaRequiredMixin
 from application.services.secretaria_services import SecretariaService
 
@@ -158,30 +169,73 @@ class BulkUploadView(SecretariaRequiredMixin, TemplateView):
         return context
 
 
-def upload_students_to_group_view(request, group_id):
-    if request.method != "POST":
-        return HttpResponseNotAllowed(["POST"])
+class UploadStudentsToGroupView(SecretariaRequiredMixin, View):
+    """
+    Recibe el CSV y lo encola en Celery. Si la petición viene por AJAX responde
+    con el id de la tarea para que la página consulte su avance.
+    """
+
+    def post(self, request, group_id):
+        return _enqueue_upload(
+            request,
+            request.FILES.get("file_alumnos"),
+            (".csv",),
+            "Archivo inválido. Debe ser .csv",
+            lambda upload: SecretariaService.enqueue_student_csv(group_id, upload),
+            "Archivo recibido. La carga se está procesando.",
+        )
 
-    csv_file = request.FILES.get("file_alumnos")
-    if not csv_file or not csv_file.name.endswith(".csv"):
-        messages.error(request, "Archivo inválido. Debe ser .csv")
-        return redirect("presentation:secretaria_upload")
 
-    result = SecretariaService.process_student_csv(group_id, csv_file)
+class UploadRosterBatchView(SecretariaRequiredMixin, View):
+    """
+    Carga de inicio de semestre: un ZIP (un CSV por grupo) o un XLSX (una hoja
+    por grupo). Se encola igual que la carga por grupo.
+    """
 
-    if result["success"]:
-        stats = result["stats"]
-        g = result["group"]
-        messages.success(
+    def post(self, request):
+        return _enqueue_upload(
             request,
-            f"Procesado: {stats['created']} nuevos, {stats['enrolled']} matriculados en {g.group_code}.",
+            request.FILES.get("file_lote"),
+            (".zip", ".xlsx"),
+            "Archivo inválido. Debe ser .zip o .xlsx",
+            SecretariaService.enqueue_roster_batch,
+            "Archivo recibido. La carga de grupos se está procesando.",
+        )
+
+
+def _enqueue_upload(request, upload, extensions, invalid_message, enqueue, message):
+    is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+
+    if not upload or not upload.name.lower().endswith(extensions):
+        if is_ajax:
+            return JsonResponse({"success": False, "error": invalid_message}, status=400)
+        messages.error(request, invalid_message)
+        return redirect("presentation:secretaria_upload")
+
+    task_id = enqueue(upload)
+
+    if is_ajax:
+        return JsonResponse(
+            {
+                "success": True,
+                "task_id": task_id,
+                "status_url": reverse(
+                    "presentation:secretaria_job_status", args=[task_id]
+                ),
+            }
         )
-    else:
-        messages.error(request, f"Error: {result['error']}")
 
+    messages.info(request, message)
     return redirect("presentation:secretaria_upload")
 
 
+class JobStatusView(SecretariaRequiredMixin, View):
+    """API: Avance de una tarea en segundo plano (cargas y reportes)."""
+
+    def get(self, request, task_id):
+        return JsonResponse(SecretariaService.get_job_status(task_id))
+
+
 # --- Reportes de Notas ---
 
 
@@ -193,24 +247,109 @@ class SecretariaGradeReportView(SecretariaRequiredMixin, TemplateView):
         context["groups"] = CourseGroup.objects.select_related(
             "course", "professor"
         ).order_by("course__course_code")
+        context["semesters"] = Semester.objects.all()
         return context
 
 
 def download_grades_excel(request, group_id):
     try:
-        wb, filename = SecretariaService.generate_grades_excel_workbook(group_id)
-
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        # Si nada cambió desde la última descarga se envía el archivo ya generado
+        file_path, filename = SecretariaService.get_grades_excel_file(group_id)
+        try:
+            handle = default_storage.open(file_path, "rb")
+        except FileNotFoundError:
+            # Otra descarga podó esta versión justo ahora: se vuelve a armar
+            file_path, filename = SecretariaService.get_grades_excel_file(group_id)
+            handle = default_storage.open(file_path, "rb")
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=filename,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
-        response["Content-Disposition"] = f"attachment; filename={filename}"
-        wb.save(response)
-        return response
     except Exception as e:
         messages.error(request, f"Error generando reporte: {e}")
         return redirect("presentation:secretaria_grade_report")
 
 
+class ConsolidatedGradesView(SecretariaRequiredMixin, View):
+    """
+    POST: encola el consolidado de notas del semestre (o de un curso).
+    GET: descarga el archivo ya generado.
+    """
+
+    def post(self, request):
+        scope = self._scope(request.POST)
+        if not any(scope.values()):
+            return JsonResponse(
+                {"success": False, "error": "Seleccione un semestre o curso"},
+                status=400,
+            )
+
+        job = SecretariaService.enqueue_consolidated_grades(
+            force=request.POST.get("force") == "1", **scope
+        )
+        data = {
+            "success": True,
+            "ready": job["ready"],
+            "download_url": (
+                reverse("presentation:secretaria_consolidated_grades")
+                + "?"
+                + urlencode({k: v for k, v in scope.items() if v})
+            ),
+        }
+        if not job["ready"]:
+            data["task_id"] = job["task_id"]
+            data["status_url"] = reverse(
+                "presentation:secretaria_job_status", args=[job["task_id"]]
+            )
+        return JsonResponse(data)
+
+    def get(self, request):
+        artifact = SecretariaService.get_consolidated_grades_artifact(
+            **self._scope(request.GET)
+        )
+        try:
+            # Puede haberse podado entre la búsqueda y la apertura
+            handle = artifact and default_storage.open(artifact["file_path"], "rb")
+        except FileNotFoundError:
+            handle = None
+        if not handle:
+            messages.error(
+                request, "El consolidado no está disponible. Genérelo de nuevo."
+            )
+            return redirect("presentation:secretaria_grade_report")
+
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=artifact["filename"],
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+    @staticmethod
+    def _scope(data):
+        return {
+            "semester_id": data.get("semester_id") or None,
+            "course_id": data.get("course_id") or None,
+        }
+
+
+class SecretariaConflictAuditView(SecretariaRequiredMixin, TemplateView):
+    """Reporte de todos los cruces de horario del semestre"""
+
+    template_name = "secretaria/conflict_audit.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(
+            SecretariaService.get_conflict_audit_context(
+                self.request.GET.get("semester")
+            )
+        )
+        return context
+
+
 # ==================== RESERVAS DE AULAS ====================
 
 
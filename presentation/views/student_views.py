@@ -118,6 +118,34 @@ def postulate_to_lab(request):
         )
 
 
+@student_required
+@require_POST
+def save_lab_preferences(request):
+    """
+    API (JSON): Guarda el orden de labs del alumno en una campaña por sorteo.
+    """
+    try:
+        data = json.loads(request.body)
+        campaign_id = data.get("campaign_id")
+        lab_ids = data.get("lab_ids")
+
+        if not campaign_id or not lab_ids or not isinstance(lab_ids, list):
+            return JsonResponse(
+                {"success": False, "errors": ["Datos incompletos"]}, status=400
+            )
+
+        result = StudentService.save_lab_preferences(
+            student=request.user, campaign_id=campaign_id, lab_ids=lab_ids
+        )
+
+        return JsonResponse(result)
+
+    except json.JSONDecodeError:
+        return JsonResponse(
+            {"success": False, "errors": ["Formato de datos inválido"]}, status=400
+        )
+
+
 @student_required
 def get_lab_details(request, lab_id):
     """
@@ -78,6 +78,14 @@ import pytest
 from django.test import Client
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """La caché local vive entre tests: la vacío para no arrastrar horarios o contadores"""
+    from django.core.cache import cache
+
+    cache.clear()
+
+
 @pytest.fixture
 def client():
     """Fixture para cliente de pruebas"""
@@ -0,0 +1,302 @@
+from datetime import date, timedelta
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.http import QueryDict
+from django.utils import timezone
+from tests.factories import (
+    ClassroomFactory,
+    CourseGroupFactory,
+    LaboratoryGroupFactory,
+    SemesterFactory,
+    StudentEnrollmentFactory,
+)
+from domain.academic_structure.calendar import class_dates, session_dates
+from infrastructure.persistence.models import (
+    AttendanceRecord,
+    CalendarException,
+    LabAssignment,
+    LabEnrollmentCampaign,
+    Schedule,
+    SessionIndex,
+    StudentPostulation,
+)
+from application.services import academic_calendar
+from application.services.academic_calendar import (
+    get_group_sessions,
+    get_lab_sessions,
+)
+from application.services.professor_services import ProfessorService
+
+
+def walk_days(start, end, weekdays):
+    """El cálculo de siempre, día por día, para comparar"""
+    dates, current = [], start
+    while current <= end:
+        if current.weekday() in weekdays:
+            dates.append(current)
+        current += timedelta(days=1)
+    return dates
+
+
+class TestSessionDates:
+    """Fechas por aritmética: las mismas que recorriendo el semestre"""
+
+    @pytest.mark.parametrize("weekdays", [(0,), (0, 2), (1, 3, 4), (5, 6)])
+    def test_matches_day_by_day_walk(self, weekdays):
+        start, end = date(2025, 3, 12), date(2025, 7, 18)
+
+        assert list(session_dates(start, end, weekdays)) == walk_days(
+            start, end, weekdays
+        )
+
+    def test_empty_when_semester_ends_before_first_class(self):
+        # Miércoles a viernes, clases solo los lunes
+        assert session_dates(date(2025, 3, 12), date(2025, 3, 14), (0,)) == ()
+
+    def test_holidays_and_makeup_days(self):
+        start, end = date(2025, 3, 3), date(2025, 3, 31)  # lunes a lunes
+        holiday, saturday = date(2025, 3, 10), date(2025, 3, 15)
+
+        dates = class_dates(
+            start, end, (0,), closed={holiday}, makeups=[(saturday, 0), (saturday, 2)]
+        )
+
+        assert dates == [
+            date(2025, 3, 3),
+            saturday,
+            date(2025, 3, 17),
+            date(2025, 3, 24),
+            date(2025, 3, 31),
+        ]
+
+
+@pytest.mark.django_db
+class TestSessionCalendarService:
+    """Las fechas salen del índice guardado; solo hoy/pasado se marca al leer"""
+
+    def make_group(self, *days):
+        semester = SemesterFactory.create(
+            start_date=date.today() - timedelta(days=30),
+            end_date=date.today() + timedelta(days=60),
+        )
+        group = CourseGroupFactory.create(course__semester=semester)
+        room = ClassroomFactory.create()
+        for day in days:
+            Schedule.objects.create(
+                course_group=group,
+                day_of_week=day,
+                start_time="08:00",
+                end_time="10:00",
+                room=room,
+            )
+        return group
+
+    def test_index_is_built_once(self, django_assert_num_queries):
+        group = self.make_group("LUNES", "MIERCOLES")
+
+        # índice vacío + horario + excepciones + guardar el índice
+        # + horario y excepciones otra vez (por si cambiaron mientras)
+        with django_assert_num_queries(6):
+            sessions = get_group_sessions(group)
+        with django_assert_num_queries(1):
+            again = get_group_sessions(group)
+
+        assert sessions == again
+        assert {s["day_name"] for s in sessions} == {"Lunes", "Miercoles"}
+        assert [s["number"] for s in sessions] == list(range(1, len(sessions) + 1))
+        assert sum(s["is_today"] for s in sessions) <= 1
+        assert all(s["is_past"] == (s["date"] < date.today()) for s in sessions)
+        assert SessionIndex.objects.filter(course_group=group).count() == len(sessions)
+        assert sessions.on(sessions[2]["date"])["number"] == 3
+
+    def test_schedule_change_rebuilds_index(self):
+        group = self.make_group("LUNES")
+        before = len(get_group_sessions(group))
+
+        Schedule.objects.create(
+            course_group=group,
+            day_of_week="JUEVES",
+            start_time="08:00",
+            end_time="10:00",
+            room=ClassroomFactory.create(),
+        )
+
+        assert len(get_group_sessions(group)) > before
+
+    def test_holiday_shifts_session_numbers(self):
+        group = self.make_group("LUNES")
+        sessions = get_group_sessions(group)
+        holiday = sessions[1]["date"]
+
+        CalendarException.objects.create(
+            semester=group.course.semester, date=holiday, kind="FERIADO"
+        )
+        after = get_group_sessions(group)
+
+        assert after.on(holiday) is None
+        assert len(after) == len(sessions) - 1
+        assert after[1]["date"] == sessions[2]["date"]
+
+    def test_rebuild_does_not_keep_dates_that_changed_meanwhile(self):
+        group = self.make_group("LUNES")
+        semester = group.course.semester
+        old_spec = (semester.pk, semester.start_date, semester.end_date, (0,))
+        new_spec = (semester.pk, semester.start_date, semester.end_date, (0, 3))
+        # Otro pedido confirma el jueves justo después de que leí el horario
+        specs = iter([old_spec, new_spec])
+
+        dates = academic_calendar._rebuild(
+            lambda: next(specs), course_group_id=group.group_id
+        )
+
+        assert any(day.weekday() == 3 for day in dates)
+        assert not SessionIndex.objects.filter(course_group=group).exists()
+
+    def test_past_holiday_renumbers_saved_attendance(self):
+        group = self.make_group("LUNES")
+        sessions = get_group_sessions(group)
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        service = ProfessorService()
+        # La sesión 2 no se dictó (no hay asistencia): después la declaran feriado
+        for number, status in ((1, "P"), (3, "F"), (4, "J")):
+            post = QueryDict(mutable=True)
+            post[f"attendance_{enrollment.enrollment_id}"] = status
+            service.save_attendance_and_topics(
+                [enrollment],
+                number,
+                sessions[number - 1]["date"],
+                post,
+                group.professor,
+                "::1",
+                None,
+            )
+
+        CalendarException.objects.create(
+            semester=group.course.semester, date=sessions[1]["date"], kind="FERIADO"
+        )
+
+        after = get_group_sessions(group)
+        records = dict(
+            AttendanceRecord.objects.filter(enrollment=enrollment).values_list(
+                "session_date", "session_number"
+            )
+        )
+        # Cada registro queda con el número que su fecha tiene ahora
+        assert records == {
+            day: after.on(day)["number"]
+            for day in (sessions[0]["date"], sessions[2]["date"], sessions[3]["date"])
+        }
+        assert sorted(records.values()) == [1, 2, 3]
+
+        enrollment.refresh_from_db()
+        assert enrollment.attendance_vector == "PFJ"
+        assert (enrollment.attendance_total, enrollment.attendance_absent) == (3, 1)
+
+    def test_past_holiday_renumbers_lab_attendance(self):
+        semester = SemesterFactory.create(
+            start_date=date.today() - timedelta(days=60),
+            end_date=date.today() + timedelta(days=30),
+        )
+        lab = LaboratoryGroupFactory.create(
+            course__semester=semester, day_of_week="VIERNES"
+        )
+        enrollment = StudentEnrollmentFactory.create(course=lab.course, group=None)
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=lab.course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        postulation = StudentPostulation.objects.create(
+            campaign=campaign, student=enrollment.student, lab_group=lab
+        )
+        enrollment.lab_assignment = LabAssignment.objects.create(
+            postulation=postulation,
+            student=enrollment.student,
+            lab_group=lab,
+            assignment_method="DIRECTO",
+        )
+        enrollment.save()
+        sessions = get_lab_sessions(lab)
+        for number, status in ((1, "P"), (3, "F")):
+            AttendanceRecord.objects.create(
+                enrollment=enrollment,
+                session_number=number,
+                session_date=sessions[number - 1]["date"],
+                status=status,
+                professor_ip="::1",
+            )
+
+        CalendarException.objects.create(
+            semester=semester, date=sessions[1]["date"], kind="FERIADO"
+        )
+
+        # La matriz del lab lee el vector por número de sesión del lab
+        records = dict(
+            AttendanceRecord.objects.filter(enrollment=enrollment).values_list(
+                "session_date", "session_number"
+            )
+        )
+        assert records == {sessions[0]["date"]: 1, sessions[2]["date"]: 2}
+        enrollment.refresh_from_db()
+        assert enrollment.attendance_vector == "PF"
+
+    def test_holiday_cannot_fall_on_a_day_with_attendance(self):
+        group = self.make_group("LUNES")
+        session = get_group_sessions(group)[0]
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        AttendanceRecord.objects.create(
+            enrollment=enrollment,
+            session_number=1,
+            session_date=session["date"],
+            status="P",
+            professor_ip="::1",
+        )
+
+        holiday = CalendarException(
+            semester=group.course.semester, date=session["date"], kind="FERIADO"
+        )
+        with pytest.raises(ValidationError):
+            holiday.full_clean()
+
+    def test_makeup_day_with_attendance_cannot_be_removed(self):
+        group = self.make_group("LUNES")
+        semester = group.course.semester
+        saturday = semester.start_date + timedelta(
+            days=(5 - semester.start_date.weekday()) % 7
+        )
+        makeup = CalendarException.objects.create(
+            semester=semester,
+            date=saturday,
+            kind="RECUPERACION",
+            makeup_for_day="LUNES",
+        )
+        session = get_group_sessions(group).on(saturday)
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        AttendanceRecord.objects.create(
+            enrollment=enrollment,
+            session_number=session["number"],
+            session_date=saturday,
+            status="P",
+            professor_ip="::1",
+        )
+
+        # Ese registro quedaría sin número de sesión
+        with pytest.raises(ValidationError):
+            makeup.delete()
+        makeup.date = saturday + timedelta(days=7)
+        with pytest.raises(ValidationError):
+            makeup.full_clean()
+        with pytest.raises(ValidationError):
+            makeup.save()
+
+        assert CalendarException.objects.get(pk=makeup.pk).date == saturday
+        assert AttendanceRecord.objects.filter(enrollment=enrollment).count() == 1
+
+    def test_lab_starts_one_week_later(self):
+        lab = LaboratoryGroupFactory.create(day_of_week="VIERNES")
+        semester = lab.course.semester
+
+        sessions = get_lab_sessions(lab)
+
+        assert sessions[0]["date"] >= semester.start_date + timedelta(days=7)
+        assert sessions[0]["date"].weekday() == 4
+        assert all(s["day_name"] == "Viernes" for s in sessions)
@@ -0,0 +1,30 @@
+from domain.academic_performance.attendance import (
+    build,
+    current_absence_streak,
+    longest_absence_streak,
+    set_status,
+    status_at,
+)
+
+
+class TestAttendanceVector:
+    """Un carácter por sesión; las sesiones sin registro quedan en '-'"""
+
+    def test_set_status_pads_and_replaces(self):
+        vector = set_status("", 3, "P")
+        assert vector == "--P"
+        assert set_status(vector, 1, "F") == "F-P"
+        assert set_status(vector, 3, "J") == "--J"
+
+    def test_status_at_out_of_range(self):
+        assert status_at("PF", 2) == "F"
+        assert status_at("PF", 5) == "-"
+
+    def test_build_from_records(self):
+        assert build({4: "F", 1: "P", 2: "J"}) == "PJ-F"
+
+    def test_absence_streaks(self):
+        # La sesión sin registro no corta la racha
+        assert current_absence_streak("PFF-F") == 3
+        assert current_absence_streak("FFP") == 0
+        assert longest_absence_streak("FFFPFF") == 3
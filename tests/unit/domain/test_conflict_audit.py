@@ -0,0 +1,94 @@
+from datetime import time
+
+import pytest
+from tests.factories import (
+    ClassroomFactory,
+    CourseGroupFactory,
+    LaboratoryGroupFactory,
+    StudentEnrollmentFactory,
+    StudentFactory,
+)
+from domain.academic_structure.conflicts import sweep_overlaps
+from infrastructure.persistence.models import Schedule
+from application.services.conflict_audit import audit_semester
+
+
+class TestSweepOverlaps:
+    """Barrido por inicio con heap de fines"""
+
+    def test_reports_every_overlapping_pair_once(self):
+        blocks = [
+            (time(7, 0), time(9, 0), "a"),
+            (time(8, 0), time(10, 0), "b"),
+            (time(8, 30), time(8, 45), "c"),
+            (time(10, 0), time(11, 0), "d"),  # Empieza justo cuando termina b
+        ]
+
+        pairs = {frozenset((a[2], b[2])) for a, b in sweep_overlaps(blocks)}
+
+        assert pairs == {
+            frozenset("ab"),
+            frozenset("ac"),
+            frozenset("bc"),
+        }
+
+
+@pytest.mark.django_db
+class TestSemesterConflictAudit:
+    """Cruces de salón, profesor y alumno en una sola pasada"""
+
+    def test_room_professor_and_student_conflicts(self, django_assert_max_num_queries):
+        room = ClassroomFactory.create()
+        group_a = CourseGroupFactory.create()
+        group_b = CourseGroupFactory.create(
+            course__semester=group_a.course.semester, professor=group_a.professor
+        )
+        lab = LaboratoryGroupFactory.create(
+            course=group_b.course,
+            room=room,
+            day_of_week="LUNES",
+            start_time="09:30",
+            end_time="11:00",
+            professor=None,
+        )
+        for group in (group_a, group_b):
+            Schedule.objects.create(
+                course_group=group,
+                day_of_week="LUNES",
+                start_time=time(8, 0),
+                end_time=time(10, 0),
+                room=room if group is group_a else None,
+            )
+        student = StudentFactory.create(username="20250099")
+        StudentEnrollmentFactory.create(
+            student=student, course=group_a.course, group=group_a
+        )
+        StudentEnrollmentFactory.create(
+            student=student, course=group_b.course, group=group_b
+        )
+
+        with django_assert_max_num_queries(5):
+            report = audit_semester(group_a.course.semester_id)
+
+        # Salón: teoría del grupo A contra el lab
+        assert report["stats"]["room"] == 1
+        assert report["room"][0]["start"] == time(9, 30)
+        assert {report["room"][0]["first"], report["room"][0]["second"]} == {
+            str(group_a).replace(" - ", " - Grupo "),
+            f"{lab.course.course_code} - Lab {lab.lab_nomenclature}",
+        }
+        # Profesor: el mismo docente en los grupos A y B a la vez
+        assert report["stats"]["professor"] == 1
+        # Alumno: matriculado en A y B que se cruzan
+        assert report["stats"]["student"] == 1
+        assert report["student"][0]["sample"] == ["20250099"]
+
+    def test_malformed_semester_falls_back_to_the_active_one(self):
+        from application.services.secretaria_services import SecretariaService
+
+        group = CourseGroupFactory.create()
+
+        context = SecretariaService.get_conflict_audit_context("no-es-un-uuid")
+
+        assert context["selected_semester"] == group.course.semester
+        assert "audit" in context
@@ -0,0 +1,352 @@
+from datetime import time
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from tests.factories import (
+    CourseFactory,
+    LaboratoryGroupFactory,
+    StudentEnrollmentFactory,
+)
+from domain.lab_enrollment.assignment import (
+    LabAssignmentEngine,
+    LabOption,
+    LabRequest,
+    NO_OPTIONS,
+    NO_SEATS,
+    TimeBlock,
+    lottery_order,
+    suggest_extra_seats,
+)
+from infrastructure.persistence.models import (
+    LabAssignment,
+    LabEnrollmentCampaign,
+    LabPreference,
+    Schedule,
+    StudentEnrollment,
+    StudentPostulation,
+)
+from application.services import lab_assignment
+from application.services.secretaria_services import SecretariaService
+from application.services.student_services import StudentService
+
+
+def block(day, start, end):
+    return TimeBlock(day, time(start), time(end))
+
+
+class TestLabAssignmentEngine:
+    """Matching por curso: el orden de llegada no debe dejar alumnos afuera"""
+
+    def test_student_with_one_option_keeps_it(self):
+        labs = [
+            LabOption("A", "C1", 1, block("LUNES", 8, 10)),
+            LabOption("B", "C1", 1, block("MARTES", 8, 10)),
+            LabOption("C", "C1", 1, block("MIERCOLES", 8, 10)),
+        ]
+        # s2 solo puede ir al A; s1 prefiere el A pero también puede ir al B
+        busy = {"s2": [block("MARTES", 7, 12), block("MIERCOLES", 7, 12)]}
+        requests = [LabRequest("s1", "C1", "A"), LabRequest("s2", "C1", None)]
+
+        result = LabAssignmentEngine(labs, busy).solve(requests)
+
+        assert result.assigned == {("s1", "C1"): "B", ("s2", "C1"): "A"}
+
+    def test_displacement_through_a_full_lab(self):
+        labs = [
+            LabOption("A", "C1", 1, block("LUNES", 8, 10)),
+            LabOption("B", "C1", 1, block("MARTES", 8, 10)),
+            LabOption("C", "C1", 0, block("JUEVES", 8, 10)),
+        ]
+        busy = {"s1": [block("JUEVES", 8, 10)], "s2": [block("MARTES", 8, 10)]}
+        requests = [LabRequest("s1", "C1", "A"), LabRequest("s2", "C1", None)]
+
+        result = LabAssignmentEngine(labs, busy).solve(requests)
+
+        assert len(result) == 2
+        assert result.assigned[("s2", "C1")] == "A"
+
+    def test_labs_of_other_courses_block_the_timetable(self):
+        labs = [
+            LabOption("A", "C1", 1, block("LUNES", 8, 10)),
+            LabOption("X", "C2", 5, block("LUNES", 9, 11)),
+            LabOption("Y", "C2", 5, block("VIERNES", 9, 11)),
+        ]
+        requests = [LabRequest("s1", "C1", None), LabRequest("s1", "C2", None)]
+
+        result = LabAssignmentEngine(labs, {}).solve(requests)
+
+        # C1 va primero (menos holgura) y C2 ya no puede usar el lunes
+        assert result.assigned == {("s1", "C1"): "A", ("s1", "C2"): "Y"}
+
+    def test_first_fit_keeps_arrival_order(self):
+        labs = [
+            LabOption("A", "C1", 1, block("LUNES", 8, 10)),
+            LabOption("B", "C1", 1, block("MARTES", 8, 10)),
+        ]
+        busy = {"s2": [block("MARTES", 8, 10)]}
+        requests = [LabRequest("s1", "C1", None), LabRequest("s2", "C1", None)]
+
+        result = LabAssignmentEngine(labs, busy).solve_first_fit(requests)
+
+        # El de siempre: s1 agarra el A y s2 se queda sin lab
+        assert result.assigned == {("s1", "C1"): "A"}
+        assert result.unassigned == {("s2", "C1"): NO_SEATS}
+
+    def test_unassigned_reasons(self):
+        labs = [LabOption("A", "C1", 1, block("LUNES", 8, 10))]
+        busy = {"s3": [block("LUNES", 9, 10)]}
+        requests = [LabRequest(s, "C1", None) for s in ("s1", "s2", "s3")]
+
+        result = LabAssignmentEngine(labs, busy).solve(requests)
+
+        assert len(result) == 1
+        assert result.unassigned[("s3", "C1")] == NO_OPTIONS
+        assert list(result.unassigned.values()).count(NO_SEATS) == 1
+
+    def test_causes_and_extra_seats(self):
+        labs = [
+            LabOption("A", "C1", 1, block("LUNES", 8, 10)),
+            LabOption("B", "C1", 0, block("MARTES", 8, 10)),
+        ]
+        busy = {
+            "s3": [
+                TimeBlock("LUNES", time(9), time(11), "MAT - Grupo A"),
+                TimeBlock("MARTES", time(8), time(9), "FIS - Grupo B"),
+            ],
+            "s4": [block("LUNES", 8, 9)],
+        }
+        requests = [LabRequest(s, "C1", None) for s in ("s1", "s2", "s3", "s4")]
+
+        result = LabAssignmentEngine(labs, busy).solve(requests)
+
+        assert result.causes[("s3", "C1")] == ["FIS - Grupo B", "MAT - Grupo A"]
+        # s2 (A o B) y s4 (solo B): con 2 cupos más en B entran los dos
+        assert suggest_extra_seats(result) == {"B": 2}
+
+
+class TestLotteryAllocation:
+    """Dictadura serial: mismo orden sorteado con la misma semilla"""
+
+    def test_same_seed_same_result(self):
+        labs = [
+            LabOption("A", "C1", 2, block("LUNES", 8, 10)),
+            LabOption("B", "C1", 2, block("MARTES", 8, 10)),
+        ]
+        requests = [LabRequest(f"s{i}", "C1", None) for i in range(4)]
+        preferences = {(f"s{i}", "C1"): ["A", "B"] for i in range(4)}
+
+        first = LabAssignmentEngine(labs, {}).solve_lottery(
+            requests, preferences, "semilla"
+        )
+        again = LabAssignmentEngine(labs, {}).solve_lottery(
+            list(reversed(requests)), preferences, "semilla"
+        )
+
+        assert first.assigned == again.assigned
+        assert first.order == again.order
+        # Los dos primeros del sorteo se quedan con su primera opción
+        assert {first.assigned[key] for key in first.order[:2]} == {"A"}
+        assert {first.assigned[key] for key in first.order[2:]} == {"B"}
+
+    def test_ranking_skips_conflicts_and_falls_back(self):
+        labs = [
+            LabOption("A", "C1", 1, block("LUNES", 8, 10)),
+            LabOption("B", "C1", 1, block("MARTES", 8, 10)),
+            LabOption("C", "C1", 1, block("JUEVES", 8, 10)),
+        ]
+        busy = {"s1": [block("LUNES", 8, 9)]}
+        requests = [LabRequest("s1", "C1", None), LabRequest("s2", "C1", None)]
+        # s1 pidió solo el A, que se le cruza; s2 no registró preferencias
+        preferences = {("s1", "C1"): ["A"]}
+
+        result = LabAssignmentEngine(labs, busy).solve_lottery(
+            requests, preferences, 7
+        )
+
+        # Con preferencias elige antes; sin el A le toca el primero compatible
+        assert result.order[0] == ("s1", "C1")
+        assert result.assigned == {("s1", "C1"): "B", ("s2", "C1"): "A"}
+
+    def test_order_does_not_depend_on_input_order(self):
+        requests = [LabRequest(f"s{i}", "C1", None) for i in range(10)]
+
+        assert lottery_order(requests, 42) == lottery_order(requests[::-1], 42)
+        assert lottery_order(requests, 42) != lottery_order(requests, 43)
+
+
+@pytest.mark.django_db
+class TestLabAssignmentService:
+    """Carga masiva, resuelve y guarda en bloque"""
+
+    def test_assign_all_persists_assignments(self, django_assert_max_num_queries):
+        course = CourseFactory.create()
+        lab_a = LaboratoryGroupFactory.create(course=course, capacity=1)
+        lab_b = LaboratoryGroupFactory.create(
+            course=course, capacity=1, day_of_week="MARTES"
+        )
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        busy = StudentEnrollmentFactory.create(course=course)
+        free = StudentEnrollmentFactory.create(course=course)
+        # El primero tiene teoría el martes a la misma hora que el lab B
+        Schedule.objects.create(
+            course_group=busy.group,
+            day_of_week="MARTES",
+            start_time="08:00",
+            end_time="10:00",
+            room=lab_b.room,
+        )
+
+        with django_assert_max_num_queries(12):
+            summary = lab_assignment.assign_all()
+
+        assert summary["assigned"] == 2
+        assert summary["skipped_full"] == summary["skipped_conflict"] == 0
+        assigned = dict(
+            StudentEnrollment.objects.filter(course=course).values_list(
+                "enrollment_id", "lab_assignment__lab_group_id"
+            )
+        )
+        assert assigned == {
+            busy.enrollment_id: lab_a.lab_id,
+            free.enrollment_id: lab_b.lab_id,
+        }
+        assert (
+            StudentPostulation.objects.filter(
+                campaign=campaign, status="ACEPTADO"
+            ).count()
+            == 2
+        )
+
+    def test_only_pending_postulations_become_assignments(self):
+        course = CourseFactory.create()
+        lab = LaboratoryGroupFactory.create(course=course, capacity=3)
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        pending, rejected = StudentEnrollmentFactory.create_batch(
+            2, course=course, group=None
+        )
+        for enrollment, status in ((pending, "PENDIENTE"), (rejected, "NO_ASIGNADO")):
+            StudentPostulation.objects.create(
+                campaign=campaign,
+                student=enrollment.student,
+                lab_group=lab,
+                status=status,
+            )
+
+        problem = lab_assignment.load_problem()
+
+        assert [p[1] for p in problem.pinned] == [pending.student_id]
+        # No se le arma otra postulación: ya tuvo la suya en esta campaña
+        assert problem.requests == []
+        # Los cupos cuentan todas, igual que el contador en vivo
+        assert problem.labs[lab.lab_id].seats == 1
+
+        lab_assignment.assign_all()
+        rejected.refresh_from_db()
+        assert rejected.lab_assignment is None
+        assert LabAssignment.objects.get().student_id == pending.student_id
+
+    def test_command_rejects_a_zero_chunk_size(self):
+        with pytest.raises(CommandError):
+            call_command("asignar_labs", "--precarga", "--lote", "0")
+
+    def test_preload_command_writes_in_chunks(self):
+        course = CourseFactory.create()
+        lab = LaboratoryGroupFactory.create(course=course, capacity=10)
+        LabEnrollmentCampaign.objects.create(
+            course=course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        for _ in range(3):
+            StudentEnrollmentFactory.create(course=course, group=None)
+
+        out = StringIO()
+        call_command("asignar_labs", "--precarga", "--lote", "2", stdout=out)
+
+        output = out.getvalue()
+        assert "postulaciones: 2/3" in output
+        assert "postulaciones: 3/3" in output
+        assert "⏱ carga:" in output
+        assert (
+            StudentEnrollment.objects.filter(lab_assignment__lab_group=lab).count() == 3
+        )
+
+    def test_default_command_leaves_lottery_campaigns_alone(self):
+        course = CourseFactory.create()
+        LaboratoryGroupFactory.create(course=course, capacity=10)
+        LabEnrollmentCampaign.objects.create(
+            course=course,
+            start_date=timezone.now(),
+            end_date=timezone.now(),
+            allocation_mode="SORTEO",
+        )
+        StudentEnrollmentFactory.create(course=course, group=None)
+
+        out = StringIO()
+        call_command("asignar_labs", stdout=out)
+
+        assert not LabAssignment.objects.exists()
+        assert not StudentPostulation.objects.exists()
+
+    def test_simulation_does_not_write(self):
+        course = CourseFactory.create()
+        LaboratoryGroupFactory.create(course=course, capacity=1)
+        LabEnrollmentCampaign.objects.create(
+            course=course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        for _ in range(3):
+            StudentEnrollmentFactory.create(course=course, group=None)
+
+        report = lab_assignment.simulate([course.course_id])
+
+        assert report["summary"]["skipped_full"] == 2
+        assert report["summary"]["extra_seats"] == 2
+        assert report["courses"][0]["assigned"] == 1
+        assert len(report["courses"][0]["unassigned"]) == 2
+        assert not StudentPostulation.objects.exists()
+
+    def test_close_lottery_campaign_allocates_by_preference(self):
+        course = CourseFactory.create()
+        lab_a = LaboratoryGroupFactory.create(course=course, capacity=1)
+        lab_b = LaboratoryGroupFactory.create(
+            course=course, capacity=1, day_of_week="MARTES"
+        )
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=course,
+            start_date=timezone.now(),
+            end_date=timezone.now(),
+            allocation_mode="SORTEO",
+        )
+        first = StudentEnrollmentFactory.create(course=course, group=None)
+        second = StudentEnrollmentFactory.create(course=course, group=None)
+        for enrollment in (first, second):
+            result = StudentService.save_lab_preferences(
+                enrollment.student,
+                campaign.campaign_id,
+                [lab_b.lab_id, lab_a.lab_id],
+            )
+            assert result["success"]
+
+        # Durante la campaña no se reparte nada por orden de llegada
+        result = StudentService.postulate_to_lab(
+            first.student, campaign.campaign_id, lab_a.lab_id
+        )
+        assert not result["success"]
+        assert not StudentPostulation.objects.exists()
+
+        result = SecretariaService.close_lab_enrollment(course.course_id)
+
+        assert result["success"]
+        assert result["lottery"]["assigned"] == 2
+        assert result["lottery"]["first_choice"] == 1
+        campaign.refresh_from_db()
+        assert campaign.is_closed
+        assert campaign.lottery_seed == result["lottery"]["seed"]
+        assert set(
+            LabAssignment.objects.values_list("assignment_method", flat=True)
+        ) == {"LOTTERY"}
+        assert LabPreference.objects.filter(campaign=campaign).count() == 4
@@ -0,0 +1,126 @@
+from datetime import date, time
+
+import pytest
+from tests.factories import ClassroomFactory, CourseGroupFactory, LaboratoryGroupFactory
+from domain.academic_structure.occupancy import Occupancy, RoomOccupancyIndex
+from infrastructure.persistence.models import ClassroomReservation, Schedule
+from application.services import room_occupancy
+from application.services.professor_services import ProfessorService
+from application.services.secretaria_services import SecretariaService
+
+
+def block(start, end, kind="CLASE", ref_id=1, label=""):
+    return Occupancy(time(*start), time(*end), kind, ref_id, label)
+
+
+class TestRoomOccupancyIndex:
+    """Búsquedas de cruces sobre bloques ordenados por salón"""
+
+    def setup_method(self):
+        self.index = RoomOccupancyIndex(
+            [
+                ("A", block((7, 0), (12, 0), ref_id=1)),  # Bloque largo
+                ("A", block((8, 0), (9, 0), ref_id=2)),
+                ("A", block((14, 0), (16, 0), "LAB", ref_id=3, label="B")),
+                ("B", block((10, 0), (11, 0), ref_id=4)),
+            ]
+        )
+
+    def test_touching_blocks_do_not_overlap(self):
+        assert self.index.is_free("A", time(12, 0), time(14, 0))
+        assert not self.index.is_free("A", time(11, 59), time(14, 0))
+
+    def test_long_earlier_block_is_found(self):
+        found = self.index.conflicts("A", time(10, 0), time(10, 30))
+        assert [b.ref_id for b in found] == [1]
+
+    def test_exclude_ignores_the_lab_being_edited(self):
+        assert not self.index.is_free("A", time(15, 0), time(16, 0))
+        assert self.index.is_free("A", time(15, 0), time(16, 0), exclude={("LAB", 3)})
+
+    def test_busy_rooms(self):
+        assert self.index.busy_rooms(time(10, 30), time(13, 0)) == {"A", "B"}
+        assert self.index.busy_rooms(time(16, 0), time(18, 0)) == set()
+        assert self.index.is_free("C", time(8, 0), time(9, 0))
+
+
+@pytest.mark.django_db
+class TestRoomOccupancyService:
+    """El índice por día se arma una vez y se invalida con las señales"""
+
+    def test_index_is_rebuilt_after_schedule_changes(
+        self, django_assert_num_queries, django_capture_on_commit_callbacks
+    ):
+        room = ClassroomFactory.create()
+        group = CourseGroupFactory.create()
+        room_occupancy.invalidate()
+
+        assert room_occupancy.get_day_index("LUNES").is_free(
+            room.pk, time(8, 0), time(10, 0)
+        )
+        # Segunda consulta del mismo día: ya no toca horarios ni labs
+        with django_assert_num_queries(0):
+            room_occupancy.get_day_index("LUNES")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Schedule.objects.create(
+                course_group=group,
+                day_of_week="LUNES",
+                start_time=time(9, 0),
+                end_time=time(11, 0),
+                room=room,
+            )
+
+        assert not room_occupancy.get_day_index("LUNES").is_free(
+            room.pk, time(8, 0), time(10, 0)
+        )
+
+    def test_conflict_messages_and_reservations(self):
+        room = ClassroomFactory.create()
+        lab = LaboratoryGroupFactory.create(room=room, day_of_week="MARTES")
+        room_occupancy.invalidate()
+
+        conflicts = SecretariaService.check_schedule_conflicts(
+            lab.course_id, "MARTES", time(9, 0), time(11, 0), room_id=str(room.pk)
+        )
+        assert conflicts["messages"] == [
+            f"Salón ocupado por Lab {lab.lab_nomenclature}"
+        ]
+        assert not SecretariaService.check_schedule_conflicts(
+            lab.course_id,
+            "MARTES",
+            time(9, 0),
+            time(11, 0),
+            room_id=str(room.pk),
+            exclude_lab_id=str(lab.pk),
+        )["has_conflict"]
+
+        # Un miércoles cualquiera: la reserva pendiente bloquea el aula
+        day = date(2030, 1, 2)
+        ClassroomReservation.objects.create(
+            classroom=room,
+            professor=lab.professor,
+            reservation_date=day,
+            start_time=time(8, 0),
+            end_time=time(9, 0),
+            purpose="Taller",
+        )
+        available = ProfessorService().get_available_classrooms_for_reservation(
+            day, time(8, 30), time(9, 30)
+        )
+        assert not available.filter(pk=room.pk).exists()
+
+    def test_available_classrooms_is_a_single_query(self, django_assert_num_queries):
+        busy, free = ClassroomFactory.create_batch(2)
+        LaboratoryGroupFactory.create(
+            room=busy, day_of_week="JUEVES", start_time="10:00", end_time="12:00"
+        )
+
+        with django_assert_num_queries(1):
+            rooms = list(
+                ProfessorService().get_available_classrooms_for_reservation(
+                    date(2030, 1, 3), time(11, 0), time(13, 0)
+                )
+            )
+
+        assert free in rooms and busy not in rooms
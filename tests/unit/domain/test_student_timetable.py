@@ -0,0 +1,120 @@
+from datetime import time
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from tests.factories import LaboratoryGroupFactory, StudentEnrollmentFactory
+from domain.academic_structure.timetable import WeeklyTimetable, block_mask
+from infrastructure.persistence.models import (
+    LabEnrollmentCampaign,
+    Schedule,
+    StudentPostulation,
+)
+from application.services import student_timetable
+from application.services.secretaria_services import SecretariaService
+from application.services.student_services import StudentService
+
+
+class TestBlockMask:
+    """Franjas de 10 minutos: un cruce es un AND"""
+
+    def test_touching_blocks_do_not_overlap(self):
+        first = block_mask("LUNES", time(8, 0), time(9, 40))
+        assert not first & block_mask("LUNES", time(9, 40), time(11, 20))
+        assert first & block_mask("LUNES", time(9, 30), time(10, 0))
+
+    def test_days_do_not_mix(self):
+        assert not block_mask("LUNES", time(8), time(10)) & block_mask(
+            "MARTES", time(8), time(10)
+        )
+
+    def test_unaligned_times_round_outward(self):
+        # 8:05 cae en la franja de 8:00, así que choca con algo que termina 8:10
+        assert block_mask("LUNES", time(8, 5), time(9)) & block_mask(
+            "LUNES", time(7), time(8, 10)
+        )
+
+    def test_same_lab_and_pending_can_be_ignored(self):
+        lab = block_mask("JUEVES", time(14), time(16))
+        timetable = WeeklyTimetable(0, {"A": lab}, {"B": lab})
+
+        assert timetable.conflicts(lab)
+        assert timetable.conflicts(lab, exclude_lab="A")
+        assert not timetable.conflicts(lab, exclude_lab="A", include_pending=False)
+
+
+@pytest.mark.django_db
+class TestStudentTimetableService:
+    """El horario se arma una vez y las señales lo borran al cambiar"""
+
+    def test_cached_until_schedule_changes(
+        self, django_assert_num_queries, django_capture_on_commit_callbacks
+    ):
+        enrollment = StudentEnrollmentFactory.create()
+        lab = LaboratoryGroupFactory.create(course=enrollment.course)
+        student = enrollment.student
+
+        assert not StudentService._check_student_lab_conflict(student, lab)
+        with django_assert_num_queries(0):
+            assert not StudentService._check_student_lab_conflict(student, lab)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Schedule.objects.create(
+                course_group=enrollment.group,
+                day_of_week=lab.day_of_week,
+                start_time="09:00",
+                end_time="11:00",
+                room=lab.room,
+            )
+        assert StudentService._check_student_lab_conflict(student, lab)
+
+    def test_pending_postulation_blocks_other_labs(
+        self, django_capture_on_commit_callbacks
+    ):
+        enrollment = StudentEnrollmentFactory.create(group=None)
+        lab = LaboratoryGroupFactory.create(course=enrollment.course)
+        other = LaboratoryGroupFactory.create()
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=other.course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            StudentPostulation.objects.create(
+                campaign=campaign, student=enrollment.student, lab_group=other
+            )
+
+        timetable = student_timetable.get(enrollment.student_id)
+        assert timetable.pending
+        assert StudentService._check_student_lab_conflict(enrollment.student, lab)
+
+    def test_waiting_list_query_count_does_not_grow(self, django_assert_num_queries):
+        lab = LaboratoryGroupFactory.create()
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=lab.course, start_date=timezone.now(), end_date=timezone.now()
+        )
+
+        def postulate(count, start="07:00", end="08:00"):
+            for _ in range(count):
+                enrollment = StudentEnrollmentFactory.create(course=lab.course)
+                Schedule.objects.create(
+                    course_group=enrollment.group,
+                    day_of_week=lab.day_of_week,
+                    start_time=start,
+                    end_time=end,
+                    room=lab.room,
+                )
+                StudentPostulation.objects.create(
+                    campaign=campaign, student=enrollment.student, lab_group=lab
+                )
+
+        # 1 de postulaciones + 3 para armar los horarios, con 1 o con 6 alumnos
+        postulate(1, "09:00", "10:40")
+        with django_assert_num_queries(4):
+            SecretariaService.get_lab_enrolled_students(lab.lab_id)
+
+        postulate(5)
+        cache.clear()
+        with django_assert_num_queries(4):
+            students = SecretariaService.get_lab_enrolled_students(lab.lab_id)
+
+        assert len(students) == 6
+        assert [s["has_conflict"] for s in students] == [True] + [False] * 5
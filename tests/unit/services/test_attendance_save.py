@@ -0,0 +1,126 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.http import QueryDict
+from tests.factories import CourseGroupFactory, StudentEnrollmentFactory
+from infrastructure.persistence.models import AttendanceRecord, StudentEnrollment
+from application.services.professor_services import ProfessorService
+
+
+def attendance_post(statuses):
+    data = QueryDict(mutable=True)
+    for enrollment, status in statuses.items():
+        data[f"attendance_{enrollment.enrollment_id}"] = status
+    return data
+
+
+@pytest.mark.django_db
+class TestSaveAttendance:
+    """Toda la sesión en un upsert, sin consultas por alumno"""
+
+    def test_query_count_does_not_grow_with_students(
+        self, django_assert_max_num_queries
+    ):
+        group = CourseGroupFactory.create()
+        enrollments = [
+            StudentEnrollmentFactory.create(course=group.course, group=group)
+            for _ in range(20)
+        ]
+        post = attendance_post({e: "P" for e in enrollments})
+
+        # savepoint + bloqueo de matrículas (con sus vectores) + estados
+        # anteriores + upsert + UPDATE de contadores + guardar vectores
+        with django_assert_max_num_queries(7):
+            ProfessorService().save_attendance_and_topics(
+                enrollments, 1, date.today(), post, group.professor, "127.0.0.1", None
+            )
+
+        assert AttendanceRecord.objects.filter(session_number=1).count() == 20
+        assert set(
+            StudentEnrollment.objects.values_list("attendance_vector", flat=True)
+        ) == {"P"}
+
+    def test_resave_updates_records_and_percentages(self):
+        group = CourseGroupFactory.create()
+        present = StudentEnrollmentFactory.create(course=group.course, group=group)
+        absent = StudentEnrollmentFactory.create(course=group.course, group=group)
+        service = ProfessorService()
+        AttendanceRecord.objects.create(
+            enrollment=present,
+            session_number=1,
+            session_date=date.today(),
+            status="P",
+            professor_ip="127.0.0.1",
+        )
+
+        present.calculate_attendance_percentage()  # la sesión 1 se creó a mano
+
+        post = attendance_post({present: "F", absent: "F"})
+        service.save_attendance_and_topics(
+            [present, absent], 2, date.today(), post, group.professor, "10.0.0.1", None
+        )
+        # Corrige la sesión 2: el primero sí vino
+        post = attendance_post({present: "P", absent: "F"})
+        service.save_attendance_and_topics(
+            [present, absent], 2, date.today(), post, group.professor, "10.0.0.2", None
+        )
+
+        record = AttendanceRecord.objects.get(enrollment=present, session_number=2)
+        assert record.status == "P"
+        assert record.professor_ip == "10.0.0.2"
+        assert AttendanceRecord.objects.count() == 3
+        percentages = dict(
+            StudentEnrollment.objects.values_list(
+                "enrollment_id", "current_attendance_percentage"
+            )
+        )
+        assert percentages[present.enrollment_id] == Decimal("100.00")
+        assert percentages[absent.enrollment_id] == Decimal("0.00")
+
+        present.refresh_from_db()
+        assert (present.attendance_present, present.attendance_absent) == (2, 0)
+        assert present.attendance_total == 2
+        assert present.attendance_vector == "PP"
+
+    def test_counters_follow_status_changes(self):
+        group = CourseGroupFactory.create()
+        enrollments = [
+            StudentEnrollmentFactory.create(course=group.course, group=group)
+            for _ in range(3)
+        ]
+        service = ProfessorService()
+        for session, statuses in enumerate((("P", "F", "J"), ("F", "F", "P")), 1):
+            post = attendance_post(dict(zip(enrollments, statuses)))
+            service.save_attendance_and_topics(
+                enrollments, session, date.today(), post, group.professor, "::1", None
+            )
+        # Corrige la sesión 1 del segundo: era justificada
+        post = attendance_post({enrollments[1]: "J"})
+        service.save_attendance_and_topics(
+            enrollments, 1, date.today(), post, group.professor, "::1", None
+        )
+
+        for enrollment in enrollments:
+            enrollment.refresh_from_db()
+            counters = (
+                enrollment.attendance_present,
+                enrollment.attendance_justified,
+                enrollment.attendance_absent,
+                enrollment.attendance_total,
+                enrollment.current_attendance_percentage,
+                enrollment.attendance_vector,
+            )
+            # Lo incremental tiene que coincidir con contar desde cero
+            enrollment.calculate_attendance_percentage()
+            assert counters == (
+                enrollment.attendance_present,
+                enrollment.attendance_justified,
+                enrollment.attendance_absent,
+                enrollment.attendance_total,
+                enrollment.current_attendance_percentage,
+                enrollment.attendance_vector,
+            )
+        assert enrollments[1].attendance_justified == 1
+        assert enrollments[1].current_attendance_percentage == Decimal("50.00")
+        assert enrollments[1].attendance_vector == "JF"
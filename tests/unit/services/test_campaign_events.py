@@ -0,0 +1,57 @@
+import json
+import uuid
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from tests.factories import StudentEnrollmentFactory
+from tests.unit.services.test_seat_counters import open_campaign
+from application.services import campaign_events
+from application.services.student_services import StudentService
+
+
+async def collect(campaign_ids, initial, duration):
+    return [
+        chunk async for chunk in campaign_events.stream(campaign_ids, initial, duration)
+    ]
+
+
+def parse(chunk):
+    name, data = chunk.strip().split("\n")
+    return name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+class TestCampaignEvents:
+    """Eventos de cupos para el tablero en vivo"""
+
+    def test_read_since_merges_to_latest_value_per_lab(self):
+        campaign_id = uuid.uuid4()
+        position = campaign_events.cursor([campaign_id])
+
+        campaign_events.publish(campaign_id, {"lab-a": 1})
+        campaign_events.publish(campaign_id, {"lab-a": 2, "lab-b": 1})
+        campaign_events.publish(campaign_id, {"lab-a": 1})
+
+        position, changes = campaign_events.read_since(position)
+        assert changes == {"lab-a": 1, "lab-b": 1}
+        # Ya leídos: no se repiten
+        assert campaign_events.read_since(position) == (position, {})
+
+    def test_stream_starts_with_snapshot(self):
+        chunks = async_to_sync(collect)([uuid.uuid4()], {"lab-a": 3}, 0)
+
+        assert [parse(chunk) for chunk in chunks] == [("seats", {"lab-a": 3})]
+
+
+@pytest.mark.django_db
+def test_postulation_publishes_seat_delta():
+    campaign, lab = open_campaign(capacity=2)
+    enrollment = StudentEnrollmentFactory.create(course=campaign.course, group=None)
+    position = campaign_events.cursor([campaign.campaign_id])
+
+    StudentService.postulate_to_lab(
+        enrollment.student, campaign.campaign_id, lab.lab_id
+    )
+
+    _, changes = campaign_events.read_since(position)
+    assert changes == {str(lab.lab_id): 1}
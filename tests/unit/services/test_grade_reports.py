@@ -0,0 +1,214 @@
+import io
+import os
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import openpyxl
+import pytest
+from tests.factories import (
+    CourseGroupFactory,
+    EvaluationFactory,
+    GradeRecordFactory,
+    StudentEnrollmentFactory,
+)
+from infrastructure.persistence.models import AttendanceRecord, CalendarException
+from application.services import report_cache
+from application.services.professor_services import ProfessorService
+from application.services.secretaria_services import SecretariaService
+
+
+def age(path, seconds=3600):
+    """Hace que el archivo parezca generado hace un rato"""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.mark.django_db
+class TestGradesExcelExport:
+    """Reporte de notas en modo write-only"""
+
+    def test_workbook_has_header_and_one_row_per_student(self):
+        group = CourseGroupFactory.create()
+        exam = EvaluationFactory.create(course=group.course, name="Parcial 1")
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        StudentEnrollmentFactory.create(course=group.course, group=group)
+        GradeRecordFactory.create(
+            enrollment=enrollment, evaluation=exam, raw_score=Decimal("14.50")
+        )
+
+        wb, filename = SecretariaService.generate_grades_excel_workbook(group.group_id)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        rows = list(openpyxl.load_workbook(buffer).active.iter_rows(values_only=True))
+
+        assert filename == f"Notas_{group.course.course_code}_{group.group_code}.xlsx"
+        assert rows[3] == ("CUI", "Alumno", "Parcial 1", "FINAL")
+        assert len(rows) == 6
+        by_cui = {row[0]: row for row in rows[4:]}
+        assert by_cui[enrollment.student.username][2] == 15
+
+    def test_cells_share_named_styles(self):
+        group = CourseGroupFactory.create()
+        StudentEnrollmentFactory.create(course=group.course, group=group)
+
+        wb, _ = SecretariaService.generate_grades_excel_workbook(group.group_id)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        ws = openpyxl.load_workbook(buffer).active
+
+        assert ws.cell(row=4, column=1).style == "report_header"
+        assert ws.cell(row=5, column=1).style == "report_cell"
+
+
+@pytest.mark.django_db
+class TestConsolidatedGradesExport:
+    """Consolidado de semestre: una hoja por grupo con consultas fijas"""
+
+    def test_one_sheet_per_group_with_fixed_queries(
+        self, django_assert_max_num_queries
+    ):
+        group_a = CourseGroupFactory.create(group_code="A")
+        group_b = CourseGroupFactory.create(course=group_a.course, group_code="B")
+        other = CourseGroupFactory.create(course__semester=group_a.course.semester)
+        EvaluationFactory.create(course=group_a.course, name="Parcial 1")
+        for group in (group_a, group_b, group_b, other):
+            StudentEnrollmentFactory.create(course=group.course, group=group)
+
+        progress = []
+        with django_assert_max_num_queries(4):
+            wb, total = SecretariaService.generate_consolidated_grades_workbook(
+                semester_id=group_a.course.semester_id,
+                progress_callback=progress.append,
+            )
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        book = openpyxl.load_workbook(buffer)
+
+        assert total == 3
+        assert progress[-1] == {"done": 3, "total": 3}
+        code = group_a.course.course_code
+        assert f"{code} A" in book.sheetnames and f"{code} B" in book.sheetnames
+        # 4 filas de encabezado + alumnos del grupo
+        assert book[f"{code} B"].max_row == 6
+        assert book[f"{code} A"]["C4"].value == "Parcial 1"
+
+    def test_job_leaves_a_cached_artifact(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        group = CourseGroupFactory.create()
+        semester_id = group.course.semester_id
+
+        first = SecretariaService.enqueue_consolidated_grades(semester_id=semester_id)
+        status = SecretariaService.get_job_status(first["task_id"])
+        assert status["ready"] and status["result"]["groups"] == 1
+
+        second = SecretariaService.enqueue_consolidated_grades(semester_id=semester_id)
+        assert second["ready"]
+        assert second["artifact"]["file_path"] == status["result"]["file_path"]
+
+    def test_grade_edit_invalidates_the_artifact(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        group = CourseGroupFactory.create()
+        exam = EvaluationFactory.create(course=group.course)
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        record = GradeRecordFactory.create(enrollment=enrollment, evaluation=exam)
+        semester_id = group.course.semester_id
+
+        first = SecretariaService.build_consolidated_grades_file(semester_id)
+        age(tmp_path / first["file_path"])
+        record.raw_score = Decimal("18.00")
+        record.save()
+
+        assert SecretariaService.get_consolidated_grades_artifact(semester_id) is None
+        second = SecretariaService.build_consolidated_grades_file(semester_id)
+        assert second["file_path"] != first["file_path"]
+        # El archivo de la versión anterior no queda tirado en media
+        assert not os.path.exists(tmp_path / first["file_path"])
+
+
+@pytest.mark.django_db
+class TestVersionedWorkbookCache:
+    """Los Excel se regeneran solo cuando cambia la data del grupo"""
+
+    def test_grades_file_is_reused_until_a_grade_changes(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        group = CourseGroupFactory.create()
+        exam = EvaluationFactory.create(course=group.course)
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        record = GradeRecordFactory.create(enrollment=enrollment, evaluation=exam)
+
+        first, _ = SecretariaService.get_grades_excel_file(group.group_id)
+        again, _ = SecretariaService.get_grades_excel_file(group.group_id)
+        assert again == first
+
+        age(tmp_path / first)
+        record.raw_score = Decimal("18.00")
+        record.save()
+        changed, _ = SecretariaService.get_grades_excel_file(group.group_id)
+
+        assert changed != first
+        # La versión anterior se borra
+        assert [p.name for p in (tmp_path / os.path.dirname(first)).iterdir()] == [
+            os.path.basename(changed)
+        ]
+
+    def test_recent_version_survives_a_stale_request(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        group = CourseGroupFactory.create()
+        exam = EvaluationFactory.create(course=group.course)
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        record = GradeRecordFactory.create(enrollment=enrollment, evaluation=exam)
+        old_version = SecretariaService._grades_version(group)
+
+        record.raw_score = Decimal("18.00")
+        record.save()
+        current, _ = SecretariaService.get_grades_excel_file(group.group_id)
+        # Una petición que leyó el estado antes del cambio guarda su versión después
+        report_cache.get_or_build(
+            "grades",
+            group.group_id,
+            old_version,
+            lambda: SecretariaService.generate_grades_excel_workbook(group.group_id)[0],
+        )
+
+        assert os.path.exists(tmp_path / current)
+        assert SecretariaService.get_grades_excel_file(group.group_id)[0] == current
+
+    def test_attendance_file_follows_attendance_records(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        group = CourseGroupFactory.create()
+        enrollment = StudentEnrollmentFactory.create(course=group.course, group=group)
+        service = ProfessorService()
+
+        first, filename = service.get_attendance_excel_file(
+            group.professor, group.group_id
+        )
+        assert (
+            service.get_attendance_excel_file(group.professor, group.group_id)[0]
+            == first
+        )
+
+        AttendanceRecord.objects.create(
+            enrollment=enrollment,
+            session_number=1,
+            session_date=date.today(),
+            status="P",
+            professor_ip="127.0.0.1",
+        )
+        changed, _ = service.get_attendance_excel_file(group.professor, group.group_id)
+
+        assert changed != first
+        assert filename == f"Asistencia_{group.course.course_code}.xlsx"
+
+        # Un feriado corre las sesiones aunque ningún registro cambie su updated_at
+        CalendarException.objects.create(
+            semester=group.course.semester,
+            date=date.today() + timedelta(days=1),
+            kind="SUSPENSION",
+        )
+        shifted, _ = service.get_attendance_excel_file(group.professor, group.group_id)
+
+        assert shifted != changed
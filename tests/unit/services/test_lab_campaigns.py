@@ -0,0 +1,61 @@
+import pytest
+from django.utils import timezone
+from tests.factories import (
+    LaboratoryGroupFactory,
+    StudentEnrollmentFactory,
+    StudentFactory,
+)
+from infrastructure.persistence.models import LabEnrollmentCampaign, StudentPostulation
+from application.services.student_services import StudentService
+
+
+def open_course_for(student, capacity=2):
+    enrollment = StudentEnrollmentFactory.create(student=student, group=None)
+    lab = LaboratoryGroupFactory.create(course=enrollment.course, capacity=capacity)
+    LaboratoryGroupFactory.create(course=enrollment.course, day_of_week="MARTES")
+    campaign = LabEnrollmentCampaign.objects.create(
+        course=enrollment.course, start_date=timezone.now(), end_date=timezone.now()
+    )
+    return campaign, lab
+
+
+@pytest.mark.django_db
+class TestAvailableLabCampaigns:
+    """La página de matrícula de labs no debe crecer en consultas por curso"""
+
+    def test_fixed_number_of_queries(self, django_assert_num_queries):
+        student = StudentFactory.create()
+        campaign, lab = open_course_for(student, capacity=2)
+        other = StudentFactory.create()
+        StudentPostulation.objects.create(
+            campaign=campaign, student=other, lab_group=lab
+        )
+
+        # matrículas, campañas, postulaciones, labs + 3 del horario
+        with django_assert_num_queries(7):
+            data = StudentService.get_available_lab_campaigns(student)
+
+        # Los labs no tienen orden fijo: busco el que tiene la postulación
+        first = next(item for item in data[0]["labs"] if item["lab"] == lab)
+        assert first["enrolled_count"] == 1
+        assert first["available_spots"] == 1
+        assert data[0]["can_postulate"]
+
+        for _ in range(4):
+            open_course_for(student)
+        # El horario ya está en caché
+        with django_assert_num_queries(4):
+            data = StudentService.get_available_lab_campaigns(student)
+        assert len(data) == 5
+
+    def test_already_postulated(self):
+        student = StudentFactory.create()
+        campaign, lab = open_course_for(student)
+        StudentPostulation.objects.create(
+            campaign=campaign, student=student, lab_group=lab
+        )
+
+        data = StudentService.get_available_lab_campaigns(student)
+
+        assert data[0]["already_postulated"].lab_group_id == lab.lab_id
+        assert not data[0]["can_postulate"]
@@ -0,0 +1,68 @@
+import pytest
+from django.utils import timezone
+from tests.factories import (
+    CourseFactory,
+    LaboratoryGroupFactory,
+    StudentEnrollmentFactory,
+)
+from infrastructure.persistence.models import (
+    LabEnrollmentCampaign,
+    StudentPostulation,
+    Syllabus,
+)
+from application.services.secretaria_services import SecretariaService
+
+
+def lab_course(students=2, with_campaign=False):
+    course = CourseFactory.create()
+    Syllabus.objects.create(course=course, lab_hours=2)
+    enrollments = StudentEnrollmentFactory.create_batch(
+        students, course=course, group=None
+    )
+    lab = LaboratoryGroupFactory.create(course=course, capacity=1)
+    if with_campaign:
+        campaign = LabEnrollmentCampaign.objects.create(
+            course=course, start_date=timezone.now(), end_date=timezone.now()
+        )
+        StudentPostulation.objects.create(
+            campaign=campaign, student=enrollments[0].student, lab_group=lab
+        )
+    return course
+
+
+@pytest.mark.django_db
+class TestLabManagementOverview:
+    """El tablero de labs se arma en consultas agrupadas, no por curso"""
+
+    def test_fixed_queries_and_same_data_as_per_course_methods(
+        self, django_assert_num_queries
+    ):
+        courses = [lab_course(with_campaign=i % 2 == 0) for i in range(4)]
+
+        with django_assert_num_queries(6):
+            overview = SecretariaService.get_lab_management_overview()
+
+        assert {data["course"] for data in overview} == set(courses)
+        for data in overview:
+            course_id = data["course"].course_id
+            check = SecretariaService.can_enable_enrollment(course_id)
+            assert data["enrollment_count"] == check["total_students"]
+            assert data["total_capacity"] == check["total_capacity"]
+            assert data["can_enable_enrollment"] == check["can_enable"]
+            assert data["campaign_status"] == SecretariaService.get_campaign_status(
+                course_id
+            )
+
+    def test_cached_until_labs_change(
+        self, django_assert_num_queries, django_capture_on_commit_callbacks
+    ):
+        course = lab_course()
+        SecretariaService.get_lab_management_overview()
+
+        with django_assert_num_queries(0):
+            SecretariaService.get_lab_management_overview()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            LaboratoryGroupFactory.create(course=course, day_of_week="MARTES")
+        overview = SecretariaService.get_lab_management_overview()
+        assert len(overview[0]["existing_labs"]) == 2
@@ -0,0 +1,301 @@
+import io
+import zipfile
+
+import openpyxl
+import pytest
+from django.contrib.auth import authenticate
+from django.core.files.uploadedfile import SimpleUploadedFile
+from tests.factories import CourseGroupFactory, StudentFactory, StudentEnrollmentFactory
+from infrastructure.persistence.models import CustomUser, StudentEnrollment
+from application.services.secretaria_services import SecretariaService
+
+
+def csv_text(rows):
+    """Arma un CSV con el formato oficial: Nro, CUI, Apellidos y Nombres, Matr., Estado"""
+    lines = ["Nro,CUI,Apellidos y Nombres,Matr.,Estado"]
+    for i, (cui, name) in enumerate(rows, 1):
+        lines.append(f'{i},{cui},"{name}",1,ACTIVO')
+    return "\n".join(lines)
+
+
+def build_csv(rows):
+    return SimpleUploadedFile("alumnos.csv", csv_text(rows).encode("utf-8"))
+
+
+@pytest.mark.django_db
+class TestProcessStudentCsv:
+    """Carga masiva de alumnos por conjuntos"""
+
+    def test_creates_enrolls_and_removes_in_bulk(self):
+        group = CourseGroupFactory.create()
+        # Alumno que ya no viene en el CSV: debe ser desmatriculado
+        leaving = StudentFactory.create(username="20200001")
+        StudentEnrollmentFactory.create(
+            student=leaving, course=group.course, group=group
+        )
+        # Alumno existente e inactivo: se reactiva pero no se crea
+        returning = StudentFactory.create(username="20200002", is_active=False)
+
+        csv_file = build_csv(
+            [
+                ("20200002", "QUISPE/MAMANI, ANA"),
+                ("20200003", "QUISPE/MAMANI, ANDRES"),
+                ("20200004", "QUISPE/MAMANI, ALBERTO"),
+                ("20200004", "QUISPE/MAMANI, ALBERTO"),  # Duplicado en el archivo
+            ]
+        )
+
+        result = SecretariaService.process_student_csv(group.group_id, csv_file)
+
+        assert result["success"]
+        assert result["stats"] == {"created": 2, "enrolled": 3, "removed": 1}
+
+        returning.refresh_from_db()
+        assert returning.is_active and returning.account_status == "ACTIVO"
+
+        enrolled = set(
+            StudentEnrollment.objects.filter(group=group).values_list(
+                "student__username", flat=True
+            )
+        )
+        assert enrolled == {"20200002", "20200003", "20200004"}
+
+        group.refresh_from_db()
+        assert group.students_loaded and group.capacity == 3
+
+    def test_email_collisions_are_resolved_in_memory(self):
+        group = CourseGroupFactory.create()
+        StudentFactory.create(email="aquispe@unsa.edu.pe")
+
+        csv_file = build_csv(
+            [
+                ("20210001", "QUISPE/MAMANI, ANA"),
+                ("20210002", "QUISPE/MAMANI, ANDRES"),
+            ]
+        )
+        SecretariaService.process_student_csv(group.group_id, csv_file)
+
+        emails = dict(
+            CustomUser.objects.filter(
+                username__in=["20210001", "20210002"]
+            ).values_list("username", "email")
+        )
+        assert emails["20210001"] == "aquispemamani@unsa.edu.pe"
+        assert emails["20210002"] == "aquispe20210002@unsa.edu.pe"
+
+    def test_query_count_does_not_grow_with_rows(self, django_assert_max_num_queries):
+        group = CourseGroupFactory.create()
+        rows = [(f"2022{i:04d}", f"APELLIDO{i}/MATERNO, NOMBRE") for i in range(60)]
+
+        with django_assert_max_num_queries(15):
+            result = SecretariaService.process_student_csv(
+                group.group_id, build_csv(rows)
+            )
+
+        assert result["stats"]["created"] == 60
+        assert result["stats"]["enrolled"] == 60
+
+
+@pytest.mark.django_db
+class TestDeferredPasswordProvisioning:
+    """Alumnos creados sin hash que se activan en su primer login"""
+
+    def test_new_students_get_unusable_password(self):
+        group = CourseGroupFactory.create()
+        SecretariaService.process_student_csv(
+            group.group_id,
+            build_csv([("20230001", "QUISPE/MAMANI, ANA")]),
+            defer_passwords=True,
+        )
+
+        student = CustomUser.objects.get(username="20230001")
+        assert not student.has_usable_password()
+        assert student.pending_activation
+
+    def test_first_login_with_cui_activates_the_account(self):
+        group = CourseGroupFactory.create()
+        SecretariaService.process_student_csv(
+            group.group_id,
+            build_csv([("20230002", "QUISPE/MAMANI, ANA")]),
+            defer_passwords=True,
+        )
+        email = CustomUser.objects.get(username="20230002").email
+
+        assert authenticate(username=email, password="otra-clave") is None
+
+        user = authenticate(username=email, password="20230002")
+        assert user is not None and user.has_usable_password()
+        assert user.check_password("20230002")
+        assert not CustomUser.objects.get(pk=user.pk).pending_activation
+
+    def test_locked_account_is_not_activated_with_the_cui(self):
+        student = StudentFactory.create(username="20230004")
+        student.set_unusable_password()
+        student.save()
+
+        assert authenticate(username=student.email, password="20230004") is None
+        assert not CustomUser.objects.get(pk=student.pk).has_usable_password()
+
+    def test_inactive_pending_account_is_left_untouched(self):
+        group = CourseGroupFactory.create()
+        SecretariaService.process_student_csv(
+            group.group_id,
+            build_csv([("20230005", "QUISPE/MAMANI, ANA")]),
+            defer_passwords=True,
+        )
+        CustomUser.objects.filter(username="20230005").update(is_active=False)
+        email = CustomUser.objects.get(username="20230005").email
+
+        assert authenticate(username=email, password="20230005") is None
+        student = CustomUser.objects.get(username="20230005")
+        assert student.pending_activation and not student.has_usable_password()
+
+    def test_eager_mode_still_hashes_the_cui(self):
+        group = CourseGroupFactory.create()
+        SecretariaService.process_student_csv(
+            group.group_id,
+            build_csv([("20230003", "QUISPE/MAMANI, ANA")]),
+            defer_passwords=False,
+        )
+
+        assert CustomUser.objects.get(username="20230003").check_password("20230003")
+
+
+@pytest.mark.django_db
+class TestBackgroundRosterUpload:
+    """Carga encolada en Celery (modo eager en tests) con avance consultable"""
+
+    def test_enqueued_upload_reports_final_stats(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        group = CourseGroupFactory.create()
+
+        task_id = SecretariaService.enqueue_student_csv(
+            group.group_id,
+            build_csv([("20240001", "QUISPE/MAMANI, ANA")]),
+        )
+        status = SecretariaService.get_job_status(task_id)
+
+        assert status["ready"]
+        assert status["result"]["success"]
+        assert status["result"]["stats"] == {"created": 1, "enrolled": 1, "removed": 0}
+        # El archivo temporal se borra al terminar
+        assert not any((tmp_path / "uploads" / "rosters").iterdir())
+
+    def test_progress_callback_is_called_per_batch(self, monkeypatch):
+        monkeypatch.setattr(SecretariaService, "ROSTER_BATCH_SIZE", 2)
+        group = CourseGroupFactory.create()
+        rows = [(f"2024{i:04d}", "QUISPE/MAMANI, ANA") for i in range(5)]
+        progress = []
+
+        SecretariaService.process_student_csv(
+            group.group_id, build_csv(rows), progress_callback=progress.append
+        )
+
+        assert [p["students"] for p in progress] == [2, 4, 5, 5]
+        assert progress[-1]["enrolled"] == 5
+
+
+@pytest.mark.django_db
+class TestRosterBatchImport:
+    """Carga de varios grupos desde un ZIP de CSVs o un XLSX con una hoja por grupo"""
+
+    def test_zip_with_one_csv_per_group(self):
+        group_a = CourseGroupFactory.create(group_code="A")
+        group_b = CourseGroupFactory.create(course=group_a.course, group_code="B")
+        code = group_a.course.course_code
+        # Alumno que se cambia del grupo A al B
+        mover = StudentFactory.create(username="20250001")
+        before = StudentEnrollmentFactory.create(
+            student=mover, course=group_a.course, group=group_a
+        ).updated_at
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr(
+                f"{code}_A.csv", csv_text([("20250002", "QUISPE/MAMANI, ANA")])
+            )
+            archive.writestr(
+                f"notas/{code}_B.csv",
+                csv_text(
+                    [
+                        ("20250001", "QUISPE/MAMANI, LUIS"),
+                        ("20250004", "QUISPE/MAMANI, ANDRES"),
+                    ]
+                ),
+            )
+            archive.writestr("XX999_Z.csv", csv_text([("20250003", "ROJAS/DIAZ, EVA")]))
+        buffer.seek(0)
+
+        result = SecretariaService.process_roster_batch(buffer, "lote.zip")
+
+        assert result["success"]
+        assert result["stats"] == {"created": 2, "enrolled": 3, "removed": 0}
+        by_group = {row.get("group"): row for row in result["groups"]}
+        assert by_group[str(group_b)]["students"] == 2
+        # La matrícula se mueve de grupo en lugar de recrearse
+        mover_enrollment = StudentEnrollment.objects.get(student=mover)
+        assert mover_enrollment.group == group_b
+        # y los reportes cacheados del grupo ven el cambio
+        assert mover_enrollment.updated_at > before
+        assert any(row.get("file") == "XX999_Z.csv" for row in result["groups"])
+        assert set(
+            StudentEnrollment.objects.filter(group=group_b).values_list(
+                "student__username", flat=True
+            )
+        ) == {"20250001", "20250004"}
+        assert not CustomUser.objects.filter(username="20250003").exists()
+
+    def test_xlsx_with_one_sheet_per_group(self):
+        group = CourseGroupFactory.create(group_code="C")
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = f"{group.course.course_code}_C"
+        ws.append(["Nro", "CUI", "Apellidos y Nombres", "Matr.", "Estado"])
+        ws.append([1, 20250010, "QUISPE/MAMANI, ANA", 1, "ACTIVO"])  # CUI numérico
+        ws.append([2, "20250011", "ROJAS/DIAZ, EVA", 1, "ACTIVO"])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+
+        result = SecretariaService.process_roster_batch(buffer, "lote.xlsx")
+
+        assert result["stats"]["enrolled"] == 2
+        group.refresh_from_db()
+        assert group.students_loaded and group.capacity == 2
+        assert CustomUser.objects.filter(username="20250010").exists()
+
+
+@pytest.mark.django_db
+class TestUploadViewsRequireSecretaria:
+    """Las cargas reescriben matrículas: sólo Secretaría puede encolarlas"""
+
+    @pytest.mark.parametrize(
+        "name, args, field",
+        [
+            ("presentation:secretaria_upload_students_to_group", "group", "file_alumnos"),
+            ("presentation:secretaria_upload_roster_batch", None, "file_lote"),
+        ],
+    )
+    def test_anonymous_and_students_are_rejected(
+        self, client, monkeypatch, name, args, field
+    ):
+        from django.urls import reverse
+
+        enqueued = []
+        monkeypatch.setattr(
+            SecretariaService, "enqueue_student_csv", lambda *a: enqueued.append(a)
+        )
+        monkeypatch.setattr(
+            SecretariaService, "enqueue_roster_batch", lambda *a: enqueued.append(a)
+        )
+        group = CourseGroupFactory.create()
+        url = reverse(name, args=[group.group_id] if args else [])
+
+        for user in (None, StudentFactory.create()):
+            if user:
+                client.force_login(user)
+            response = client.post(url, {field: build_csv([])})
+            assert response.status_code == 302
+            assert response.url == reverse("presentation:login")
+
+        assert enqueued == []
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from tests.factories import (
+    CourseFactory,
+    LaboratoryGroupFactory,
+    StudentEnrollmentFactory,
+)
+from infrastructure.persistence.models import LabEnrollmentCampaign, StudentPostulation
+from application.services import seat_counters
+from application.services.student_services import StudentService
+
+
+def open_campaign(capacity):
+    course = CourseFactory.create()
+    lab = LaboratoryGroupFactory.create(course=course, capacity=capacity)
+    campaign = LabEnrollmentCampaign.objects.create(
+        course=course, start_date=timezone.now(), end_date=timezone.now()
+    )
+    return campaign, lab
+
+
+def rush(campaign, lab, attempts):
+    """Todos los hilos arrancan juntos y piden un cupo; devuelve cuántos entraron"""
+    barrier = threading.Barrier(attempts)
+    admitted = []
+
+    def student():
+        barrier.wait()
+        if seat_counters.reserve(campaign.campaign_id, lab):
+            admitted.append(1)
+
+    threads = [threading.Thread(target=student) for _ in range(attempts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(admitted)
+
+
+@pytest.mark.django_db
+class TestSeatCounters:
+    """Contador atómico de cupos por lab y campaña"""
+
+    def test_concurrent_rush_never_overbooks(self):
+        campaign, lab = open_campaign(capacity=25)
+        seat_counters.reconcile([campaign.campaign_id])
+
+        assert rush(campaign, lab, attempts=200) == 25
+        # Se liberan 10 (postulaciones que fallaron) y vuelve la avalancha
+        for _ in range(10):
+            seat_counters.release(campaign.campaign_id, lab.lab_id)
+        assert rush(campaign, lab, attempts=100) == 10
+        assert cache.get(seat_counters._key(campaign.campaign_id, lab.lab_id)) == 25
+
+    def test_postulation_uses_counter_and_delete_frees_the_seat(
+        self, django_capture_on_commit_callbacks
+    ):
+        campaign, lab = open_campaign(capacity=1)
+        first = StudentEnrollmentFactory.create(course=campaign.course, group=None)
+        second = StudentEnrollmentFactory.create(course=campaign.course, group=None)
+
+        ok = StudentService.postulate_to_lab(
+            first.student, campaign.campaign_id, lab.lab_id
+        )
+        full = StudentService.postulate_to_lab(
+            second.student, campaign.campaign_id, lab.lab_id
+        )
+        assert ok["success"]
+        assert full["errors"] == ["Este laboratorio ya no tiene cupos disponibles."]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            StudentPostulation.objects.get(student=first.student).delete()
+        retry = StudentService.postulate_to_lab(
+            second.student, campaign.campaign_id, lab.lab_id
+        )
+        assert retry["success"]
+
+    def test_rolled_back_delete_keeps_the_seat(self):
+        campaign, lab = open_campaign(capacity=1)
+        enrollment = StudentEnrollmentFactory.create(course=campaign.course, group=None)
+        StudentService.postulate_to_lab(
+            enrollment.student, campaign.campaign_id, lab.lab_id
+        )
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                StudentPostulation.objects.get(student=enrollment.student).delete()
+                raise RuntimeError
+
+        key = seat_counters._key(campaign.campaign_id, lab.lab_id)
+        assert cache.get(key) == 1 == StudentPostulation.objects.count()
+
+    def test_reconcile_matches_database(self):
+        campaign, lab = open_campaign(capacity=5)
+        key = seat_counters._key(campaign.campaign_id, lab.lab_id)
+        cache.set(key, 4, None)
+
+        assert seat_counters.reconcile([campaign.campaign_id]) == 1
+        assert cache.get(key) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentPostulations:
+    """La avalancha pasando por postulate_to_lab: contador, transacción y BD juntos"""
+
+    def test_rush_through_the_service_never_overbooks(self):
+        campaign, lab = open_campaign(capacity=5)
+        students = [
+            StudentEnrollmentFactory.create(course=campaign.course, group=None).student
+            for _ in range(30)
+        ]
+        barrier = threading.Barrier(len(students))
+        results = []
+
+        def student(user):
+            try:
+                barrier.wait()
+                results.append(
+                    StudentService.postulate_to_lab(
+                        user, campaign.campaign_id, lab.lab_id
+                    )
+                )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=student, args=(s,)) for s in students]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        saved = StudentPostulation.objects.filter(lab_group=lab).count()
+        assert saved <= lab.capacity
+        assert sum(result["success"] for result in results) == saved
+        # Los que fallaron después de reservar devolvieron su cupo
+        key = seat_counters._key(campaign.campaign_id, lab.lab_id)
+        assert cache.get(key, saved) == saved